@@ -0,0 +1,124 @@
+"""
+accuracy check of the step store precision (STEP_STORE_DTYPE), runs core.src.abaqus_process on the synthetic models of
+bench.run_bench with float32 and float64 storage, and compares the result bundles (db.bundle) of the two runs. The
+maximum absolute and relative deviation of each metric is printed.
+
+usage (from the project root, no abaqus licence required):
+    python -m bench.accuracy                            run all models
+    python -m bench.accuracy --models small --limit 0.01
+                                                        exit code 1 if any deviation is over 0.01
+
+the reports print line load with 2 ~ 5 decimals, a deviation below 0.5e-2 is not visible in the text report.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+from bench import fake_odb
+from bench import run_bench
+
+# bundle arrays of the final results from the step store, the bore arrays are always computed in float64
+METRIC_ARRAYS = ['s11_init', 's11_hot', 'line_load_max', 'line_load_min', 'head_lift', 'wear', 'safety_factor',
+                 'thermal_motion', 'relative']
+
+
+def run_precision(src, setting, parameters, work_dir, dtype):
+    """
+    :return:                    result bundle folder of the run
+    """
+    setting.environment_key['STEP_STORE_DTYPE'] = dtype
+    parameters = dict(parameters)
+    name = parameters.pop('name')
+    model_dir = os.path.join(work_dir, name + '_' + dtype)
+    os.makedirs(model_dir)
+    odb_path = os.path.join(model_dir, 'ACCURACY-' + name + '.odb')
+    model, odb, input_data = fake_odb.make_gasket_model(odb_path, **parameters)
+    json_file = os.path.join(model_dir, 'ACCURACY-' + name + '_userinput.json')
+    with open(json_file, 'wt') as f:
+        json.dump(input_data, f)
+    stdout = sys.stdout
+    with open(os.path.join(model_dir, 'stdout.txt'), 'wt') as f:
+        sys.stdout = f
+        try:
+            process_setting = src.abaqus_process(json_file)
+        finally:
+            sys.stdout = stdout
+    return process_setting['BUNDLE_DIR']
+
+
+def deviation(reference, value):
+    """
+    :return:                    (max absolute deviation, max relative deviation, compared values), NaN are skipped
+    """
+    reference = np.asarray(reference, dtype=np.float64).ravel()
+    value = np.asarray(value, dtype=np.float64).ravel()
+    valid = ~(np.isnan(reference) | np.isnan(value))
+    if not valid.any():
+        return 0.0, 0.0, 0
+    reference = reference[valid]
+    difference = np.abs(value[valid] - reference)
+    scale = np.abs(reference)
+    relative = difference / np.where(scale > 1e-12, scale, 1.0)
+    return float(difference.max()), float(relative.max()), int(valid.sum())
+
+
+def compare_bundles(bundle_64, bundle_32):
+    """
+    :return:                    list of (metric, max absolute deviation, max relative deviation, values)
+    """
+    from db import bundle
+    reference = bundle.ResultBundle(bundle_64)
+    result = bundle.ResultBundle(bundle_32)
+    rows = []
+    for name in METRIC_ARRAYS:
+        if name not in reference.manifest['arrays'] or name not in result.manifest['arrays']:
+            continue
+        rows.append((name,) + deviation(reference.array(name), result.array(name)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='float32 and float64 step store deviation on synthetic odb')
+    parser.add_argument('--models', default=','.join([model['name'] for model in run_bench.MODELS]))
+    parser.add_argument('--limit', type=float, default=None, help='max absolute deviation allowed')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary output folder')
+    args = parser.parse_args(argv)
+
+    fake_odb.install()
+    from conf import setting
+    from core import src
+    setting.environment_key['CACHE_TIME'] = 0
+    setting.environment_key['LOG_FLUSH_INTERVAL'] = 0
+
+    selected = args.models.split(',')
+    work_dir = tempfile.mkdtemp(prefix='chg_accuracy_')
+    failed = []
+    try:
+        print ('MODEL'.ljust(10) + 'METRIC'.ljust(16) + 'VALUES'.rjust(12) + 'MAX ABS DEV'.rjust(16) +
+               'MAX REL DEV'.rjust(16))
+        for parameters in run_bench.MODELS:
+            if parameters['name'] not in selected:
+                continue
+            bundle_64 = run_precision(src, setting, parameters, work_dir, 'float64')
+            bundle_32 = run_precision(src, setting, parameters, work_dir, 'float32')
+            for metric, absolute, relative, count in compare_bundles(bundle_64, bundle_32):
+                print (parameters['name'].ljust(10) + metric.ljust(16) + str(count).rjust(12) +
+                       ('%16.3e' % absolute) + ('%16.3e' % relative))
+                if args.limit is not None and absolute > args.limit:
+                    failed.append(parameters['name'] + ' ' + metric)
+    finally:
+        if args.keep:
+            print ('OUTPUT KEPT IN ' + work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    for item in failed:
+        print ('OVER LIMIT: ' + item)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
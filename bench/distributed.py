@@ -0,0 +1,188 @@
+"""
+check of the distributed extraction (lib.distribute), runs core.src.abaqus_process on the synthetic models of
+bench.run_bench with the local extraction, then with DISTRIBUTED_DIR and local worker processes, and compares the result
+bundles (db.bundle) of the runs, all the arrays must be equal. A second distributed run adds a worker which claims one
+unit and dies with its lease held, the unit must be reclaimed after DISTRIBUTED_LEASE_TIMEOUT and done by others.
+
+usage (from the project root, no abaqus licence required):
+    python -m bench.distributed                         run the small model with 2 workers
+    python -m bench.distributed --models small,assembly --workers 3
+
+exit code 1 if a distributed bundle differs from the local one or the dead worker claimed no unit. A reclaim that never
+happens leaves the coordinator waiting, the run does not return.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from bench import fake_odb
+from bench import run_bench
+
+# short lease and poll for the local processes, the dead worker unit is reclaimed after the lease timeout
+LEASE_TIMEOUT = 3.0
+POLL_INTERVAL = 0.05
+
+
+def serve_queue(queue_dir, die=False):
+    """
+    distributed extraction worker on the synthetic odb, if die, claim one unit, start its lease and exit without the
+    chunk, the claimed unit name is written to <queue>/DEAD
+    """
+    fake_odb.install()
+    from conf import setting
+    from lib import distribute
+    setting.environment_key['CACHE_TIME'] = 0
+    setting.environment_key['DISTRIBUTED_LEASE_TIMEOUT'] = LEASE_TIMEOUT
+    setting.environment_key['DISTRIBUTED_POLL_INTERVAL'] = POLL_INTERVAL
+    if not die:
+        return distribute.work(queue_dir)
+    while not os.path.isfile(os.path.join(queue_dir, 'STOP')):
+        for job_file in sorted(glob.glob(os.path.join(queue_dir, '*', 'job.json'))):
+            claimed_file = distribute.claim(os.path.dirname(job_file))
+            if claimed_file is None:
+                continue
+            with open(claimed_file, 'rt') as f:
+                token = json.load(f)['token']
+            _ = distribute.Lease(claimed_file, LEASE_TIMEOUT / 3.0, token)
+            with open(os.path.join(queue_dir, 'DEAD'), 'wt') as f:
+                f.write(os.path.basename(claimed_file))
+            # the lease thread dies with the process, no cleanup
+            os._exit(1)
+        time.sleep(POLL_INTERVAL / 5.0)
+    return 0
+
+
+def run_job(src, setting, parameters, work_dir, tag, workers=0, die=False):
+    """
+    :param workers:             local worker processes, 0 for the local extraction
+    :param die:                 also start a worker which dies with a claimed unit
+    :return:                    (result bundle folder, profile counts, unit claimed by the dead worker)
+    """
+    parameters = dict(parameters)
+    name = parameters.pop('name')
+    model_dir = os.path.join(work_dir, name + '_' + tag)
+    os.makedirs(model_dir)
+    odb_path = os.path.join(model_dir, 'DIST-' + name + '.odb')
+    model, odb, input_data = fake_odb.make_gasket_model(odb_path, **parameters)
+    json_file = os.path.join(model_dir, 'DIST-' + name + '_userinput.json')
+    with open(json_file, 'wt') as f:
+        json.dump(input_data, f)
+    queue_dir = None
+    processes = []
+    setting.environment_key['DISTRIBUTED_DIR'] = None
+    if workers or die:
+        queue_dir = os.path.join(model_dir, 'queue')
+        os.makedirs(queue_dir)
+        setting.environment_key['DISTRIBUTED_DIR'] = queue_dir
+        command = [sys.executable, '-m', 'bench.distributed', '--serve-queue', queue_dir]
+        if die:
+            processes.append(subprocess.Popen(command + ['--die']))
+        for i in range(workers):
+            processes.append(subprocess.Popen(command))
+    stdout = sys.stdout
+    try:
+        with open(os.path.join(model_dir, 'stdout.txt'), 'wt') as f:
+            sys.stdout = f
+            try:
+                process_setting = src.abaqus_process(json_file)
+            finally:
+                sys.stdout = stdout
+    finally:
+        if queue_dir is not None:
+            with open(os.path.join(queue_dir, 'STOP'), 'wt') as f:
+                f.write('')
+            for process in processes:
+                process.wait()
+    dead_unit = None
+    if die and os.path.isfile(os.path.join(queue_dir, 'DEAD')):
+        with open(os.path.join(queue_dir, 'DEAD'), 'rt') as f:
+            dead_unit = f.read()
+    with open(os.path.join(model_dir, 'DIST-' + name + '_profile.json'), 'rt') as f:
+        counts = json.load(f)['counts']
+    return process_setting['BUNDLE_DIR'], counts, dead_unit
+
+
+def compare_bundles(reference_dir, result_dir):
+    """
+    :return:                    list of the array names not equal in the two bundles, NaN are equal
+    """
+    from db import bundle
+    reference = bundle.ResultBundle(reference_dir)
+    result = bundle.ResultBundle(result_dir)
+    names = sorted(set(reference.manifest['arrays']) | set(result.manifest['arrays']))
+    different = []
+    for name in names:
+        if name not in reference.manifest['arrays'] or name not in result.manifest['arrays']:
+            different.append(name)
+            continue
+        a = np.asarray(reference.array(name))
+        b = np.asarray(result.array(name))
+        if a.shape != b.shape or a.dtype != b.dtype:
+            different.append(name)
+        elif a.dtype.kind == 'f':
+            if not (np.array_equal(np.isnan(a), np.isnan(b)) and np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)])):
+                different.append(name)
+        elif not np.array_equal(a, b):
+            different.append(name)
+    return different
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='distributed extraction check on synthetic odb')
+    parser.add_argument('--models', default='small')
+    parser.add_argument('--workers', type=int, default=2, help='local worker processes')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary output folder')
+    parser.add_argument('--serve-queue', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--die', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve_queue:
+        serve_queue(args.serve_queue, args.die)
+        return 0
+
+    fake_odb.install()
+    from conf import setting
+    from core import src
+    setting.environment_key['CACHE_TIME'] = 0
+    setting.environment_key['LOG_FLUSH_INTERVAL'] = 0
+    setting.environment_key['DISTRIBUTED_STEPS_PER_UNIT'] = 1
+    setting.environment_key['DISTRIBUTED_LEASE_TIMEOUT'] = LEASE_TIMEOUT
+    setting.environment_key['DISTRIBUTED_POLL_INTERVAL'] = POLL_INTERVAL
+
+    selected = args.models.split(',')
+    work_dir = tempfile.mkdtemp(prefix='chg_dist_')
+    failed = []
+    try:
+        print ('MODEL'.ljust(10) + 'RUN'.ljust(16) + 'LOCAL UNITS'.rjust(14) + '  RESULT')
+        for parameters in run_bench.MODELS:
+            if parameters['name'] not in selected:
+                continue
+            name = parameters['name']
+            reference, counts, dead_unit = run_job(src, setting, parameters, work_dir, 'local')
+            for tag, die in [('workers', False), ('dead_worker', True)]:
+                result, counts, dead_unit = run_job(src, setting, parameters, work_dir, tag, args.workers, die)
+                different = compare_bundles(reference, result)
+                message = 'SAME' if not different else 'DIFFERENT: ' + ', '.join(different)
+                if die:
+                    message += ', DEAD WORKER UNIT ' + (dead_unit or 'NONE')
+                print (name.ljust(10) + tag.ljust(16) + str(counts.get('local_units', 0)).rjust(14) + '  ' + message)
+                if different or (die and dead_unit is None):
+                    failed.append(name + ' ' + tag)
+    finally:
+        if args.keep:
+            print ('OUTPUT KEPT IN ' + work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    for item in failed:
+        print ('FAILED: ' + item)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
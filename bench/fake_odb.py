@@ -0,0 +1,1006 @@
+"""
+Pure python stand-in for the part of the Abaqus scripting interface used by this project:
+    abaqus / abaqusConstants / viewerModules / odbAccess / odbMaterial / odbSection / visualization /
+    displayGroupOdbToolset
+install() registers fake modules in sys.modules, so lib.common and core.src can be imported and run without an Abaqus
+licence. make_gasket_model() creates a parametrised gasket model (cylinders, rings of GK3D8 elements, engine sets,
+bore liner nodes, bolt nodes) and the matching user input json data.
+
+Field data is synthetic but deterministic, S11 / E11 drop for the element close to the firing cylinder, contact output
+only exists on the top gasket face, the free body report sums S11 * area of the displayed gasket sets, or is the closed
+form pressure * area of a model with uniform gasket pressure. With instance_split the model is an assembly of two
+instances, GASKET-1 with the gasket mesh and sets, ENGINE-1 with the engine, bore and bolt nodes, the field blocks are
+split by instance.
+"""
+import json
+import math
+import os
+import sys
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+PART_NAME = 'PART-1-1'
+GASKET_INSTANCE = 'GASKET-1'
+ENGINE_INSTANCE = 'ENGINE-1'
+GASKET_ELEMENT_TYPE = 'GK3D8'
+ENGINE_ELEMENT_TYPE = 'C3D8'
+GASKET_NODE_START = 90000001
+GASKET_ELEMENT_START = 90000001
+
+
+class SymbolicConstant(str):
+    """
+    abaqus symbolic constant, compares equal to its name
+    """
+    pass
+
+
+CONSTANT_NAMES = ['ON', 'OFF', 'NONE', 'PARALLEL', 'PNG', 'UNIFORM', 'FIXED', 'NODAL', 'ELEMENT_NODAL',
+                  'INTEGRATION_POINT', 'CENTROID', 'CIRCUMFERENTIAL', 'POINT_ARC', 'CIRCLE_RADIUS', 'PATH_POINTS',
+                  'UNDEFORMED', 'SEQ_ID', 'COMPONENT', 'INVARIANT', 'ISOTROPIC', 'DAMAGE', 'STRESS', 'SCALAR',
+                  'VECTOR', 'TENSOR_3D_FULL', 'LONG_TERM', 'HALF_CYCLE', 'UNIFORM', 'RELATIVE_SLOPE_DROP']
+CONSTANTS = dict((name, SymbolicConstant(name)) for name in CONSTANT_NAMES)
+
+
+class Repository(OrderedDict):
+    """
+    abaqus repository, keys() / values() / items() return lists as in the abaqus python 2 interpreter
+    """
+
+    def keys(self):
+        return list(OrderedDict.keys(self))
+
+    def values(self):
+        return list(OrderedDict.values(self))
+
+    def items(self):
+        return list(OrderedDict.items(self))
+
+
+class NoOp(object):
+    """
+    viewer objects which only change the display, every attribute / call / item is accepted and ignored
+    """
+
+    def __getattr__(self, item):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getitem__(self, item):
+        return self
+
+
+# ======================================================================================================================
+# odbAccess
+# ======================================================================================================================
+class OdbMeshNode(object):
+    __slots__ = ('label', 'coordinates', 'instanceName')
+
+    def __init__(self, label, coordinates):
+        self.label = label
+        self.coordinates = coordinates
+        self.instanceName = PART_NAME
+
+
+class OdbMeshElement(object):
+    __slots__ = ('label', 'type', 'connectivity', 'instanceName')
+
+    def __init__(self, label, element_type, connectivity):
+        self.label = label
+        self.type = element_type
+        self.connectivity = connectivity
+        self.instanceName = PART_NAME
+
+
+class OdbSet(object):
+    def __init__(self, name, nodes=None, elements=None):
+        self.name = name
+        self.nodes = nodes if nodes is not None else []
+        self.elements = elements if elements is not None else []
+        self._node_labels = None
+        self._element_labels = None
+
+    def node_labels(self):
+        if self._node_labels is None:
+            labels = [node.label for node in self.nodes]
+            for element in self.elements:
+                labels.extend(element.connectivity)
+            self._node_labels = np.unique(np.array(labels, dtype=np.int64))
+        return self._node_labels
+
+    def element_labels(self):
+        if self._element_labels is None:
+            self._element_labels = np.array(sorted([element.label for element in self.elements]), dtype=np.int64)
+        return self._element_labels
+
+
+class OdbInstance(object):
+    def __init__(self, name, nodes, elements):
+        self.name = name
+        self.nodes = nodes
+        self.elements = elements
+        self.nodeSets = Repository()
+        self.elementSets = Repository()
+        self.node_dict = dict((node.label, node) for node in nodes)
+        self.element_dict = dict((element.label, element) for element in elements)
+
+    def getNodeFromLabel(self, label):
+        return self.node_dict[label]
+
+    def NodeSetFromNodeLabels(self, name, nodeLabels):
+        if name in self.nodeSets:
+            raise Exception('OdbError: set ' + name + ' already exists')
+        self.nodeSets[name] = OdbSet(name, nodes=[self.node_dict[label] for label in sorted(set(nodeLabels))])
+        return self.nodeSets[name]
+
+    def ElementSetFromElementLabels(self, name, elementLabels):
+        if name in self.elementSets:
+            raise Exception('OdbError: set ' + name + ' already exists')
+        elements = [self.element_dict[label] for label in sorted(set(elementLabels))]
+        self.elementSets[name] = OdbSet(name, elements=elements)
+        return self.elementSets[name]
+
+
+class OdbAssembly(object):
+    def __init__(self, instances):
+        self.instances = Repository()
+        for instance in instances:
+            self.instances[instance.name] = instance
+        self.nodeSets = Repository()
+        self.elementSets = Repository()
+
+
+class FieldValue(object):
+    __slots__ = ('nodeLabel', 'elementLabel', 'data', 'position', 'instance')
+
+    def __init__(self, node_label, element_label, data, position):
+        self.nodeLabel = node_label
+        self.elementLabel = element_label
+        self.data = data
+        self.position = position
+        self.instance = None
+
+
+class BlockInstance(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class FieldBulkData(object):
+    def __init__(self, node_labels, element_labels, data, position, component_labels, instance_name=None):
+        self.nodeLabels = node_labels
+        self.elementLabels = element_labels
+        self.data = data
+        self.position = position
+        self.componentLabels = component_labels
+        self.instance = BlockInstance(instance_name) if instance_name is not None else None
+
+
+class FieldOutput(object):
+    """
+    field output stored as arrays, one row per node (NODAL) or per element-node (ELEMENT_NODAL), instance_names is
+    the instance of each row, None for the single instance model (blocks without instance)
+    """
+
+    def __init__(self, name, position, node_labels, element_labels, data, component_labels=(), instance_names=None):
+        self.name = name
+        self.position = CONSTANTS[position]
+        self.node_labels = node_labels
+        self.element_labels = element_labels
+        self.data = data
+        self.componentLabels = component_labels
+        self.instance_names = instance_names
+        self.validInvariants = ()
+
+    def getSubset(self, region=None, position=None, elementType=None):
+        # only one position is stored for each field, the requested position is not converted
+        if region is None:
+            return self
+        if self.element_labels is not None and region.elements:
+            mask = np.isin(self.element_labels, region.element_labels())
+        else:
+            mask = np.isin(self.node_labels, region.node_labels())
+        element_labels = None
+        if self.element_labels is not None:
+            element_labels = self.element_labels[mask]
+        instance_names = None
+        if self.instance_names is not None:
+            instance_names = self.instance_names[mask]
+        return FieldOutput(self.name, str(self.position), self.node_labels[mask], element_labels, self.data[mask],
+                           self.componentLabels, instance_names)
+
+    @property
+    def values(self):
+        values = []
+        scalar = self.data.ndim == 1
+        element_labels = self.element_labels
+        position = self.position
+        for i in range(len(self.node_labels)):
+            element_label = None
+            if element_labels is not None:
+                element_label = int(element_labels[i])
+            data = float(self.data[i]) if scalar else self.data[i]
+            values.append(FieldValue(int(self.node_labels[i]), element_label, data, position))
+        return values
+
+    @property
+    def bulkDataBlocks(self):
+        data = self.data if self.data.ndim > 1 else self.data.reshape(-1, 1)
+        element_labels = self.element_labels
+        if self.instance_names is None:
+            return [FieldBulkData(self.node_labels, element_labels, data, self.position, self.componentLabels)]
+        blocks = []
+        for instance_name in sorted(set(self.instance_names.tolist())):
+            mask = self.instance_names == instance_name
+            blocks.append(FieldBulkData(self.node_labels[mask], element_labels[mask] if element_labels is not None
+                                        else None, data[mask], self.position, self.componentLabels, instance_name))
+        return blocks
+
+
+class HistoryOutput(object):
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+
+class HistoryRegion(object):
+    def __init__(self, name):
+        self.name = name
+        self.historyOutputs = Repository()
+
+
+class OdbFrame(object):
+    def __init__(self, model, step_index, frame_value):
+        self.model = model
+        self.step_index = step_index
+        self.frameValue = frame_value
+        self.incrementNumber = 1
+        self._field_outputs = None
+
+    @property
+    def fieldOutputs(self):
+        if self._field_outputs is None:
+            self._field_outputs = self.model.field_outputs(self.step_index)
+        return self._field_outputs
+
+
+class OdbStep(object):
+    def __init__(self, model, name, step_index):
+        self.name = name
+        self.number = step_index + 1
+        self.frames = [OdbFrame(model, step_index, 1.0)]
+        self.model = model
+        self.step_index = step_index
+        self._history_regions = None
+
+    @property
+    def historyRegions(self):
+        if self._history_regions is None:
+            self._history_regions = self.model.history_regions(self.step_index)
+        return self._history_regions
+
+
+class OdbMaterialObject(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class OdbProperty(object):
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+class GasketSectionType(object):
+    __members__ = ['crossSection', 'initialGap', 'initialThickness', 'initialVoid', 'material', 'name',
+                   'stabilizationStiffness']
+
+    def __init__(self, name, material, initial_gap):
+        self.crossSection = 1.0
+        self.initialGap = initial_gap
+        self.initialThickness = 0.0
+        self.initialVoid = 0.0
+        self.material = material
+        self.name = name
+        self.stabilizationStiffness = 0.0
+
+
+class HomogeneousSolidSectionType(object):
+    __members__ = ['material', 'name', 'thickness']
+
+    def __init__(self, name, material):
+        self.material = material
+        self.name = name
+        self.thickness = 1.0
+
+
+class Odb(object):
+    def __init__(self, name, path, model):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.isReadOnly = True
+        self.closed = False
+        self.materials = Repository()
+        self.sections = Repository()
+        self.rootAssembly = None
+        self.steps = Repository()
+
+    def close(self):
+        self.closed = True
+
+
+# ======================================================================================================================
+# viewer
+# ======================================================================================================================
+class Leaf(object):
+    def __init__(self, element_sets):
+        if isinstance(element_sets, str):
+            element_sets = (element_sets,)
+        self.element_sets = [name.split('.', 1)[-1] for name in element_sets]
+
+
+def LeafFromElementSets(elementSets):
+    return Leaf(elementSets)
+
+
+class DisplayGroup(object):
+    def __init__(self):
+        self.element_sets = []
+
+    def replace(self, leaf):
+        self.element_sets = list(leaf.element_sets)
+
+    def add(self, leaf):
+        self.element_sets += [name for name in leaf.element_sets if name not in self.element_sets]
+
+
+class OdbDisplay(object):
+    def __init__(self):
+        self.displayGroup = DisplayGroup()
+        self.commonOptions = NoOp()
+        self.viewCuts = NoOp()
+        self.step = 0
+        self.frame = -1
+        self.primary_variable = None
+
+    def setFrame(self, step, frame):
+        self.step = step
+        self.frame = frame
+
+    def setPrimaryVariable(self, variableLabel, outputPosition, **kwargs):
+        self.primary_variable = variableLabel
+
+    def setValues(self, **kwargs):
+        pass
+
+
+class Viewport(object):
+    def __init__(self, name):
+        self.name = name
+        self.displayedObject = None
+        self.odbDisplay = OdbDisplay()
+        self.view = NoOp()
+        self.viewportAnnotationOptions = NoOp()
+        self.colorMappings = NoOp()
+
+    def makeCurrent(self):
+        pass
+
+    def maximize(self):
+        pass
+
+    def setValues(self, displayedObject=None, **kwargs):
+        if displayedObject is not None:
+            self.displayedObject = displayedObject
+
+    def enableMultipleColors(self):
+        pass
+
+    def disableMultipleColors(self):
+        pass
+
+    def setColor(self, **kwargs):
+        pass
+
+
+class XYPlot(object):
+    def XYDataFromPath(self, path, step=0, frame=1, variable=(), **kwargs):
+        """
+        return the radial bore displacement along a circumferential path
+        """
+        points = path['numSegments']
+        start_angle = path['startAngle'] * math.pi / 180
+        component = variable[0][2][0][1]
+        result = []
+        for k in range(points):
+            angle = start_angle + 2 * math.pi * k / points
+            delta_r = 0.004 * math.cos(2 * angle + 0.1 * step) + 0.002 * math.cos(4 * angle)
+            value = delta_r * math.cos(angle) if component == 'U1' else delta_r * math.sin(angle)
+            result.append((float(k), value))
+        return result
+
+
+class Session(object):
+    def __init__(self):
+        self.viewports = Repository()
+        self.views = NoOp()
+        self.paths = {}
+        self.odbs = Repository()
+        self.registered_odb = {}
+        self.print_count = 0
+        self.free_body_count = 0
+
+    def register_odb(self, path, odb):
+        self.registered_odb[os.path.normpath(path)] = odb
+
+    def openOdb(self, name, readOnly=True, **kwargs):
+        if os.path.normpath(name) not in self.registered_odb:
+            # odb created by make_gasket_model in another process, rebuild the same model from the placeholder file
+            with open(name, 'rt') as f:
+                parameters = json.loads(f.read()[len('FAKE ODB '):])
+            make_gasket_model(name, **parameters)
+        odb = self.registered_odb[os.path.normpath(name)]
+        odb.closed = False
+        self.odbs[name] = odb
+        return odb
+
+    def Viewport(self, name, **kwargs):
+        if name not in self.viewports:
+            self.viewports[name] = Viewport(name)
+        return self.viewports[name]
+
+    def Path(self, name, **kwargs):
+        self.paths[name] = kwargs
+        return kwargs
+
+    def printToFile(self, fileName, format=None, canvasObjects=()):
+        self.print_count += 1
+        viewport = canvasObjects[0]
+        with open(fileName + '.png', 'wt') as f:
+            f.write('FAKE PNG ' + str(viewport.odbDisplay.step) + ' ' +
+                    ','.join(viewport.odbDisplay.displayGroup.element_sets) + '\n')
+
+    def writeFreeBodyReport(self, fileName, append=True):
+        """
+        free body cut of the displayed gasket sets, see GasketModel.set_force
+        """
+        self.free_body_count += 1
+        viewport = self.viewports.values()[-1]
+        odb = viewport.displayedObject
+        step_index = viewport.odbDisplay.step
+        force = odb.model.set_force(viewport.odbDisplay.displayGroup.element_sets, step_index)
+        mode = 'at' if append else 'wt'
+        with open(fileName, mode) as f:
+            f.write('\n Free body Cut: Z-Plane\n')
+            f.write(' Step = ' + str(step_index + 1) + '\n')
+            f.write(' Frame = ' + str(len(odb.steps.values()[step_index].frames) - 1) + '\n')
+            f.write(' Resultant force = ' + '%15.6e' % 0.0 + '%15.6e' % 0.0 + '%15.6e' % force + '\n')
+            f.write(' Resultant moment = ' + '%15.6e' % 0.0 + '%15.6e' % 0.0 + '%15.6e' % 0.0 + '\n')
+
+
+session = Session()
+
+
+def openOdb(path, readOnly=True, **kwargs):
+    return session.openOdb(name=path, readOnly=readOnly)
+
+
+def install():
+    """
+    register the fake abaqus modules in sys.modules, must be called before lib.common / core.src are imported
+    :return:            the fake session
+    """
+    modules = {}
+    for name in ['abaqus', 'abaqusConstants', 'viewerModules', 'odbAccess', 'odbMaterial', 'odbSection',
+                 'visualization', 'displayGroupOdbToolset']:
+        modules[name] = types.ModuleType(name)
+    for key, value in CONSTANTS.items():
+        setattr(modules['abaqusConstants'], key, value)
+    modules['abaqus'].session = session
+    modules['abaqus'].xyPlot = XYPlot()
+    modules['odbAccess'].openOdb = openOdb
+    modules['odbAccess'].Odb = Odb
+    modules['odbSection'].GasketSectionType = GasketSectionType
+    modules['odbSection'].HomogeneousSolidSectionType = HomogeneousSolidSectionType
+    modules['displayGroupOdbToolset'].LeafFromElementSets = LeafFromElementSets
+    for name, module in modules.items():
+        sys.modules[name] = module
+    return session
+
+
+# ======================================================================================================================
+# model generator
+# ======================================================================================================================
+class GasketModel(object):
+    """
+    synthetic gasket model, all the mesh and field data are generated from the parameters.
+        cylinder_count:     number of cylinders, pitch 93mm, bore radius 42mm
+        element_count:      total gasket elements (GK3D8), split into 3 radial rings per cylinder:
+                            STOPPER, FB, BODY
+        node_count:         total nodes in the model, engine nodes are added until reached
+        cycle_count:        number of firing cycles, each cycle has 1 fixed step + 1 firing step per cylinder
+        step_count:         total steps, at least 2 + cycle_count * (cylinder_count + 1)
+        engine_set_count:   number of engine element sets, half above (head), half below (block) the gasket
+        instance_split:     True for the assembly of GASKET-1 and ENGINE-1, False for one instance PART-1-1
+        pressure:           uniform gasket S11 (MPa) of all the steps, the free body report is then the closed form
+                            pressure * area of the sets, None for the S11 field of the cylinders
+    """
+    RING_NAMES = ['STOPPER', 'FB', 'BODY']
+    PITCH = 93.0
+    BORE_RADIUS = 42.0
+    RING_START = 43.0
+    RING_WIDTH = 1.5
+    THICKNESS = 1.0
+    BORE_LAYERS = 5
+    BORE_POINTS = 36
+    FATIGUE_PRELOAD = [0.0, 0.1, 0.2, 0.3, 0.4]
+    FATIGUE_FIXLOAD = [20.0, 40.0, 60.0, 80.0, 100.0, 150.0]
+
+    def __init__(self, element_count=2000, node_count=None, step_count=None, cylinder_count=4, cycle_count=3,
+                 engine_set_count=6, engine_element_count=500, seed=0, instance_split=False, pressure=None):
+        self.cylinder_count = cylinder_count
+        self.pressure = pressure
+        self.instance_split = instance_split
+        self.cycle_count = cycle_count
+        self.fixed_step = [3 + i * (cylinder_count + 1) for i in range(cycle_count)]
+        required_steps = 2 + cycle_count * (cylinder_count + 1)
+        self.step_count = max(step_count or required_steps, required_steps)
+        self.rng = np.random.RandomState(seed)
+        self.bore_center_x = [i * self.PITCH for i in range(cylinder_count)]
+        self.nodes = []
+        self.elements = []
+        self.element_sets = OrderedDict()
+        self.node_sets = OrderedDict()
+        self._build_gasket(element_count)
+        self._build_engine(node_count, engine_set_count, engine_element_count)
+        if instance_split:
+            for item in self.gasket_nodes + self.gasket_elements:
+                item.instanceName = GASKET_INSTANCE
+            for item in self.nodes[len(self.gasket_nodes):] + self.engine_elements:
+                item.instanceName = ENGINE_INSTANCE
+        self._build_arrays()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # mesh
+    # ------------------------------------------------------------------------------------------------------------------
+    def _build_gasket(self, element_count):
+        ring_count = len(self.RING_NAMES)
+        around = max(8, int(math.ceil(float(element_count) / (self.cylinder_count * ring_count))))
+        self.around = around
+        node_label = GASKET_NODE_START
+        element_label = GASKET_ELEMENT_START
+        gasket_nodes = []
+        for name in self.RING_NAMES:
+            self.element_sets[name] = []
+        for cylinder, center_x in enumerate(self.bore_center_x):
+            grid = {}
+            for layer, z in enumerate([0.0, self.THICKNESS]):
+                for r in range(ring_count + 1):
+                    radius = self.RING_START + r * self.RING_WIDTH
+                    for i in range(around):
+                        angle = 2 * math.pi * i / around
+                        coordinates = np.array([center_x + radius * math.cos(angle), radius * math.sin(angle), z],
+                                               dtype=np.float32)
+                        node = OdbMeshNode(node_label, coordinates)
+                        gasket_nodes.append(node)
+                        grid[(layer, r, i)] = node_label
+                        node_label += 1
+            for r, name in enumerate(self.RING_NAMES):
+                for i in range(around):
+                    j = (i + 1) % around
+                    connectivity = (grid[(0, r, i)], grid[(0, r, j)], grid[(0, r + 1, j)], grid[(0, r + 1, i)],
+                                    grid[(1, r, i)], grid[(1, r, j)], grid[(1, r + 1, j)], grid[(1, r + 1, i)])
+                    element = OdbMeshElement(element_label, GASKET_ELEMENT_TYPE, connectivity)
+                    self.elements.append(element)
+                    self.element_sets[name].append(element)
+                    element_label += 1
+        self.gasket_nodes = gasket_nodes
+        self.nodes.extend(gasket_nodes)
+        self.gasket_elements = list(self.elements)
+
+    def _build_engine(self, node_count, engine_set_count, engine_element_count):
+        # bore liner nodes, used by manually bore distortion
+        node_label = 1
+        bore_nodes = []
+        for center_x in self.bore_center_x:
+            for layer in range(self.BORE_LAYERS):
+                z = -5.0 - 10.0 * layer
+                for k in range(self.BORE_POINTS):
+                    angle = 2 * math.pi * k / self.BORE_POINTS
+                    coordinates = np.array([center_x + self.BORE_RADIUS * math.cos(angle),
+                                            self.BORE_RADIUS * math.sin(angle), z], dtype=np.float32)
+                    bore_nodes.append(OdbMeshNode(node_label, coordinates))
+                    node_label += 1
+        self.node_sets['NBORE'] = bore_nodes
+        self.nodes.extend(bore_nodes)
+        # engine structured grid, half above the gasket, half below
+        if node_count is None:
+            node_count = len(self.nodes) + 8 * engine_element_count
+        engine_node_count = max(node_count - len(self.nodes), 16)
+        layer_count = 2
+        per_side = int(math.ceil(engine_node_count / 2.0))
+        columns = max(2, int(math.ceil((per_side / float(layer_count)) ** 0.5)))
+        x_max = self.bore_center_x[-1] + self.PITCH / 2
+        engine_nodes = []
+        side_grid = []
+        for side, z_values in enumerate([(1.0, 50.0), (-1.0, -50.0)]):
+            grid = {}
+            side_limit = min(engine_node_count, (side + 1) * per_side)
+            for layer in range(layer_count):
+                for i in range(columns):
+                    for j in range(columns):
+                        if len(engine_nodes) >= side_limit:
+                            break
+                        coordinates = np.array([-self.PITCH / 2 + (x_max + self.PITCH / 2) * i / (columns - 1),
+                                                -50.0 + 100.0 * j / (columns - 1), z_values[layer]], dtype=np.float32)
+                        node = OdbMeshNode(node_label, coordinates)
+                        engine_nodes.append(node)
+                        grid[(layer, i, j)] = node_label
+                        node_label += 1
+            side_grid.append(grid)
+        self.nodes.extend(engine_nodes)
+        self.engine_nodes = engine_nodes
+        # engine elements, hexahedron between the two layers of each side
+        element_label = 1
+        engine_elements = [[], []]
+        for side in range(2):
+            grid = side_grid[side]
+            for i in range(columns - 1):
+                for j in range(columns - 1):
+                    if len(engine_elements[side]) >= engine_element_count // 2:
+                        break
+                    keys = [(0, i, j), (0, i + 1, j), (0, i + 1, j + 1), (0, i, j + 1),
+                            (1, i, j), (1, i + 1, j), (1, i + 1, j + 1), (1, i, j + 1)]
+                    if not all([key in grid for key in keys]):
+                        continue
+                    element = OdbMeshElement(element_label, ENGINE_ELEMENT_TYPE, tuple([grid[key] for key in keys]))
+                    engine_elements[side].append(element)
+                    element_label += 1
+        self.engine_elements = engine_elements[0] + engine_elements[1]
+        self.elements.extend(self.engine_elements)
+        up_count = max(1, engine_set_count // 2)
+        down_count = max(1, engine_set_count - up_count)
+        for side, prefix, count in [(0, 'HEAD', up_count), (1, 'BLOCK', down_count)]:
+            elements = engine_elements[side]
+            size = max(1, int(math.ceil(len(elements) / float(count))))
+            for k in range(count):
+                chunk = elements[k * size:(k + 1) * size]
+                if chunk:
+                    self.element_sets[prefix + '_' + str(k + 1)] = chunk
+        # bolt nodes, two bolts between two cylinders
+        bolt_nodes = []
+        for k in range(2 * self.cylinder_count + 2):
+            bolt_nodes.append(engine_nodes[(k * 7919) % len(engine_nodes)])
+        self.node_sets['PRELOAD_NODES'] = bolt_nodes
+        # cam nodes, one row of head nodes along x
+        cam_nodes = [node for node in engine_nodes if abs(node.coordinates[1] + 50.0) < 1e-3 and
+                     node.coordinates[2] > 40.0]
+        self.cam_nodes = cam_nodes[:12]
+
+    def _build_arrays(self):
+        """
+        arrays used to generate the field output of each step
+        """
+        self.node_labels = np.array([node.label for node in self.nodes], dtype=np.int64)
+        self.node_coord = np.array([node.coordinates for node in self.nodes], dtype=np.float64)
+        node_row = dict((label, i) for i, label in enumerate(self.node_labels))
+        element_labels = []
+        element_node_labels = []
+        for element in self.elements:
+            element_labels.extend([element.label] * len(element.connectivity))
+            element_node_labels.extend(element.connectivity)
+        self.en_element = np.array(element_labels, dtype=np.int64)
+        self.en_node = np.array(element_node_labels, dtype=np.int64)
+        self.en_coord = self.node_coord[[node_row[label] for label in element_node_labels]]
+        self.en_gasket = self.en_element >= GASKET_ELEMENT_START
+        # instance of each node and element-node row, None for the single instance
+        self.node_instance = None
+        self.en_instance = None
+        if self.instance_split:
+            self.node_instance = np.where(self.node_labels >= GASKET_NODE_START, GASKET_INSTANCE, ENGINE_INSTANCE)
+            self.en_instance = np.where(self.en_gasket, GASKET_INSTANCE, ENGINE_INSTANCE)
+        # cylinder and angle for each element-node
+        x = self.en_coord[:, 0]
+        bore_x = np.array(self.bore_center_x)
+        self.en_cylinder = np.argmin(np.abs(x[:, None] - bore_x[None, :]), axis=1)
+        dx = x - bore_x[self.en_cylinder]
+        dy = self.en_coord[:, 1]
+        self.en_angle = np.arctan2(dy, dx)
+        self.en_radius = np.sqrt(dx ** 2 + dy ** 2)
+        self.en_noise = self.rng.uniform(-1.0, 1.0, len(self.en_node))
+        # top gasket nodes have contact output
+        gasket_node_labels = np.array([node.label for node in self.gasket_nodes], dtype=np.int64)
+        gasket_node_z = np.array([node.coordinates[2] for node in self.gasket_nodes])
+        self.contact_labels = gasket_node_labels[gasket_node_z > self.THICKNESS / 2]
+        contact_rows = [node_row[label] for label in self.contact_labels]
+        self.contact_coord = self.node_coord[contact_rows]
+        # element area for free body report, 4 bottom nodes
+        self.element_area = {}
+        for element in self.gasket_elements:
+            coord = self.node_coord[[node_row[label] for label in element.connectivity[:4]]]
+            x, y = coord[:, 0], coord[:, 1]
+            self.element_area[element.label] = 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # field data
+    # ------------------------------------------------------------------------------------------------------------------
+    def _firing_cylinder(self, step_index):
+        """
+        :return:    cycle number, firing cylinder number (-1 for fixed step, None out of cycles)
+        """
+        step = step_index + 1
+        for cycle, fixed in enumerate(self.fixed_step):
+            if fixed <= step <= fixed + self.cylinder_count:
+                return cycle, step - fixed - 1
+        return None, None
+
+    def _cylinder_loss(self, step_index, cylinder, angle):
+        cycle, firing = self._firing_cylinder(step_index)
+        if firing is None or firing < 0:
+            return 0.0
+        distance = np.abs(cylinder - firing)
+        return 15.0 * np.exp(-distance) * (1.0 + 0.3 * np.cos(angle))
+
+    def gasket_load(self, step_index):
+        """
+        S11 for all element-nodes, engine elements have small random stress
+        """
+        angle = self.en_angle
+        base = 60.0 + 20.0 * np.cos(2 * angle) + 5.0 * (self.en_radius - self.RING_START) + 2.0 * self.en_noise
+        step = step_index + 1
+        cycle, firing = self._firing_cylinder(step_index)
+        if step == 1:
+            factor = 1.0
+        elif step == 2:
+            factor = 0.95
+        elif cycle is not None:
+            factor = 0.9 - 0.02 * cycle
+        else:
+            factor = 0.85
+        s11 = base * factor - self._cylinder_loss(step_index, self.en_cylinder, angle)
+        if self.pressure is not None:
+            s11 = np.full(len(self.en_gasket), float(self.pressure))
+        s11 = np.where(self.en_gasket, s11, 10.0 * self.en_noise)
+        return s11
+
+    def field_outputs(self, step_index):
+        fields = Repository()
+        step = step_index + 1
+        # nodal displacement
+        coord = self.node_coord
+        temperature = 20.0 + 80.0 * min(step, 3) / 3.0
+        u = np.empty((len(self.node_labels), 3), dtype=np.float32)
+        u[:, 0] = 1.1e-5 * (temperature - 20.0) * coord[:, 0] * 0.01
+        u[:, 1] = 1.1e-5 * (temperature - 20.0) * coord[:, 1] * 0.01
+        u[:, 2] = -0.001 * step + 0.0005 * np.cos(coord[:, 0] / 20.0)
+        radius = np.sqrt((coord[:, 0] - np.round(coord[:, 0] / self.PITCH) * self.PITCH) ** 2 + coord[:, 1] ** 2)
+        bore = np.abs(radius - self.BORE_RADIUS) < 1e-3
+        angle = np.arctan2(coord[:, 1], coord[:, 0] - np.round(coord[:, 0] / self.PITCH) * self.PITCH)
+        delta_r = 0.004 * np.cos(2 * angle + 0.1 * step) + 0.002 * np.cos(4 * angle)
+        u[bore, 0] = delta_r[bore] * np.cos(angle[bore])
+        u[bore, 1] = delta_r[bore] * np.sin(angle[bore])
+        fields['U'] = FieldOutput('U', 'NODAL', self.node_labels, None, u, ('U1', 'U2', 'U3'), self.node_instance)
+        fields['NT11'] = FieldOutput('NT11', 'NODAL', self.node_labels, None,
+                                     (temperature + 0.1 * coord[:, 2]).astype(np.float32), (), self.node_instance)
+        # contact output, top gasket face only
+        contact = self.contact_coord
+        c_angle = np.arctan2(contact[:, 1], contact[:, 0])
+        cycle, firing = self._firing_cylinder(step_index)
+        shift = 0.0 if firing is None else 0.001 * (firing + 2)
+        contact_instance = None
+        if self.instance_split:
+            contact_instance = np.full(len(self.contact_labels), GASKET_INSTANCE)
+        fields['CSHEAR1'] = FieldOutput('CSHEAR1', 'NODAL', self.contact_labels, None,
+                                        (5.0 * np.cos(c_angle) * (1 + shift)).astype(np.float32), (),
+                                        contact_instance)
+        fields['CSHEAR2'] = FieldOutput('CSHEAR2', 'NODAL', self.contact_labels, None,
+                                        (5.0 * np.sin(c_angle) * (1 + shift)).astype(np.float32), (),
+                                        contact_instance)
+        fields['CSLIP1'] = FieldOutput('CSLIP1', 'NODAL', self.contact_labels, None,
+                                       (0.002 * np.sin(c_angle) * step * 0.1 + shift * np.cos(c_angle)).astype(
+                                           np.float32), (), contact_instance)
+        fields['CSLIP2'] = FieldOutput('CSLIP2', 'NODAL', self.contact_labels, None,
+                                       (0.002 * np.cos(c_angle) * step * 0.1 + shift * np.sin(c_angle)).astype(
+                                           np.float32), (), contact_instance)
+        fields['CSTATUS'] = FieldOutput('CSTATUS', 'NODAL', self.contact_labels, None,
+                                        np.where(np.abs(c_angle) < 0.3, 1.0, 2.0).astype(np.float32), (),
+                                        contact_instance)
+        # element nodal stress and strain, gasket S11 is the through thickness pressure, E11 the closure
+        s11 = self.gasket_load(step_index)
+        s = np.zeros((len(self.en_node), 3), dtype=np.float32)
+        s[:, 0] = s11
+        e = np.zeros((len(self.en_node), 3), dtype=np.float32)
+        e[:, 0] = np.where(self.en_gasket, 0.1 + s11 / 400.0, s11 / 70000.0)
+        fields['S'] = FieldOutput('S', 'ELEMENT_NODAL', self.en_node, self.en_element, s, ('S11', 'S12', 'S13'),
+                                  self.en_instance)
+        fields['E'] = FieldOutput('E', 'ELEMENT_NODAL', self.en_node, self.en_element, e, ('E11', 'E12', 'E13'),
+                                  self.en_instance)
+        return fields
+
+    def history_regions(self, step_index, increment_count=4):
+        regions = Repository()
+        for k, node in enumerate(self.node_sets['PRELOAD_NODES']):
+            region = HistoryRegion('Node ' + node.instanceName + '.' + str(node.label))
+            preload = 30000.0 + 500.0 * k
+            loss = 200.0 * step_index + 50.0 * math.sin(k + step_index)
+            times = np.linspace(0.0, 1.0, increment_count + 1)[1:]
+            data = {
+                'TF1': tuple((float(t), preload - loss * float(t)) for t in times),
+                'TF2': tuple((float(t), 0.01 * preload * float(t)) for t in times),
+                'TF3': tuple((float(t), -0.01 * preload * float(t)) for t in times),
+                'U1': tuple((float(t), 0.05 + 0.001 * step_index * float(t)) for t in times),
+            }
+            for name in ['TF1', 'TF2', 'TF3', 'U1']:
+                region.historyOutputs[name] = HistoryOutput(name, data[name])
+            regions[region.name] = region
+        return regions
+
+    def ring_area(self, label):
+        """
+        area of the gasket element from the ring parameters, the element is a chord quadrilateral of its annulus sector,
+        the node coordinates and the field output are not used
+        """
+        ring = ((label - GASKET_ELEMENT_START) // self.around) % len(self.RING_NAMES)
+        inner = self.RING_START + ring * self.RING_WIDTH
+        outer = inner + self.RING_WIDTH
+        return 0.5 * math.sin(2 * math.pi / self.around) * (outer ** 2 - inner ** 2)
+
+    def set_force(self, set_names, step_index):
+        """
+        through thickness force of the gasket sets. With uniform pressure, the closed form pressure * ring area of the
+        elements, independent of the S11 output and the element coordinates. Otherwise sum(S11 * area / nodes per
+        element) over all element-nodes, the formula of the direct section force
+        """
+        labels = []
+        for name in set_names:
+            if name in self.element_sets:
+                labels.extend([element.label for element in self.element_sets[name]
+                               if element.type == GASKET_ELEMENT_TYPE])
+        if not labels:
+            return 0.0
+        if self.pressure is not None:
+            return float(self.pressure) * sum([self.ring_area(label) for label in set(labels)])
+        s11 = self.gasket_load(step_index)
+        mask = np.isin(self.en_element, np.array(labels, dtype=np.int64))
+        area = np.array([self.element_area[label] for label in self.en_element[mask]])
+        return float(np.sum(s11[mask].astype(np.float32).astype(np.float64) * area / 8.0))
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # odb and user input
+    # ------------------------------------------------------------------------------------------------------------------
+    def build_odb(self, path):
+        name = os.path.splitext(os.path.basename(path))[0]
+        odb = Odb(name, path, self)
+        if self.instance_split:
+            instances = [OdbInstance(GASKET_INSTANCE, self.gasket_nodes, self.gasket_elements),
+                         OdbInstance(ENGINE_INSTANCE, self.nodes[len(self.gasket_nodes):], self.engine_elements)]
+        else:
+            instances = [OdbInstance(PART_NAME, self.nodes, self.elements)]
+        # sets in the instance of their mesh
+        for set_name, elements in self.element_sets.items():
+            instance = [item for item in instances if item.name == elements[0].instanceName][0]
+            instance.elementSets[set_name] = OdbSet(set_name, elements=elements)
+        for set_name, nodes in self.node_sets.items():
+            instance = [item for item in instances if item.name == nodes[0].instanceName][0]
+            instance.nodeSets[set_name] = OdbSet(set_name, nodes=nodes)
+        odb.rootAssembly = OdbAssembly(instances)
+        for k in range(self.step_count):
+            step_name = 'Step-' + str(k + 1)
+            odb.steps[step_name] = OdbStep(self, step_name, k)
+        # materials
+        loading = ((0.0, 0.0), (20.0, 0.05), (60.0, 0.1), (120.0, 0.14), (200.0, 0.16))
+        unloading = ((0.0, 0.02, 0.02), (40.0, 0.08, 0.02), (120.0, 0.14, 0.02), (200.0, 0.16, 0.16))
+        for set_name in self.RING_NAMES:
+            material = OdbMaterialObject('GASKET-' + set_name)
+            material.gasketThicknessBehavior = OdbProperty(dependencies=0, type=CONSTANTS['DAMAGE'], table=loading,
+                                                           unloadingTable=unloading)
+            material.gasketMembraneElastic = ((1000.0,),)
+            material.gasketTransverseShearElastic = ((600.0,),)
+            material.expansion = OdbProperty(table=((1.15e-05, 20.0),))
+            odb.materials[material.name] = material
+            odb.sections['Section-' + set_name] = GasketSectionType('Section-' + set_name, material.name, 0.05)
+        for material_name in ['ALSI', 'GJL']:
+            material = OdbMaterialObject(material_name)
+            material.elastic = OdbProperty(type=CONSTANTS['ISOTROPIC'], table=((74000.0, 0.33, 20.0),))
+            material.plastic = OdbProperty(table=((200.0, 0.0, 20.0), (260.0, 0.02, 20.0)))
+            material.density = OdbProperty(table=((7.83e-09, 20.0),))
+            material.expansion = OdbProperty(table=((2.1e-05, 20.0),))
+            odb.materials[material_name] = material
+        for set_name in self.element_sets:
+            if set_name not in self.RING_NAMES:
+                material_name = 'ALSI' if set_name.startswith('HEAD') else 'GJL'
+                odb.sections['Section-' + set_name] = HomogeneousSolidSectionType('Section-' + set_name,
+                                                                                  material_name)
+        return odb
+
+    def fatigue_table(self):
+        criteria = 5
+        table = []
+        for i, fixload in enumerate(self.FATIGUE_FIXLOAD):
+            row = []
+            for j, preload in enumerate(self.FATIGUE_PRELOAD):
+                for k in range(criteria):
+                    row.append(round(0.25 + 0.1 * preload + 0.001 * fixload + 0.02 * k, 4))
+            table.append(row)
+        return table
+
+    def input_data(self, server_path, odb_name, bore_distortion=True, cam_distortion=True, relative_motion='YES'):
+        """
+        user input json content, same keys as the web provided json
+        """
+        cylinder_names = [chr(ord('A') + i) for i in range(self.cylinder_count)]
+        x_max = [x + self.PITCH / 2 for x in self.bore_center_x]
+        x_min = [x - self.PITCH / 2 for x in self.bore_center_x]
+        gasket_section = {}
+        for k, set_name in enumerate(self.RING_NAMES):
+            gasket_section[set_name] = ['GASKET-' + set_name, 0.05, k + 1,
+                                        [self.FATIGUE_PRELOAD, self.FATIGUE_FIXLOAD, self.fatigue_table()]]
+        cam_list = []
+        if cam_distortion and self.cam_nodes:
+            cam_list = [',  '.join([str(node.label) for node in self.cam_nodes])]
+        return {
+            'server_path': server_path,
+            'main_input_file': odb_name + '.inp',
+            'fixed_step': self.fixed_step,
+            'firing_name_list': ['Cycle_' + str(i + 1) for i in range(self.cycle_count)],
+            'bolt_node': 'preload_nodes',
+            'report_set': ['FB', 'STOPPER'],
+            'excel_set': ['FB'],
+            'fatigue_set': ['FB', 'BODY', 'STOPPER'],
+            'add_elem_set_name': [],
+            'add_elem_set_list': [],
+            'gasket_section': gasket_section,
+            'ini_assem': 1,
+            'hot_assem': 2,
+            'relative_motion': relative_motion,
+            'total_cylinder_num': self.cylinder_count,
+            'firing_cylinder_name': cylinder_names,
+            'firing_cylinder_x_center': self.bore_center_x,
+            'bore_center_y': 0.0,
+            'firing_cylinder_x_min': x_min,
+            'firing_cylinder_x_max': x_max,
+            'customer': 'BENCH',
+            'project_name': 'SYNTHETIC',
+            'request_number': odb_name,
+            'bore_distortion_step': '2,3' if bore_distortion else '',
+            'bore_distortion_radius': self.BORE_RADIUS,
+            'boredistortion_manually': True,
+            'boredistortion_manually_nodeset': 'nbore',
+            'boredistortion_auto_points': self.BORE_POINTS,
+            'boredistortion_auto_layers': self.BORE_LAYERS,
+            'bore_distortion_order': 4,
+            'boredistortion_auto_linername': None,
+            'boredistortion_auto_starts': -5.0,
+            'boredistortion_auto_ends': -45.0,
+            'cam_distortion_step': '2,3' if cam_distortion else '',
+            'add_cam_node_list': cam_list,
+        }
+
+
+def make_gasket_model(odb_path, **kwargs):
+    """
+    create a synthetic model, register the odb to the fake session.
+    :param odb_path:        full odb file name, a small placeholder file with the model parameters is written, so the
+                            file time and size can be checked as for a real odb, and other processes (distributed
+                            workers) can open the same model
+    :param kwargs:          GasketModel parameters
+    :return:                model, odb, user input dict
+    """
+    model = GasketModel(**kwargs)
+    odb = model.build_odb(odb_path)
+    session.register_odb(odb_path, odb)
+    content = 'FAKE ODB ' + json.dumps(kwargs, sort_keys=True)
+    current = None
+    if os.path.isfile(odb_path):
+        with open(odb_path, 'rt') as f:
+            current = f.read()
+    if current != content:
+        with open(odb_path, 'wt') as f:
+            f.write(content)
+    odb_name = os.path.splitext(os.path.basename(odb_path))[0]
+    return model, odb, model.input_data(os.path.dirname(odb_path), odb_name)
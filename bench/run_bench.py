@@ -0,0 +1,198 @@
+"""
+Scaling benchmark for the post process stages, runs core.src.abaqus_process against synthetic models from
+bench.fake_odb and reads the stage timing from the <odb>_profile.json written by the StageProfiler.
+
+usage (from the project root, no abaqus licence required):
+    python -m bench.run_bench                           run all models, compare with bench/baselines.json
+    python -m bench.run_bench --models small,medium     run selected models
+    python -m bench.run_bench --save                    store the results as new baselines
+    python -m bench.run_bench --tolerance 0.5           stage slower than baseline * 1.5 is reported as regression
+    python -m bench.run_bench --workers 3               distributed extraction with 3 local worker processes
+
+exit code 1 if any stage regressed.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from bench import fake_odb
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# element_count: gasket elements, node_count: total model nodes, steps are derived from cylinders and cycles,
+# instance_split: gasket and engine in two instances
+MODELS = [
+    {'name': 'small', 'element_count': 1200, 'node_count': 10000, 'cylinder_count': 4, 'cycle_count': 2},
+    {'name': 'medium', 'element_count': 6000, 'node_count': 40000, 'cylinder_count': 4, 'cycle_count': 3},
+    {'name': 'large', 'element_count': 24000, 'node_count': 150000, 'cylinder_count': 6, 'cycle_count': 4},
+    {'name': 'steps', 'element_count': 3000, 'node_count': 20000, 'cylinder_count': 4, 'cycle_count': 9},
+    {'name': 'assembly', 'element_count': 1200, 'node_count': 10000, 'cylinder_count': 4, 'cycle_count': 2,
+     'instance_split': True},
+]
+
+# regressions below this absolute time (seconds) are ignored, timer noise
+MIN_REGRESSION_TIME = 0.05
+
+
+def run_model(src, parameters, work_dir):
+    """
+    build one synthetic model, run the whole post process and return the profile
+    :param src:             core.src module, imported after the fake abaqus modules are installed
+    :param parameters:      model parameters, see MODELS
+    :param work_dir:        temporary folder, the log, profile, pictures are written here
+    :return:                dict, {'stages': {name: {'wall', 'cpu', 'peak_rss'}}, 'counts': {...}}
+    """
+    parameters = dict(parameters)
+    name = parameters.pop('name')
+    model_dir = os.path.join(work_dir, name)
+    os.makedirs(model_dir)
+    odb_path = os.path.join(model_dir, 'BENCH-' + name + '.odb')
+    model, odb, input_data = fake_odb.make_gasket_model(odb_path, **parameters)
+    json_file = os.path.join(model_dir, 'BENCH-' + name + '_userinput.json')
+    with open(json_file, 'wt') as f:
+        json.dump(input_data, f)
+
+    stdout = sys.stdout
+    with open(os.path.join(model_dir, 'stdout.txt'), 'wt') as f:
+        sys.stdout = f
+        try:
+            src.abaqus_process(json_file)
+        finally:
+            sys.stdout = stdout
+
+    with open(os.path.join(model_dir, 'BENCH-' + name + '_profile.json'), 'rt') as f:
+        profile = json.load(f)
+    result = {'stages': {}, 'order': [], 'counts': profile['counts'], 'peak_rss': profile['peak_rss'],
+              'model': {'elements': len(model.gasket_elements), 'nodes': len(model.nodes),
+                        'steps': model.step_count, 'cylinders': model.cylinder_count, 'cycles': model.cycle_count}}
+    for stage in profile['stages']:
+        if stage['parent'] is None:
+            result['order'].append(stage['name'])
+            result['stages'][stage['name']] = {'wall': stage['wall'], 'cpu': stage['cpu'],
+                                               'peak_rss': stage['peak_rss']}
+    return result
+
+
+def compare(results, baselines, tolerance):
+    """
+    :return:        list of regression messages
+    """
+    regressions = []
+    for model_name, result in sorted(results.items()):
+        if model_name not in baselines:
+            continue
+        base_stages = baselines[model_name]['stages']
+        for stage, value in sorted(result['stages'].items()):
+            if stage not in base_stages:
+                continue
+            base = base_stages[stage]['wall']
+            if value['wall'] > base * (1 + tolerance) and value['wall'] - base > MIN_REGRESSION_TIME:
+                regressions.append('%-10s %-32s %10.3fs -> %10.3fs (%+.0f%%)' %
+                                   (model_name, stage, base, value['wall'], 100.0 * (value['wall'] / base - 1)))
+    return regressions
+
+
+def print_table(results, baselines):
+    stages = []
+    for result in results.values():
+        for stage in result['order']:
+            if stage not in stages:
+                stages.append(stage)
+    model_names = [model['name'] for model in MODELS if model['name'] in results]
+    print ('STAGE'.ljust(32) + ''.join([name.rjust(14) + 'BASE'.rjust(10) for name in model_names]))
+    for stage in stages:
+        line = stage.ljust(32)
+        for name in model_names:
+            value = results[name]['stages'].get(stage, {}).get('wall', 0.0)
+            base = baselines.get(name, {}).get('stages', {}).get(stage, {}).get('wall')
+            line += '%14.3f' % value + ('%10.3f' % base if base is not None else '-'.rjust(10))
+        print (line)
+    line = 'PEAK RSS (MB)'.ljust(32)
+    for name in model_names:
+        peak = results[name]['peak_rss']
+        line += ('%14.1f' % peak if peak is not None else '-'.rjust(14)) + ''.rjust(10)
+    print (line)
+
+
+def serve_queue(queue_dir):
+    """
+    distributed extraction worker on the synthetic odb, started by --workers
+    """
+    fake_odb.install()
+    from conf import setting
+    from lib import distribute
+    setting.environment_key['CACHE_TIME'] = 0
+    setting.environment_key['DISTRIBUTED_POLL_INTERVAL'] = 0.1
+    return distribute.work(queue_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='post process scaling benchmark on synthetic odb')
+    parser.add_argument('--models', default=','.join([model['name'] for model in MODELS]))
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--keep', action='store_true', help='keep the temporary output folder')
+    parser.add_argument('--workers', type=int, default=0, help='local worker processes of distributed extraction')
+    parser.add_argument('--serve-queue', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve_queue:
+        serve_queue(args.serve_queue)
+        return 0
+
+    fake_odb.install()
+    from conf import setting
+    from core import src
+    # set creation is instant on the stand-in, no need to wait
+    setting.environment_key['CACHE_TIME'] = 0
+    setting.environment_key['LOG_FLUSH_INTERVAL'] = 0
+
+    selected = args.models.split(',')
+    baselines = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'rt') as f:
+            baselines = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix='chg_bench_')
+    results = {}
+    workers = []
+    if args.workers:
+        queue_dir = os.path.join(work_dir, 'queue')
+        os.makedirs(queue_dir)
+        setting.environment_key['DISTRIBUTED_DIR'] = queue_dir
+        setting.environment_key['DISTRIBUTED_POLL_INTERVAL'] = 0.1
+        for i in range(args.workers):
+            workers.append(subprocess.Popen([sys.executable, '-m', 'bench.run_bench', '--serve-queue', queue_dir]))
+    try:
+        for parameters in MODELS:
+            if parameters['name'] in selected:
+                results[parameters['name']] = run_model(src, parameters, work_dir)
+    finally:
+        if workers:
+            with open(os.path.join(queue_dir, 'STOP'), 'wt') as f:
+                f.write('')
+            for worker in workers:
+                worker.wait()
+        if args.keep:
+            print ('OUTPUT KEPT IN ' + work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results, baselines)
+    regressions = compare(results, baselines, args.tolerance)
+    for item in regressions:
+        print ('REGRESSION: ' + item)
+    if args.save:
+        baselines.update(results)
+        with open(args.baseline, 'wt') as f:
+            json.dump(baselines, f, indent=1, sort_keys=True)
+        print ('BASELINES SAVED TO ' + args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+check of the direct section force (SECTION_FORCE_MODE = 'direct', compute.sectionforce), runs core.src.abaqus_process
+on the synthetic models of bench.run_bench in both modes and compares the force of each gasket set and step, in two
+cases:
+    closed_form     uniform gasket pressure, the free body report of the synthetic odb is the closed form pressure *
+                    ring area of the set elements, computed from the model parameters without the S11 output and the
+                    element coordinates, an independent reference of the direct force
+    plumbing        S11 field of the cylinders, the free body report is S11 * element area, the formula of the direct
+                    mode, the check covers the set and step selection, the instance grouping and the report format
+Neither case shows that the direct mode agrees with the abaqus free body cut of a real odb (non uniform pressure at the
+element edges, cut through other parts), which is why 'free_body' stays the default.
+
+usage (from the project root, no abaqus licence required):
+    python -m bench.section_force                       run all models
+    python -m bench.section_force --models small --limit 1e-6
+                                                        exit code 1 if any relative deviation is over 1e-6
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from bench import accuracy
+from bench import fake_odb
+from bench import run_bench
+
+# gasket S11 (MPa) of the closed form case
+UNIFORM_PRESSURE = 50.0
+# (case name, uniform pressure)
+CASES = [('closed_form', UNIFORM_PRESSURE), ('plumbing', None)]
+
+
+def run_mode(src, setting, parameters, work_dir, mode, pressure=None):
+    """
+    :param pressure:            uniform gasket pressure of the model, None for the S11 field of the cylinders
+    :return:                    (SECTION_FORCE of the run, free body report count)
+    """
+    setting.environment_key['SECTION_FORCE_MODE'] = mode
+    parameters = dict(parameters)
+    name = parameters.pop('name')
+    parameters['pressure'] = pressure
+    model_dir = os.path.join(work_dir, name + '_' + mode + ('_uniform' if pressure is not None else ''))
+    os.makedirs(model_dir)
+    odb_path = os.path.join(model_dir, 'SFORCE-' + name + '.odb')
+    model, odb, input_data = fake_odb.make_gasket_model(odb_path, **parameters)
+    json_file = os.path.join(model_dir, 'SFORCE-' + name + '_userinput.json')
+    with open(json_file, 'wt') as f:
+        json.dump(input_data, f)
+    free_body_count = fake_odb.session.free_body_count
+    stdout = sys.stdout
+    with open(os.path.join(model_dir, 'stdout.txt'), 'wt') as f:
+        sys.stdout = f
+        try:
+            process_setting = src.abaqus_process(json_file)
+        finally:
+            sys.stdout = stdout
+    return process_setting['SECTION_FORCE'], fake_odb.session.free_body_count - free_body_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='direct section force check on synthetic odb')
+    parser.add_argument('--models', default=','.join([model['name'] for model in run_bench.MODELS]))
+    parser.add_argument('--limit', type=float, default=None, help='max relative deviation allowed')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary output folder')
+    args = parser.parse_args(argv)
+
+    fake_odb.install()
+    from conf import setting
+    from core import src
+    setting.environment_key['CACHE_TIME'] = 0
+    setting.environment_key['LOG_FLUSH_INTERVAL'] = 0
+
+    selected = args.models.split(',')
+    work_dir = tempfile.mkdtemp(prefix='chg_sforce_')
+    failed = []
+    try:
+        print ('MODEL'.ljust(10) + 'CASE'.ljust(14) + 'SET'.ljust(28) + 'STEPS'.rjust(8) + 'MAX ABS DEV'.rjust(16) +
+               'MAX REL DEV'.rjust(16))
+        for parameters in run_bench.MODELS:
+            if parameters['name'] not in selected:
+                continue
+            for case, pressure in CASES:
+                reference, reports = run_mode(src, setting, parameters, work_dir, 'free_body', pressure)
+                result, direct_reports = run_mode(src, setting, parameters, work_dir, 'direct', pressure)
+                for set_name in reference:
+                    missing = [float('nan')] * len(reference[set_name])
+                    absolute, relative, count = accuracy.deviation(reference[set_name], result.get(set_name, missing))
+                    print (parameters['name'].ljust(10) + case.ljust(14) + set_name.ljust(28) + str(count).rjust(8) +
+                           ('%16.3e' % absolute) + ('%16.3e' % relative))
+                    if args.limit is not None and (relative > args.limit or count != len(reference[set_name])):
+                        failed.append(parameters['name'] + ' ' + case + ' ' + set_name)
+                print (parameters['name'].ljust(10) + case.ljust(14) + 'FREE BODY REPORTS: ' + str(reports) +
+                       ' FREE BODY, ' + str(direct_reports) + ' DIRECT')
+    finally:
+        if args.keep:
+            print ('OUTPUT KEPT IN ' + work_dir)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    for item in failed:
+        print ('OVER LIMIT: ' + item)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
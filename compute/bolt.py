@@ -0,0 +1,46 @@
+"""
+bolt force history of the BOLT_NODESET nodes, read by get_bolt_force for every step with all the increments
+(lib.extract.read_history), and the bolt load loss from the initial assembly to each firing cycle. The cycle of a fixed
+step is the step window of compute.window, the fixed step and the firing steps of all the cylinders.
+
+BOLT_HISTORY:
+    'NODES'         bolt node labels
+    'OUTPUTS'       history output names, TF1 first
+    'TIME'          list of float arrays [increment] of each step, step time
+    <output>        list of float arrays [bolt, increment] of each step, NaN if the output is not in the odb
+"""
+import numpy as np
+
+
+def end_values(history, output='TF1'):
+    """
+    :return:                    list [step][bolt], value at the last increment of each step
+    """
+    return [values[:, -1].tolist() if values.shape[1] else [float('nan')] * len(values)
+            for values in history[output]]
+
+
+def load_loss(history, init_assem, fixed_step, cylinder_num, output='TF1'):
+    """
+    :param init_assem:          initial assembly step, start from 1
+    :param fixed_step:          list of fixed steps, start from 1, one cycle each
+    :param cylinder_num:        firing cylinder count
+    :return:                    dict, 'ASSEMBLY' [bolt] force at the end of initial assembly, 0 if the step is not
+                                read or has no increment, 'MIN' [cycle, bolt] min force over all the increments of the
+                                cycle, 'LOSS' [cycle, bolt] assembly - min, 'LOSS_RATIO' [cycle, bolt] loss / assembly,
+                                NaN for an assembly force of 0
+    """
+    steps = history[output]
+    bolt_count = len(history['NODES'])
+    assembly = np.zeros(bolt_count)
+    if 0 < init_assem <= len(steps) and steps[init_assem - 1].shape[1]:
+        assembly = steps[init_assem - 1][:, -1].astype(np.float64)
+    minimum = np.full((len(fixed_step), bolt_count), np.nan)
+    for i, oper_step in enumerate(fixed_step):
+        window = steps[oper_step - 1:min(oper_step + cylinder_num, len(steps))]
+        values = [item for item in window if item.shape[1]]
+        if values:
+            minimum[i] = np.nanmin(np.concatenate(values, axis=1), axis=1)
+    loss = assembly[None, :] - minimum
+    ratio = loss / np.where(np.abs(assembly) > 1e-12, assembly, np.nan)[None, :]
+    return {'ASSEMBLY': assembly, 'MIN': minimum, 'LOSS': loss, 'LOSS_RATIO': ratio}
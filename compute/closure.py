@@ -0,0 +1,77 @@
+"""
+gasket closure from the loading curves of the gasket thickness behavior (GasketMaterial.loading). The curves of each
+material are compiled once to monotone piecewise linear arrays, the element nodes of one material are evaluated
+together with np.interp.
+
+For each element node and fixed step window:
+    closure             closure on the loading curve at the max S11 of the window
+    closure margin      last closure of the curve - max E11 of the window, negative if the closure is over the curve
+    pressure margin     last pressure of the curve - max S11 of the window, remaining sealing capacity
+The curves are monotone, the max over the steps of the window of the closure on the curve and the min of the margins
+are given by the max S11, max E11 of the window, the values kept in both modes (compute.window).
+"""
+import numpy as np
+
+
+def compile_curve(table):
+    """
+    :param table:               list of (pressure, closure) of one dependency, as GasketMaterial.loading
+    :return:                    (closure, pressure) float arrays, both increasing, None if the table is empty
+    """
+    table = np.asarray([item[:2] for item in table], dtype=np.float64).reshape(-1, 2)
+    if not len(table):
+        return None
+    order = np.argsort(table[:, 1], kind='mergesort')
+    closure = table[order, 1]
+    pressure = np.maximum.accumulate(table[order, 0])
+    # np.interp needs increasing abscissa in both directions, repeated points are removed
+    keep = np.ones(len(closure), dtype=bool)
+    keep[1:] = (np.diff(closure) > 0) & (np.diff(pressure) > 0)
+    return closure[keep], pressure[keep]
+
+
+def compile_material(loading):
+    """
+    :param loading:             GasketMaterial.loading, [table of each dependency]
+    :return:                    list of compiled curves of each dependency, see compile_curve
+    """
+    return [compile_curve(table) for table in loading]
+
+
+def evaluate(curve, s11, e11):
+    """
+    :param curve:               (closure, pressure) from compile_curve
+    :param s11:                 float array, any shape, gasket pressure
+    :param e11:                 float array, same shape, gasket closure
+    :return:                    (closure on the loading curve, closure margin, pressure margin), arrays of s11 shape
+    """
+    closure, pressure = curve
+    s11 = np.asarray(s11, dtype=np.float64)
+    e11 = np.asarray(e11, dtype=np.float64)
+    return np.interp(s11, pressure, closure), closure[-1] - e11, pressure[-1] - s11
+
+
+def evaluate_windows(curves, rows, s11_max, e11_max, dependency=0):
+    """
+    one pass for all the element nodes, grouped by material
+    :param curves:              dict, {material name: compile_material result}
+    :param rows:                material name of each row
+    :param s11_max:             float array [window, row], max S11 of the window
+    :param e11_max:             float array [window, row], max E11 of the window
+    :param dependency:          curve of the dependency used, the field variable of the elements is not in the odb
+    :return:                    float array [3, window, row], closure, closure margin, pressure margin, NaN for the rows
+                                without a loading curve
+    """
+    s11_max = np.asarray(s11_max, dtype=np.float64)
+    e11_max = np.asarray(e11_max, dtype=np.float64)
+    result = np.full((3,) + s11_max.shape, np.nan)
+    rows = np.asarray(rows)
+    for material in np.unique(rows) if len(rows) else []:
+        compiled = curves.get(material) or []
+        if dependency >= len(compiled) or compiled[dependency] is None:
+            continue
+        index = np.flatnonzero(rows == material)
+        values = evaluate(compiled[dependency], s11_max[:, index], e11_max[:, index])
+        for k in range(3):
+            result[k][:, index] = values[k]
+    return result
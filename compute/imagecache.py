@@ -0,0 +1,148 @@
+"""
+cache of the thermal map and gasket images (RENDER_CACHE_DIR), a rerun of the same odb with only fatigue or report set
+changes reuses the images instead of printing them again. The key is the sha1 of the image parameters: odb identity
+(path, size, modification time), step, frame, display sets, view (position, TEMPERATURE_ZOOM, TEMPERATURE_XPAN,
+TEMPERATURE_ROTATE), variable and the backend. A cached image is hard linked to the output file, or copied if the file
+system has no hard link. The least recently used images are removed when the cache is over RENDER_CACHE_MB.
+
+cache folder:
+    <key>.png
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from conf import setting
+
+# change if the image of the same parameters is drawn differently
+CACHE_VERSION = 1
+
+
+def open_cache():
+    """
+    :return:                    ImageCache of RENDER_CACHE_DIR, None if the cache is not used
+    """
+    if not setting.environment_key['RENDER_CACHE_DIR']:
+        return None
+    return ImageCache(setting.environment_key['RENDER_CACHE_DIR'], setting.environment_key['RENDER_CACHE_MB'])
+
+
+def odb_identity(odb_file):
+    """
+    :return:                    list of real path, size and modification time, a new odb file gives a new identity
+    """
+    status = os.stat(odb_file)
+    return [os.path.realpath(odb_file), status.st_size, int(status.st_mtime)]
+
+
+def image_key(**fields):
+    """
+    :param fields:              image parameters, json serializable
+    :return:                    hex digest
+    """
+    fields['version'] = CACHE_VERSION
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _link(source, target):
+    """
+    link or copy source to target through a temporary file of a unique name, jobs storing the same image at the same
+    time do not share the temporary file
+    """
+    handle, temp_file = tempfile.mkstemp(prefix=os.path.basename(target) + '.', suffix='.tmp',
+                                         dir=os.path.dirname(os.path.abspath(target)))
+    os.close(handle)
+    try:
+        try:
+            os.remove(temp_file)
+            os.link(source, temp_file)
+        except (AttributeError, OSError):
+            # no os.link on windows python 2, or another file system
+            shutil.copyfile(source, temp_file)
+        if os.path.isfile(target):
+            os.remove(target)
+        os.rename(temp_file, target)
+    finally:
+        if os.path.isfile(temp_file):
+            os.remove(temp_file)
+
+
+class ImageCache(object):
+
+    def __init__(self, cache_dir, max_mb):
+        """
+        :param cache_dir:           cache folder, created if not exist
+        :param max_mb:              MB, total size of the images kept by evict
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.png')
+
+    def fetch(self, key, target_file):
+        """
+        :param target_file:         output png file
+        :return:                    True if the cached image is linked to target_file. If False, target_file is
+                                    removed, an image printed in place does not change a linked cache file
+        """
+        cache_file = self.path(key)
+        try:
+            _link(cache_file, target_file)
+            # modification time is the last use of the image
+            os.utime(cache_file, None)
+        except (IOError, OSError):
+            # not cached, or removed by the eviction of another job
+            self.misses += 1
+            if os.path.isfile(target_file):
+                os.remove(target_file)
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key, source_file):
+        """
+        :param source_file:         printed png file, linked to the cache
+        :return:                    True if stored, a failed store (file removed or replaced by another job at the same
+                                    time) is not an error, the image is printed again by the next job
+        """
+        if not os.path.isfile(source_file):
+            return False
+        try:
+            _link(source_file, self.path(key))
+        except (IOError, OSError):
+            return False
+        return True
+
+    def evict(self):
+        """
+        remove the least recently used images until the cache is within max_mb
+        :return:                    removed image count
+        """
+        images = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith('.png'):
+                continue
+            try:
+                status = os.stat(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                continue
+            images.append((status.st_mtime, status.st_size, file_name))
+        total = sum([size for _, size, _ in images])
+        removed = 0
+        for _, size, file_name in sorted(images):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
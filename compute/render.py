@@ -0,0 +1,454 @@
+"""
+off-viewer rendering of the thermal maps and gasket plots (RENDER_BACKEND = 'raster'). The abaqus side writes a scene
+folder with the mesh, the element groups and NT11 of the temperature steps (write_scene), the images are drawn from the
+scene by a numpy rasteriser, one image per task, no abaqus viewer is required. The process pool is only used outside
+the abaqus kernel, by compute.worker or by a separate python process (RENDER_PYTHON) started from the kernel.
+
+scene folder:
+    scene.json                  image size, groups, steps, contour limits, tasks
+    node_coords.npy             float64 [node, 3], nodes in label order
+    nt11.npy                    float32 [step, node], NaN if no output
+    tri_<group>.npy             int64 [triangle, 3], node index of the external faces of the group
+    color_<group>.npy           int32 [triangle], color of the owner element, set order, -1 for no set
+
+a task draws one group, with the NT11 contour of one step, or with the set colors if step is None, the view follows
+print_to_file: 'Iso' or 'Front', rotation along the screen X axis, zoom of the fitted view and pan.
+
+usage:
+    python -m compute.render /data/Wei/FEA19-0840/FEA19-0840_scene --processes 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import struct
+import subprocess
+import sys
+import zlib
+import numpy as np
+
+# abaqus default contour spectrum, 12 intervals from blue to red
+CONTOUR_COLORS = np.array([
+    [0, 0, 255], [0, 93, 255], [0, 185, 255], [0, 255, 232], [0, 255, 139], [0, 255, 46],
+    [46, 255, 0], [139, 255, 0], [232, 255, 0], [255, 185, 0], [255, 93, 0], [255, 0, 0]], dtype=np.float64)
+SET_COLORS = np.array([
+    [189, 189, 189], [214, 122, 88], [102, 153, 204], [153, 204, 102], [204, 170, 102], [170, 119, 187],
+    [102, 187, 170], [221, 153, 153], [136, 170, 221], [187, 187, 102]], dtype=np.float64)
+BACKGROUND = 255
+# fitted view leaves this fraction of the image on each side
+MARGIN = 0.05
+# groups of the whole engine and gasket plan view, set names can not contain '*'
+WHOLE_MODEL = '*WHOLE_MODEL*'
+GASKET_VIEW = '*GASKET*'
+
+# corner faces of the element shapes, node order of abaqus
+TET_FACES = [(0, 1, 2), (0, 1, 3), (1, 2, 3), (0, 2, 3)]
+WEDGE_FACES = [(0, 1, 2), (3, 4, 5), (0, 1, 4, 3), (1, 2, 5, 4), (2, 0, 3, 5)]
+HEX_FACES = [(0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]
+
+# 5 x 7 digits of the legend
+GLYPHS = {
+    '0': ['01110', '10001', '10011', '10101', '11001', '10001', '01110'],
+    '1': ['00100', '01100', '00100', '00100', '00100', '00100', '01110'],
+    '2': ['01110', '10001', '00001', '00010', '00100', '01000', '11111'],
+    '3': ['11111', '00010', '00100', '00010', '00001', '10001', '01110'],
+    '4': ['00010', '00110', '01010', '10010', '11111', '00010', '00010'],
+    '5': ['11111', '10000', '11110', '00001', '00001', '10001', '01110'],
+    '6': ['00110', '01000', '10000', '11110', '10001', '10001', '01110'],
+    '7': ['11111', '00001', '00010', '00100', '01000', '01000', '01000'],
+    '8': ['01110', '10001', '10001', '01110', '10001', '10001', '01110'],
+    '9': ['01110', '10001', '10001', '01111', '00001', '00010', '01100'],
+    '.': ['00000', '00000', '00000', '00000', '00000', '01100', '01100'],
+    '-': ['00000', '00000', '00000', '11111', '00000', '00000', '00000'],
+    '+': ['00000', '00100', '00100', '11111', '00100', '00100', '00000'],
+}
+
+
+def face_table(element_type):
+    """
+    :return:                    list of corner faces of the element type, None if the type is not drawn
+    """
+    element_type = element_type.upper()
+    match = re.search(r'3D(\d+)', element_type)
+    if match:
+        node_count = int(match.group(1))
+        if element_type.startswith(('M3D', 'R3D', 'SFM3D')):
+            return [(0, 1, 2)] if node_count in (3, 6) else [(0, 1, 2, 3)]
+        if node_count in (4, 10):
+            return TET_FACES
+        if node_count in (6, 15):
+            return WEDGE_FACES
+        if node_count in (8, 20, 27):
+            return HEX_FACES
+        return None
+    match = re.match(r'(SC|S|STRI)(\d+)', element_type)
+    if match:
+        node_count = int(match.group(2))
+        if match.group(1) == 'SC':
+            return WEDGE_FACES if node_count == 6 else HEX_FACES
+        return [(0, 1, 2)] if node_count in (3, 6) else [(0, 1, 2, 3)]
+    return None
+
+
+def surface_triangles(element_types, connectivity, rows):
+    """
+    external faces of the elements, faces shared by two elements are removed
+    :param element_types:       element type of each element
+    :param connectivity:        node index tuple of each element
+    :param rows:                element rows of the group
+    :return:                    (int64 array [triangle, 3] node index, int64 array [triangle] element row)
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(element_types[row], []).append(row)
+    faces = {3: [], 4: []}
+    owners = {3: [], 4: []}
+    for element_type, group_rows in groups.items():
+        table = face_table(element_type)
+        if table is None:
+            continue
+        group_rows = np.asarray(group_rows, dtype=np.int64)
+        corner_count = max([max(face) for face in table]) + 1
+        nodes = np.asarray([connectivity[row][:corner_count] for row in group_rows], dtype=np.int64)
+        for face in table:
+            faces[len(face)].append(nodes[:, list(face)])
+            owners[len(face)].append(group_rows)
+    triangles = [np.zeros((0, 3), dtype=np.int64)]
+    triangle_owners = [np.zeros(0, dtype=np.int64)]
+    for size in (3, 4):
+        if not faces[size]:
+            continue
+        face_nodes = np.concatenate(faces[size])
+        face_owners = np.concatenate(owners[size])
+        external = single_rows(np.sort(face_nodes, axis=1))
+        face_nodes = face_nodes[external]
+        face_owners = face_owners[external]
+        if size == 3:
+            triangles.append(face_nodes)
+            triangle_owners.append(face_owners)
+        else:
+            triangles.extend([face_nodes[:, [0, 1, 2]], face_nodes[:, [0, 2, 3]]])
+            triangle_owners.extend([face_owners, face_owners])
+    return np.concatenate(triangles), np.concatenate(triangle_owners)
+
+
+def single_rows(rows):
+    """
+    lexsort row count, np.unique with axis needs numpy 1.13, older than the numpy of some abaqus versions
+    :param rows:                int array [row, column]
+    :return:                    bool array [row], True for the rows found once
+    """
+    if not len(rows):
+        return np.zeros(0, dtype=bool)
+    order = np.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = np.any(ordered[1:] != ordered[:-1], axis=1)
+    group = np.cumsum(first) - 1
+    single = np.zeros(len(rows), dtype=bool)
+    single[order] = np.bincount(group)[group] == 1
+    return single
+
+
+def task(file_name, group, step=None, position='Iso', zoom=1, x_pan=0, x_rotation=0):
+    """
+    :param file_name:           png file without extension, as print_to_file
+    :param group:               group name of write_scene
+    :param step:                index of the nt11 steps, None to draw the set colors
+    :return:                    dict, one image of the scene
+    """
+    return {'file': file_name, 'group': group, 'step': step, 'position': position, 'zoom': zoom, 'x_pan': x_pan,
+            'x_rotation': x_rotation}
+
+
+def write_scene(scene_dir, node_coords, element_types, connectivity, groups, element_colors, nt11, steps, tasks,
+                image_size):
+    """
+    :param scene_dir:           scene folder, created if not exist
+    :param node_coords:         float array [node, 3]
+    :param element_types:       element type of each element
+    :param connectivity:        node index tuple of each element
+    :param groups:              list of (group name, element rows)
+    :param element_colors:      int array [element], set order of each element, -1 for no set
+    :param nt11:                float32 array [step, node], None if no temperature output
+    :param steps:               step names of nt11
+    :param tasks:               list of dict from task, with the image cache key if the cache is used
+    :param image_size:          [width, height]
+    """
+    if not os.path.isdir(scene_dir):
+        os.makedirs(scene_dir)
+    np.save(os.path.join(scene_dir, 'node_coords.npy'), np.asarray(node_coords, dtype=np.float64))
+    if nt11 is not None:
+        np.save(os.path.join(scene_dir, 'nt11.npy'), np.asarray(nt11, dtype=np.float32))
+    limits = {}
+    for i, (group, rows) in enumerate(groups):
+        triangles, owners = surface_triangles(element_types, connectivity, rows)
+        np.save(os.path.join(scene_dir, 'tri_%d.npy' % i), triangles)
+        np.save(os.path.join(scene_dir, 'color_%d.npy' % i), np.asarray(element_colors, dtype=np.int32)[owners])
+        if nt11 is not None and len(rows):
+            # contour limits of the displayed elements, all of their nodes
+            nodes = np.unique(np.concatenate([np.asarray(connectivity[row], dtype=np.int64) for row in rows]))
+            values = np.asarray(nt11)[:, nodes]
+            limits[group] = [[float(np.nanmin(item)), float(np.nanmax(item))] if np.isfinite(item).any()
+                             else [0.0, 0.0] for item in values]
+    scene = {'image_size': list(image_size), 'groups': [group for group, rows in groups], 'steps': list(steps),
+             'limits': limits, 'tasks': tasks}
+    with open(os.path.join(scene_dir, 'scene.json'), 'wt') as f:
+        json.dump(scene, f)
+
+
+def camera(position, x_rotation):
+    """
+    :return:                    float array [3, 3], rows are screen right, screen up and toward the viewer
+    """
+    if position.upper() == 'FRONT':
+        toward = np.array([0.0, 0.0, 1.0])
+    else:
+        toward = np.array([1.0, 1.0, 1.0]) / np.sqrt(3.0)
+    up = np.array([0.0, 1.0, 0.0])
+    right = np.cross(up, toward)
+    right /= np.linalg.norm(right)
+    up = np.cross(toward, right)
+    angle = np.radians(x_rotation)
+    # rotate the view along the screen X axis
+    rotated_up = up * np.cos(angle) + toward * np.sin(angle)
+    rotated_toward = toward * np.cos(angle) - up * np.sin(angle)
+    return np.array([right, rotated_up, rotated_toward])
+
+
+def rasterize(points, depth, triangles, width, height, max_fragments=4000000):
+    """
+    z-buffer rasteriser, pixel centers are sampled
+    :param points:              float array [node, 2], pixel coordinates, y downward
+    :param depth:               float array [node], larger is nearer to the viewer
+    :param triangles:           int array [triangle, 3], node index
+    :return:                    (int64 array [pixel] nearest triangle, -1 if empty, float array [pixel, 3] barycentric)
+    """
+    pixel_count = width * height
+    z_buffer = np.full(pixel_count, -np.inf)
+    nearest = np.full(pixel_count, -1, dtype=np.int64)
+    weights = np.zeros((pixel_count, 3))
+    if not len(triangles):
+        return nearest, weights
+    corners = points[triangles]
+    x0 = np.floor(corners[:, :, 0].min(axis=1)).astype(np.int64)
+    y0 = np.floor(corners[:, :, 1].min(axis=1)).astype(np.int64)
+    x1 = np.ceil(corners[:, :, 0].max(axis=1)).astype(np.int64)
+    y1 = np.ceil(corners[:, :, 1].max(axis=1)).astype(np.int64)
+    area = ((corners[:, 1, 0] - corners[:, 0, 0]) * (corners[:, 2, 1] - corners[:, 0, 1]) -
+            (corners[:, 2, 0] - corners[:, 0, 0]) * (corners[:, 1, 1] - corners[:, 0, 1]))
+    visible = (x1 >= 0) & (y1 >= 0) & (x0 < width) & (y0 < height) & (np.abs(area) > 1e-12)
+    x0 = np.maximum(x0, 0)
+    y0 = np.maximum(y0, 0)
+    size = np.maximum(np.minimum(x1, width - 1) - x0, np.minimum(y1, height - 1) - y0) + 1
+    # triangles of the same padded box size are sampled together
+    box = np.left_shift(1, np.ceil(np.log2(np.maximum(size, 1))).astype(np.int64))
+    for box_size in np.unique(box[visible]):
+        selected = np.flatnonzero(visible & (box == box_size))
+        offset = np.arange(box_size * box_size)
+        step = max(1, max_fragments // (box_size * box_size))
+        for start in range(0, len(selected), step):
+            index = selected[start:start + step]
+            px = x0[index][:, None] + offset % box_size
+            py = y0[index][:, None] + offset // box_size
+            a, b, c = corners[index, 0], corners[index, 1], corners[index, 2]
+            sx = px + 0.5
+            sy = py + 0.5
+            w0 = ((b[:, 0:1] - sx) * (c[:, 1:2] - sy) - (c[:, 0:1] - sx) * (b[:, 1:2] - sy)) / area[index][:, None]
+            w1 = ((c[:, 0:1] - sx) * (a[:, 1:2] - sy) - (a[:, 0:1] - sx) * (c[:, 1:2] - sy)) / area[index][:, None]
+            w2 = 1.0 - w0 - w1
+            inside = (w0 >= -1e-9) & (w1 >= -1e-9) & (w2 >= -1e-9) & (px < width) & (py < height)
+            rows, columns = np.nonzero(inside)
+            if not len(rows):
+                continue
+            pixel = py[rows, columns] * width + px[rows, columns]
+            triangle = index[rows]
+            bary = np.column_stack([w0[rows, columns], w1[rows, columns], w2[rows, columns]])
+            fragment_depth = (bary * depth[triangles[triangle]]).sum(axis=1)
+            # nearest fragment of each pixel in this batch, then against the z-buffer
+            order = np.lexsort((-fragment_depth, pixel))
+            pixel = pixel[order]
+            first = np.ones(len(pixel), dtype=bool)
+            first[1:] = pixel[1:] != pixel[:-1]
+            order = order[first]
+            pixel = pixel[first]
+            nearer = fragment_depth[order] > z_buffer[pixel]
+            order = order[nearer]
+            pixel = pixel[nearer]
+            z_buffer[pixel] = fragment_depth[order]
+            nearest[pixel] = triangle[order]
+            weights[pixel] = bary[order]
+    return nearest, weights
+
+
+def draw_text(image, text, x, y, scale=2, color=(0, 0, 0)):
+    for character in text:
+        glyph = GLYPHS.get(character)
+        if glyph is not None:
+            for j, line in enumerate(glyph):
+                for i, bit in enumerate(line):
+                    if bit == '1':
+                        image[y + j * scale:y + (j + 1) * scale, x + i * scale:x + (i + 1) * scale] = color
+        x += 6 * scale
+
+
+def draw_legend(image, lower, upper):
+    """
+    contour legend at the top left corner, maximum on top, one decimal as the viewer legend
+    """
+    band_height = 18
+    band_width = 24
+    left = 20
+    top = 20
+    band_count = len(CONTOUR_COLORS)
+    for i in range(band_count):
+        y = top + i * band_height
+        image[y:y + band_height, left:left + band_width] = CONTOUR_COLORS[band_count - 1 - i]
+    for i in range(band_count + 1):
+        value = upper - (upper - lower) * i / float(band_count)
+        draw_text(image, '%+.1f' % value, left + band_width + 8, top + i * band_height - 7)
+
+
+def render_task(task):
+    """
+    draw one image of the scene
+    :param task:                dict, see write_scene, with scene folder
+    :return:                    written png file
+    """
+    scene_dir = task['scene']
+    with open(os.path.join(scene_dir, 'scene.json'), 'rt') as f:
+        scene = json.load(f)
+    width, height = scene['image_size']
+    group_index = scene['groups'].index(task['group'])
+    coords = np.load(os.path.join(scene_dir, 'node_coords.npy'), mmap_mode='r')
+    triangles = np.load(os.path.join(scene_dir, 'tri_%d.npy' % group_index))
+    view = camera(task['position'], task['x_rotation'])
+    used = np.unique(triangles)
+    projected = np.zeros((len(coords), 3))
+    projected[used] = np.dot(np.asarray(coords[used]), view.T)
+    image = np.full((height, width, 3), BACKGROUND, dtype=np.uint8)
+    if len(used):
+        lower = projected[used, :2].min(axis=0)
+        upper = projected[used, :2].max(axis=0)
+        extent = np.maximum(upper - lower, 1e-12)
+        scale = min(width * (1 - 2 * MARGIN) / extent[0], height * (1 - 2 * MARGIN) / extent[1]) * task['zoom']
+        center = (lower + upper) / 2
+        points = np.empty((len(coords), 2))
+        points[:, 0] = width / 2.0 + (projected[:, 0] - center[0]) * scale + task['x_pan'] * width
+        points[:, 1] = height / 2.0 - (projected[:, 1] - center[1]) * scale
+        nearest, weights = rasterize(points, projected[:, 2], triangles, width, height)
+        covered = np.flatnonzero(nearest >= 0)
+        pixels = image.reshape(-1, 3)
+        if task['step'] is None:
+            colors = np.load(os.path.join(scene_dir, 'color_%d.npy' % group_index))
+            corner = np.asarray(coords)[triangles[nearest[covered]]]
+            normal = np.cross(corner[:, 1] - corner[:, 0], corner[:, 2] - corner[:, 0])
+            normal /= np.maximum(np.linalg.norm(normal, axis=1), 1e-12)[:, None]
+            # simple head light shading, the faces toward the viewer are brighter
+            light = 0.45 + 0.55 * np.abs(np.dot(normal, view[2]))
+            base = SET_COLORS[(colors[nearest[covered]] + 1) % len(SET_COLORS)]
+            pixels[covered] = np.clip(base * light[:, None], 0, 255).astype(np.uint8)
+        else:
+            nt11 = np.load(os.path.join(scene_dir, 'nt11.npy'), mmap_mode='r')[task['step']]
+            lower_value, upper_value = scene['limits'][task['group']][task['step']]
+            values = (np.asarray(nt11)[triangles[nearest[covered]]] * weights[covered]).sum(axis=1)
+            span = upper_value - lower_value
+            band_count = len(CONTOUR_COLORS)
+            if span > 0:
+                band = np.floor((values - lower_value) / span * band_count)
+            else:
+                band = np.zeros(len(values))
+            band = np.clip(np.nan_to_num(band), 0, band_count - 1).astype(np.int64)
+            pixels[covered] = CONTOUR_COLORS[band].astype(np.uint8)
+            draw_legend(image, lower_value, upper_value)
+    png_file = task['file'] + '.png'
+    write_png(png_file, image)
+    return png_file
+
+
+def write_png(file_name, image):
+    """
+    :param image:               uint8 array [height, width, 3], RGB
+    """
+    height, width = image.shape[:2]
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, -1)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    data = chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b'')
+    temp_file = file_name + '.tmp'
+    with open(temp_file, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + data)
+    if os.path.isfile(file_name):
+        os.remove(file_name)
+    os.rename(temp_file, file_name)
+
+
+def render_scene(scene_dir, processes=1, image_cache=None):
+    """
+    the pool is only started by a normal python process (compute.worker, main), not in the abaqus kernel, the kernel
+    calls render_scene_process
+    :param processes:           process count of the pool, 1 to draw in the current process
+    :param image_cache:         compute.imagecache.ImageCache, the images of the tasks with key are stored
+    :return:                    list of written png files, task order
+    """
+    with open(os.path.join(scene_dir, 'scene.json'), 'rt') as f:
+        tasks = json.load(f)['tasks']
+    for task in tasks:
+        task['scene'] = scene_dir
+    if processes <= 1 or len(tasks) <= 1:
+        files = [render_task(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            files = pool.map(render_task, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    store_images(tasks, files, image_cache)
+    return files
+
+
+def render_scene_process(scene_dir, python, processes, image_cache=None):
+    """
+    abaqus kernel side, draw the scene by main of this module in a separate python process, the kernel is not forked
+    :param python:              python command with numpy, RENDER_PYTHON
+    :param processes:           process count of the pool in the separate process
+    :param image_cache:         compute.imagecache.ImageCache, the images of the tasks with key are stored
+    :return:                    list of written png files, task order
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [python, '-m', 'compute.render', scene_dir, '--processes', str(processes)]
+    code = subprocess.call(command, cwd=root)
+    if code != 0:
+        raise Exception('RENDER PROCESS FAILED WITH CODE ' + str(code) + ': ' + ' '.join(command))
+    with open(os.path.join(scene_dir, 'scene.json'), 'rt') as f:
+        tasks = json.load(f)['tasks']
+    files = [task['file'] + '.png' for task in tasks]
+    store_images(tasks, files, image_cache)
+    return files
+
+
+def store_images(tasks, files, image_cache):
+    if image_cache is not None:
+        for task, file_name in zip(tasks, files):
+            if task.get('key'):
+                image_cache.store(task['key'], file_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='draw the thermal maps and gasket plots of a render scene')
+    parser.add_argument('scene', help='scene folder, written by write_scene')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args(argv)
+    for file_name in render_scene(args.scene, args.processes):
+        print ('RENDERED: ' + file_name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
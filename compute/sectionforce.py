@@ -0,0 +1,79 @@
+"""
+through thickness force of the gasket sets from the element nodal S11 (SECTION_FORCE_MODE = 'direct'), an estimate of
+the Z-Plane free body cut of get_section_force without the viewer. bench.section_force checks it against the closed
+form force of a uniform gasket pressure on the synthetic odb, it is not validated against the abaqus free body cuts of a
+real odb. Nodal integration: each element node carries area / node count of its element, the area is the gasket mid
+plane projected on the XY plane, the plane of the cut.
+The force of the gasket sets together (GASKET_ALL_ELEMENT_TEMP) counts every element once.
+"""
+import numpy as np
+
+
+def corner_count(element_type):
+    """
+    :return:                    corner nodes of one gasket face, 3 for GK3D6, GK3D12, 4 for GK3D8, GK3D18
+    """
+    node_count = int(''.join([item for item in element_type.upper().split('GK3D')[-1] if item.isdigit()]) or 8)
+    return 3 if node_count in (6, 12) else 4
+
+
+def mid_plane_area(element_type, coordinates):
+    """
+    :param coordinates:         float array [node, 3], element nodes in connectivity order, bottom face first
+    :return:                    area of the mid plane projected on the XY plane
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    corners = corner_count(element_type)
+    half = len(coordinates) // 2
+    mid = (coordinates[:corners] + coordinates[half:half + corners]) / 2
+    x, y = mid[:, 0], mid[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+class SectionForce(object):
+
+    def __init__(self, set_elements, element_labels, element_area, node_count, step_count):
+        """
+        :param set_elements:        list of (set name, element labels), gasket sets
+        :param element_labels:      labels of the gasket elements
+        :param element_area:        mid plane area of the elements
+        :param node_count:          node count of the elements
+        :param step_count:          odb step count
+        """
+        element_labels = np.asarray(element_labels, dtype=np.int64)
+        order = np.argsort(element_labels)
+        self.labels = element_labels[order]
+        # nodal integration weight of each element node
+        self.weights = (np.asarray(element_area, dtype=np.float64) / np.asarray(node_count, dtype=np.float64))[order]
+        self.sets = [set_name for set_name, labels in set_elements]
+        self.set_rows = [np.unique(np.searchsorted(self.labels, np.asarray(labels, dtype=np.int64)))
+                         for set_name, labels in set_elements]
+        self.all_rows = np.unique(np.concatenate(self.set_rows + [np.zeros(0, dtype=np.int64)]))
+        self.element_force = np.zeros((step_count, len(self.labels)))
+
+    def add_block(self, step_index, element_labels, s11):
+        """
+        :param step_index:          odb step order, start from 0
+        :param element_labels:      element label of each element node value
+        :param s11:                 S11 of each element node value, other elements are skipped
+        """
+        element_labels = np.asarray(element_labels, dtype=np.int64)
+        if not len(self.labels) or not len(element_labels):
+            return
+        index = np.searchsorted(self.labels, element_labels)
+        index[index >= len(self.labels)] = 0
+        found = self.labels[index] == element_labels
+        index = index[found]
+        force = np.asarray(s11, dtype=np.float64)[found] * self.weights[index]
+        self.element_force[step_index] += np.bincount(index, weights=force, minlength=len(self.labels))
+
+    def result(self, all_name):
+        """
+        :param all_name:            name of the force of all the gasket sets
+        :return:                    dict, {set name: [force of each step]}, all_name included
+        """
+        section_force = {}
+        for set_name, rows in zip(self.sets, self.set_rows):
+            section_force[set_name] = self.element_force[:, rows].sum(axis=1).tolist()
+        section_force[all_name] = self.element_force[:, self.all_rows].sum(axis=1).tolist()
+        return section_force
@@ -0,0 +1,402 @@
+"""
+Compute stages of the post process, only numpy is required, no abaqus module is imported. The stages can run in the
+abaqus python after read_from_odb, or on a normal worker node under python 3 from the extracted data, see
+compute.worker.
+"""
+import numpy as np
+
+from db import model
+from compute import closure
+
+
+def find_fatigue_adjacent(current_value, value_list):
+    """
+    find the neighbour value of current value, used for the interpolation
+    :param current_value:
+    :param value_list:
+    :return: the left, and right neighbour of current value.
+    """
+    if current_value <= value_list[0]:
+        left_value = value_list[0]
+        right_value = value_list[0]
+    elif current_value >= value_list[-1]:
+        left_value = value_list[-1]
+        right_value = value_list[-1]
+    else:
+        for i, item in enumerate(value_list):
+            if current_value < item:
+                left_value = value_list[i - 1]
+                right_value = value_list[i]
+                break
+    return left_value, right_value
+
+
+def fatigue_interpolate(x, x0, x1, left_value_list, right_value_list, fatigue_criteria_name):
+    """
+    do the interpolation for fatigue calculation
+    :param x:                               fixed load or preload value
+    :param x0:                              the value in left_value_list, which is most close but less than x
+    :param x1:                              the value in right_value_list, which is most close but greater than x
+    :param left_value_list:                 first list used for interpolation
+    :param right_value_list:                second list used for interpolation
+    :param fatigue_criteria_name:           use to determine how many values should be interpolated
+    :return:                                interpolated value, as a list, same size as fatigue_criteria_name
+    """
+    res = []
+    for i, criteria in enumerate(fatigue_criteria_name):
+        input1 = [x0, left_value_list[i]]
+        input2 = [x1, right_value_list[i]]
+        if input1[0] != input2[0]:
+            y = input1[1] + (x - input1[0]) * (input2[1] - input1[1]) / (input2[0] - input1[0])
+        else:
+            y = input1[1]
+        res.append(y)
+    return res
+
+
+def fatigue_tables(web_fatigue_data, fatigue_criteria_name):
+    """
+    :param web_fatigue_data:                gasket_section of the web input, {set name: [material name, initial gap,
+                                            fatigue id, [preload ratio list, fix load list, table]]}
+    :param fatigue_criteria_name:           criteria of the table columns, same order
+    :return:                                dict, {material name: model.FatigueData}
+    """
+    fatigue_data = {}
+    for k, v in web_fatigue_data.items():
+        material_name = v[0]
+        initial_gap = v[1]
+        fatigue_id = v[2]
+        preload = v[3][0]
+        fixload = v[3][1]
+        fatigue_value = v[3][2]
+        res = model.FatigueData(k, material_name, initial_gap, fatigue_id, fixload, preload, fatigue_criteria_name)
+        res.set_fatigue_data(fatigue_value)
+        fatigue_data[material_name] = res
+    return fatigue_data
+
+
+def fatigue_lower_bound(unload_ratio, left_ratio, right_ratio, allowable_min, allowable_max):
+    """
+    lower bound of the final allowed ratio (interpolation_3) without the fatigue table interpolation. interpolation_1
+    and interpolation_2 are between the min and max allowed ratio of the table, interpolation_3 is a linear
+    interpolation of both at unload_ratio, and extrapolates if unload_ratio is not between left_ratio and right_ratio.
+    :param unload_ratio:                    unload ratio of the fixed step window
+    :param left_ratio:                      the ratio in fatigue_ratio list, most close but less than preload_ratio
+    :param right_ratio:                     the ratio in fatigue_ratio list, most close but greater than preload_ratio
+    :param allowable_min:                   FatigueData.allowable_min
+    :param allowable_max:                   FatigueData.allowable_max
+    :return:                                lower bound, as a list, same size as allowable_min
+    """
+    extrapolation = 0
+    if left_ratio != right_ratio:
+        t = (unload_ratio - left_ratio) / (right_ratio - left_ratio)
+        extrapolation = max(0, -t, t - 1)
+    return [low - extrapolation * (high - low) for low, high in zip(allowable_min, allowable_max)]
+
+
+def cal_relative(process_setting, log_array, log_object, log_file, procedure_length):
+    """
+    Calculate the relative motion for nodes, the procedure will be started even relative motion is not required.
+    Only the nodes of the compact index RELATIVE_NODES are calculated, the tied nodes (TIED_NODES, no contact output,
+    or CSTATUS at most RELATIVE_TIED_STATUS, in all the steps) are set to 0, all the nodes are calculated if there is no
+    index.
+    :param process_setting:     big dict, contained all results, required input
+    :param log_array:           log data, record all the log information as a list
+    :param log_object:          log object, defined as a class
+    :param log_file:            log archived file, for each operation the file will be updated, and read by web,
+                                display as a processing bar.
+    :param procedure_length:    the whole procedure percentage, display in the processing bar.
+    :return:                    update the node relative data
+    """
+    cylinder_name = process_setting['FIRING_CYLINDER_NAME']
+    temperature_name = process_setting['TEMPERATURE_NAME']
+    cylinder_num = len(cylinder_name)
+    fixed_step = process_setting['TEMPERATURE_STEP']
+    node_result = process_setting['NODE_RESULT']
+    start_record_value = process_setting['START_LOG_VALUE']
+    relative_nodes = process_setting.get('RELATIVE_NODES')
+    if relative_nodes is None:
+        relative_nodes = list(node_result.keys())
+    tied_nodes = process_setting.get('TIED_NODES') or []
+    for node in tied_nodes:
+        node_result[node].cal_relative(fixed_step, cylinder_num, temperature_name)
+    log_array.append(['Relative Motion Tied Nodes ' + str(len(tied_nodes)) + ' of ' + str(len(node_result)),
+                      start_record_value])
+    log_object.add_record(log_array[-1], log_file)
+    i = 0
+    threshold = 0
+    for key in relative_nodes:
+        value = node_result[key]  # type: model.ChgNodes
+        value.cal_relative(fixed_step, cylinder_num, temperature_name)
+        current_process = int(i * 100 / len(relative_nodes))
+        if current_process >= threshold:
+            threshold += 10
+            log_array.append(['Relative Motion Finished ' + str('%3.1f%%' % current_process),
+                              start_record_value + current_process * float(procedure_length) / 100])
+            log_object.add_record(log_array[-1], log_file)
+        i += 1
+    return process_setting
+
+
+def cal_fatigue(process_setting, log_array, log_object, log_file, procedure_length):
+    """
+    For all elements will have the fatigue data, even they are not required.
+    Four types,                 1. not required to calculate fatigue, stauts = Abandon,
+                                2. Required to calculate fatigue, and succeed, status = Succeed
+                                3. Required to calculate fatigue, and failed, status = Failed
+                                4. Required to calculate fatigue, and all the cycles screened, status = Safe
+    Fatigue screen (FATIGUE_SCREEN_FACTOR): if the lower bound of the final allowed ratio from the min, max of the
+    fatigue table (fatigue_lower_bound) is at least FATIGUE_SCREEN_FACTOR * unload_ratio for all the criteria, the
+    cycle is safe without the interpolation, left_load, right_load are 0, interpolation_1, 2, 4 and adjust_data are 3,
+    interpolation_3 is the lower bound and safety_factor is lower bound / unload_ratio. None to interpolate all.
+    :param process_setting:     big dict, contained all results, required input
+    :param log_array:           log data, record all the log information as a list
+    :param log_object:          log object, defined as a class
+    :param log_file:            log archived file, for each operation the file will be updated, and read by web,
+                                display as a processing bar.
+    :param procedure_length:    the whole procedure percentage, display in the processing bar.
+    ====================================================================================================================
+    Fatigue data is a member of element data, the format is
+    Element_Class[node][Status, [fix_load, fire_load, pre_load, unload_ratio, left_load, left_ratio, right_load,
+                        right_ratio, interpolation_1, interpolation_2, interpolation_3, interpolation_4, safety_factor,
+                        adjust_data]...]
+    ====================================================================================================================
+    0. Status:                     [Abandon, Succeed, Failed]
+    1. data for cycle 1
+    ...
+    data for each cycle
+    0. fix_load:                   max load during operation
+    1. fire_load:                  min load during operation
+    2. pre_load:                   max load from first step to the FIRST fixed step
+    3. unload_ratio:               (fix_load - fire_load) / fix_load
+    4. left_load:                  the load in fatigue_load list, which is most close but less than fix_load
+    5. left_ratio:                 the ratio in fatigue_ratio list, which is most close but less than preload_ratio
+    6. right_load:                 the load in fatigue_load list, which is most close but greater than fix_load
+    7. right_ratio:                the ratio in fatigue_ratio list, which is most close but greater than preload_ratio
+    8. interpolation_1:            first interpolation, using [left_load, left_ratio], [right_load, left_ratio],
+                                return [left_interpolation_ratio], it is a list, include all interpolated data from
+                                fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
+    9. interpolation_2:            second interpolation, using [left_load, right_ratio], [right_load, right_ratio],
+                                return [right_interpolation_ratio], it is a list, include all interpolated data from
+                                fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
+    10. interpolation_3:            third interpolation, using [left_interpolation_ratio, left_ratio],
+                                [right_interpolation_ratio, right_ratio], return [final_allowed_ratio], it is a list,
+                                include all interpolated data from fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
+    11. interpolation_4:            fourth interpolation, using [left_load, 0], [right_load, 0], return [no_preload_ratio],
+                                it is a list, include all interpolated data from fatigue type: [Goodman, Gerber, Average,
+                                Dangvon, SWT]
+    12. safety_factor:              final_allowed_ratio / unload_ratio, >1 means safe, <1 means risk, it is a list, include
+                                all interpolated data from fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
+    13. adjust_data:                no_preload_ratio - (final_allowed_ratio - unload_ratio)
+
+    :return:                    None
+    """
+    element_result = process_setting['ELEM_RESULT']  # type: dict
+    fatigue_value = process_setting['FATIGUE_DATA']  # type: dict
+    fixed_step = process_setting['TEMPERATURE_STEP']
+    initial_assembly_step = process_setting['INI_ASSEM']
+    hot_assembly_step = process_setting['HOT_ASSEM']
+    temperature_name = process_setting['TEMPERATURE_NAME']
+    cylinder_name = process_setting['FIRING_CYLINDER_NAME']
+    cylinder_num = len(cylinder_name)
+    fatigue_criteria_name = process_setting['FATIGUE_CRITERIA_NAME']
+    screen_factor = process_setting['FATIGUE_SCREEN_FACTOR']
+    start_record_value = process_setting['START_LOG_VALUE']
+    # material: [[screened, total] for each fixed step]
+    screen_count = {}
+    # number_interval = float(procedure_length) / len(element_result)
+    # if not required, or failed, using 3 instead, means safe
+    empty_list = [3 for value in fatigue_criteria_name]
+
+    i = 0
+    threshold = 0
+    for element_id, element_value in element_result.items():  # type: model.ChgElements
+        elem_material = element_value.material
+        node_array = element_value.connectivity
+        for node_id in node_array:
+            # obtain the max load before the first firing cycle, and max, min load of each fixed step window
+            s11_max_before_firing, s11_windows = element_value.get_window_s11(node_id, fixed_step, cylinder_num)
+            fatigue_result = []
+            # fatigue_check, if required to calculate the fatigue, will be True, otherwise, False
+            fatigue_check = False
+            # fatigue_no_Error, if the calculation for fatigue failed, set False.
+            fatigue_no_Error = True
+            screened_cycle = 0
+            if elem_material in fatigue_value:
+                fatigue_data_class = fatigue_value[elem_material]  # type: model.FatigueData
+                line_load = fatigue_data_class.fixload
+                preload_value = fatigue_data_class.preload
+                fatigue_data = fatigue_data_class.fatigue_data
+                fatigue_check = True
+                if elem_material not in screen_count:
+                    screen_count[elem_material] = [[0, 0] for value in fixed_step]
+            for oper_num, oper_step in enumerate(fixed_step):
+                fatigue_result.append([])
+                fix_load, firing_load = s11_windows[oper_num]
+                preload = max(s11_max_before_firing, fix_load)
+                if preload > 0:
+                    preload_ratio = (preload - fix_load) / preload
+                else:
+                    preload_ratio = 0
+                if fix_load > 0:
+                    unload_ratio = (fix_load - firing_load) / fix_load
+                else:
+                    unload_ratio = 0
+                fatigue_result[-1] = [fix_load, firing_load, preload, unload_ratio]
+                if fatigue_check:
+                    left_ratio, right_ratio = find_fatigue_adjacent(preload_ratio, preload_value)
+                    screen_count[elem_material][oper_num][1] += 1
+                    if screen_factor is not None:
+                        lower_bound = fatigue_lower_bound(unload_ratio, left_ratio, right_ratio,
+                                                          fatigue_data_class.allowable_min,
+                                                          fatigue_data_class.allowable_max)
+                        if min(lower_bound) >= max(screen_factor * unload_ratio, 0):
+                            if unload_ratio > 0:
+                                safety_factor = [value / unload_ratio for value in lower_bound]
+                            else:
+                                safety_factor = empty_list
+                            fatigue_result[-1] += [0, left_ratio, 0, right_ratio, empty_list, empty_list, lower_bound,
+                                                   empty_list, safety_factor, empty_list]
+                            screen_count[elem_material][oper_num][0] += 1
+                            screened_cycle += 1
+                            continue
+                    left_load, right_load = find_fatigue_adjacent(fix_load, line_load)
+                    fatigue_result[-1] += [left_load, left_ratio, right_load, right_ratio]
+                    try:
+                        # first using the load, left_ratio to interpolate
+                        interpolation_1 = fatigue_interpolate(fix_load, left_load, right_load,
+                                                              fatigue_data[left_load][left_ratio],
+                                                              fatigue_data[right_load][left_ratio],
+                                                              fatigue_criteria_name)
+                        # second using the load, right_ratio to interpolate
+                        interpolation_2 = fatigue_interpolate(fix_load, left_load, right_load,
+                                                              fatigue_data[left_load][right_ratio],
+                                                              fatigue_data[right_load][right_ratio],
+                                                              fatigue_criteria_name)
+                        # third get the final data
+                        interpolation_3 = fatigue_interpolate(unload_ratio, left_ratio, right_ratio,
+                                                              interpolation_1, interpolation_2, fatigue_criteria_name)
+                        # get the no preload value
+                        interpolation_4 = fatigue_interpolate(fix_load, left_load, right_load,
+                                                              fatigue_data[left_load][0],
+                                                              fatigue_data[right_load][0], fatigue_criteria_name)
+                        # get the safety factor
+                        if unload_ratio > 0:
+                            safety_factor = [value / unload_ratio for value in interpolation_3]
+                        else:
+                            safety_factor = [3 for value in range(len(fatigue_criteria_name))]
+                        # get the adjust data
+                        adjust_data = [no_preload - with_preload + unload_ratio for no_preload, with_preload in
+                                       zip(interpolation_4, interpolation_3)]
+                        # final stored data
+                        fatigue_result[-1] += [interpolation_1, interpolation_2, interpolation_3, interpolation_4,
+                                               safety_factor, adjust_data]
+                    except Exception as e:
+                        fatigue_no_Error = False
+                        for j in range(6):
+                            fatigue_result[-1].append(empty_list)
+                        log_array.append(
+                            ['Fatigue Failed for Elem:' + str(element_id) + ' Node:' + str(node_id),
+                             start_record_value])
+                        log_object.add_record(log_array[-1], log_file)
+                else:
+                    fatigue_result[-1] += [0, 0, 0, 0]
+                    for j in range(6):
+                        fatigue_result[-1].append(empty_list)
+            if fatigue_check:
+                if fatigue_no_Error and screened_cycle == len(fixed_step):
+                    fatigue_result.insert(0, 'Safe')
+                elif fatigue_no_Error:
+                    fatigue_result.insert(0, 'Succeed')
+                else:
+                    fatigue_result.insert(0, 'Failed')
+            else:
+                fatigue_result.insert(0, 'Abandon')
+            element_value.set_fatigue(node_id, temperature_name, fatigue_result)
+            element_value.set_final_results(node_id, initial_assembly_step, hot_assembly_step, fixed_step, cylinder_num)
+            # here is the final results
+        current_process = int(i * 100 / len(element_result))
+        if current_process >= threshold:
+            threshold += 10
+            log_array.append(['Fatigue Calculate Finished ' + str('%3.1f%%' % current_process),
+                              start_record_value + current_process * float(procedure_length) / 100])
+            log_object.add_record(log_array[-1], log_file)
+        i += 1
+    if screen_factor is not None:
+        for elem_material in sorted(screen_count):
+            for oper_num, counts in enumerate(screen_count[elem_material]):
+                log_array.append(['Fatigue Screen ' + str(elem_material) + ' ' + str(temperature_name[oper_num]) +
+                                  ' Safe ' + str(counts[0]) + ' of ' + str(counts[1]),
+                                  start_record_value + procedure_length])
+                log_object.add_record(log_array[-1], log_file)
+    process_setting['FATIGUE_SCREEN'] = screen_count
+    process_setting['START_LOG_VALUE'] = start_record_value + procedure_length
+    return process_setting
+
+
+def cal_distortion(process_setting, log_array, log_object, log_file, procedure_length):
+    """
+    Calculate the bore distortion Fourier coefficient and the cam distortion from the node displacement read in
+    read_from_odb.
+    :param process_setting:     big dict, contained all results, required input
+    :param log_array:           log data, record all the log information as a list
+    :param log_object:          log object, defined as a class
+    :param log_file:            log archived file, for each operation the file will be updated, and read by web,
+                                display as a processing bar.
+    :param procedure_length:    the whole procedure percentage, display in the processing bar.
+    :return:                    update the BoreNodeLayer and CamNode objects
+    """
+    start_record_value = process_setting['START_LOG_VALUE']
+    if 'BORE_DISTORTION_DATA' in process_setting:
+        bore_distortion_results = process_setting['BORE_DISTORTION_DATA']
+        z_coord_list = process_setting['Z_LEVEL_LIST']
+        total_cylinder_num = len(bore_distortion_results)
+        number_interval = float(procedure_length) / total_cylinder_num
+        for current_cylinder in range(total_cylinder_num):
+            for z_level in z_coord_list:
+                bore_layer = bore_distortion_results[current_cylinder][z_level]  # type: model.BoreNodeLayer
+                bore_layer.cal_fourier()
+                bore_layer.cal_angle_data()
+            log_array.append(['Bore Distortion for Cylinder_' + str(current_cylinder + 1),
+                              start_record_value + current_cylinder * number_interval])
+            log_object.add_record(log_array[-1], log_file)
+    if 'CAM_DISTORTION_DATA' in process_setting:
+        cam_node_result = process_setting['CAM_DISTORTION_DATA']
+        for node_set in cam_node_result:
+            cam_node_result[node_set].cal_cam_distortion()
+            log_array.append(['Cam Distortion for ' + node_set, start_record_value + procedure_length])
+            log_object.add_record(log_array[-1], log_file)
+    process_setting['START_LOG_VALUE'] = start_record_value + procedure_length
+    return process_setting
+
+
+def cal_closure(process_setting, log_array, log_object, log_file, procedure_length):
+    """
+    closure on the gasket loading curve and the margins to the curve limits of each element node and fixed step
+    window, compute.closure, all the element nodes of one material in one pass.
+    :param process_setting:     big dict, contained all results, required input, GASKET_CURVES from get_material_data
+    :param procedure_length:    the whole procedure percentage, display in the processing bar.
+    :return:                    process_setting, ChgElements.closure_results are set
+    """
+    element_result = process_setting['ELEM_RESULT']
+    fixed_step = process_setting['TEMPERATURE_STEP']
+    cylinder_num = len(process_setting['FIRING_CYLINDER_NAME'])
+    start_record_value = process_setting['START_LOG_VALUE']
+
+    keys = []
+    materials = []
+    window_max = []
+    for element_id, element_value in element_result.items():  # type: model.ChgElements
+        for node_id in element_value.connectivity:
+            keys.append((element_value, node_id))
+            materials.append(element_value.material)
+            window_max.append(element_value.get_window_max(node_id, fixed_step, cylinder_num))
+    window_max = np.asarray(window_max, dtype=np.float64).reshape(len(keys), len(fixed_step), 2)
+    result = closure.evaluate_windows(process_setting.get('GASKET_CURVES', {}), materials,
+                                      window_max[:, :, 0].T, window_max[:, :, 1].T)
+    for row, (element_value, node_id) in enumerate(keys):
+        element_value.set_closure(node_id, result[:, :, row].T.tolist())
+    log_array.append(['Gasket Closure Calculate Succeed', start_record_value + procedure_length])
+    log_object.add_record(log_array[-1], log_file)
+    process_setting['START_LOG_VALUE'] = start_record_value + procedure_length
+    return process_setting
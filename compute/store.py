@@ -0,0 +1,136 @@
+"""
+columnar store of the step results read by read_from_odb, one array [entity, step, component] for each variable of
+lib.extract ('U:GASKET', 'CONTACT', 'SE'). Each step read from odb is written into its step slice, the model objects get
+a StepView of their entity instead of a list of the step values. The values are float32 as stored in odb, or float64
+if STEP_STORE_DTYPE is 'float64', the precision of the stage arithmetic follows the store.
+
+The arrays are kept in memory if their size is within STEP_STORE_RAM_BUDGET, otherwise they are np.memmap files in a
+scratch folder under STEP_STORE_DIR, the page cache keeps the used part in memory. The steps of one entity are
+contiguous, the stages read the store by blocks of STEP_STORE_CHUNK_ROWS entities, see compute.window. After the read,
+the CONTACT array is compacted to the gasket nodes of RELATIVE_NODES, the tied nodes are not kept.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+
+
+class StepView(object):
+    """
+    step values of one entity in the store, used as the step list of the model objects, view[i] is the values of step i
+    """
+
+    def __init__(self, array, row, as_list=False):
+        """
+        :param array:               store array, [entity, step, component]
+        :param row:                 entity order
+        :param as_list:             if True, the values are returned as python lists, as the former step lists
+        """
+        self.array = array
+        self.row = row
+        self.as_list = as_list
+
+    def __len__(self):
+        return self.array.shape[1]
+
+    def __getitem__(self, index):
+        value = self.array[self.row, index]
+        if self.as_list:
+            return value.tolist()
+        return value
+
+    def __iter__(self):
+        values = self.array[self.row]
+        return iter(values.tolist() if self.as_list else values)
+
+
+class StepStore(object):
+
+    def __init__(self, shapes, step_count, ram_budget=None, scratch_dir=None, dtype=np.float32):
+        """
+        :param shapes:              dict, {variable: (entity count, component count)}
+        :param step_count:          odb step count
+        :param ram_budget:          MB, the arrays are memory mapped files if the total size is over the budget, None
+                                    to keep them in memory
+        :param scratch_dir:         parent folder of the memory mapped files, None for the system temporary folder
+        :param dtype:               storage precision
+        """
+        self.step_count = step_count
+        self.dtype = np.dtype(dtype)
+        self.nbytes = sum([shape[0] * step_count * shape[1] * self.dtype.itemsize for shape in shapes.values()])
+        self.folder = None
+        if ram_budget is not None and self.nbytes > ram_budget * 1024 * 1024:
+            if scratch_dir is not None and not os.path.isdir(scratch_dir):
+                os.makedirs(scratch_dir)
+            self.folder = tempfile.mkdtemp(prefix='chg_store_', dir=scratch_dir)
+        self.arrays = {}
+        for variable, (entity_count, component_count) in shapes.items():
+            shape = (entity_count, step_count, component_count)
+            if self.folder is None:
+                self.arrays[variable] = np.zeros(shape, dtype=self.dtype)
+            elif entity_count:
+                file_name = os.path.join(self.folder, variable.replace(':', '_') + '.dat')
+                self.arrays[variable] = np.memmap(file_name, dtype=self.dtype, mode='w+', shape=shape)
+                if os.name == 'posix':
+                    # the mapping is still valid, the disk space is freed when the array is released, no scratch
+                    # file is left if the job fails
+                    os.remove(file_name)
+            else:
+                # memmap can not map an empty file
+                self.arrays[variable] = np.zeros(shape, dtype=self.dtype)
+
+    def is_mapped(self):
+        return self.folder is not None
+
+    def write(self, step_index, chunk, k):
+        """
+        :param step_index:          step order, start from 0
+        :param chunk:               dict, {variable: array [step, entity, component]}, from lib.extract
+        :param k:                   step order in the chunk
+        """
+        for variable, array in self.arrays.items():
+            # the components after the stored ones are not kept, the contact status of the CONTACT unit
+            array[:, step_index, :] = chunk[variable][k][:, :array.shape[2]]
+
+    def compact(self, variable, rows, chunk_rows):
+        """
+        keep the given entities of the variable only, the views of the former array are not valid after
+        :param rows:                entity order of the kept entities, sorted, the new entity order is their position
+        :param chunk_rows:          entities copied at once
+        """
+        array = self.arrays[variable]
+        rows = np.asarray(rows, dtype=np.int64)
+        shape = (len(rows),) + array.shape[1:]
+        if isinstance(array, np.memmap) and len(rows):
+            file_name = os.path.join(self.folder, variable.replace(':', '_') + '_compact.dat')
+            compact = np.memmap(file_name, dtype=self.dtype, mode='w+', shape=shape)
+            if os.name == 'posix':
+                os.remove(file_name)
+        else:
+            compact = np.zeros(shape, dtype=self.dtype)
+        for start in range(0, len(rows), chunk_rows):
+            compact[start:start + chunk_rows] = array[rows[start:start + chunk_rows]]
+        self.nbytes -= (array.shape[0] - len(rows)) * array.shape[1] * array.shape[2] * self.dtype.itemsize
+        self.arrays[variable] = compact
+
+    def view(self, variable, row, as_list=False):
+        return StepView(self.arrays[variable], row, as_list)
+
+    def iter_blocks(self, variable, chunk_rows):
+        """
+        :return:                    generator of (start row, array [row, step, component]) of chunk_rows entities
+        """
+        array = self.arrays[variable]
+        for start in range(0, array.shape[0], chunk_rows):
+            yield start, np.asarray(array[start:start + chunk_rows])
+
+    def close(self):
+        """
+        remove the scratch files, the mapped arrays are still readable by the views until they are released
+        """
+        for array in self.arrays.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+        if self.folder is not None:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.folder = None
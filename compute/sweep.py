@@ -0,0 +1,225 @@
+"""
+offline parameter sweep, cal_relative and cal_fatigue (with the final results) are run again from <odb>_extracted.pkl
+for a list of parameter variants, no abaqus token is used. Only the jobs run with COMPUTE_OFFLOAD = True write the
+extracted file, a job run without it must be run again with COMPUTE_OFFLOAD before a sweep. The variants run in
+parallel, each in its own process from a fresh load of the extracted file, and write a result bundle
+<prefix>_<variant>_results/. The comparison table <prefix>_sweep.csv has one row for each variant, gasket set, cycle and
+metric of db.aggregate, the min, max of the set and the change from the BASE variant, the extracted parameters. The
+relative motion of all the nodes is in the set ALL_NODES, S11 of the initial and hot assembly steps in the cycle
+ASSEMBLY.
+
+variants file, json list, NAME and the overrides, keys not given keep the extracted value:
+    [{"NAME": "HOT_4", "HOT_ASSEM": 4},
+     {"NAME": "CYCLES", "TEMPERATURE_STEP": [3, 13], "TEMPERATURE_NAME": ["Cycle_1", "Cycle_3"]},
+     {"NAME": "TABLE_B", "gasket_section": {"FB": ["GASKET-FB", 0.048, 12, [[0.0, ...], [75.0, ...], [[...]]]]}}]
+The steps of the low memory mode (LOW_MEMORY_MODE) are reduced to the fixed step windows when read, INI_ASSEM,
+HOT_ASSEM and TEMPERATURE_STEP can not be changed for such a job.
+
+usage:
+    python -m compute.sweep /data/Wei/FEA19-0840/FEA19-0840_extracted.pkl variants.json --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import numpy as np
+
+from db import aggregate
+from db import bundle
+from db import model
+from compute import stages
+from compute import worker
+from conf import setting
+
+# parameters a variant can change, gasket_section replaces the fatigue tables of the given sets
+SWEEP_KEYS = ['INI_ASSEM', 'HOT_ASSEM', 'TEMPERATURE_STEP', 'TEMPERATURE_NAME', 'FATIGUE_CRITERIA_NAME',
+              'FATIGUE_SCREEN_FACTOR', 'gasket_section']
+# parameters of the fixed step window values (compute.window)
+STEP_KEYS = ['INI_ASSEM', 'HOT_ASSEM', 'TEMPERATURE_STEP']
+BASE_NAME = 'BASE'
+
+
+def _step_count(process_setting):
+    """
+    :return:                    odb step count kept for the element nodes, None for the low memory mode
+    """
+    for element_value in process_setting['ELEM_RESULT'].values():
+        for node_id in element_value.connectivity:
+            step_count = len(element_value.step_results.get(node_id) or [])
+            return step_count if step_count else None
+    return 0
+
+
+def apply_overrides(process_setting, overrides):
+    """
+    :param process_setting:     extracted process_setting, the overridden keys are replaced, the objects are not changed
+    :param overrides:           dict, keys of SWEEP_KEYS
+    :return:                    process_setting
+    """
+    unknown = [key for key in overrides if key not in SWEEP_KEYS]
+    if unknown:
+        raise ValueError('unknown sweep parameter: ' + ', '.join(unknown))
+    step_keys = [key for key in STEP_KEYS if key in overrides and overrides[key] != process_setting[key]]
+    cycle_count = len(overrides.get('TEMPERATURE_STEP', process_setting['TEMPERATURE_STEP']))
+    if 'TEMPERATURE_NAME' not in overrides and cycle_count != len(process_setting['TEMPERATURE_NAME']):
+        # cycle names of a new cycle count
+        process_setting['TEMPERATURE_NAME'] = ['Cycle_' + str(i + 1) for i in range(cycle_count)]
+    for key in SWEEP_KEYS[:-1]:
+        if key in overrides:
+            process_setting[key] = overrides[key]
+    if len(process_setting['TEMPERATURE_NAME']) != len(process_setting['TEMPERATURE_STEP']):
+        raise ValueError('TEMPERATURE_NAME and TEMPERATURE_STEP are not the same length')
+    if step_keys:
+        step_count = _step_count(process_setting)
+        if step_count is None:
+            raise ValueError(', '.join(step_keys) + ' can not be changed, the job is extracted in low memory mode')
+        steps = process_setting['TEMPERATURE_STEP'] + [process_setting['INI_ASSEM'], process_setting['HOT_ASSEM']]
+        if min(steps) < 1 or max(steps) > step_count:
+            raise ValueError('steps must be 1 ~ ' + str(step_count))
+    if 'gasket_section' in overrides or 'FATIGUE_CRITERIA_NAME' in overrides:
+        web_fatigue_data = dict(process_setting['WEB_FATIGUE_DATA'])
+        web_fatigue_data.update(overrides.get('gasket_section', {}))
+        criteria_count = len(process_setting['FATIGUE_CRITERIA_NAME'])
+        for set_name, value in web_fatigue_data.items():
+            if any([len(row) != len(value[3][0]) * criteria_count for row in value[3][2]]):
+                raise ValueError('fatigue table of ' + set_name + ' is not preload count * criteria count columns')
+        process_setting['WEB_FATIGUE_DATA'] = web_fatigue_data
+        process_setting['FATIGUE_DATA'] = stages.fatigue_tables(web_fatigue_data,
+                                                                process_setting['FATIGUE_CRITERIA_NAME'])
+    return process_setting
+
+
+def run_variant(task):
+    """
+    :param task:                (extracted file, variant dict, output prefix)
+    :return:                    (variant name, result bundle folder)
+    """
+    extracted_file, variant, out_prefix = task
+    overrides = dict(variant)
+    name = overrides.pop('NAME')
+    process_setting = worker.load_extracted(extracted_file)
+    steps = [process_setting[key] for key in STEP_KEYS]
+    process_setting = apply_overrides(process_setting, overrides)
+    if [process_setting[key] for key in STEP_KEYS] != steps:
+        # the window values are reduced for the extracted steps, the new windows are taken from the step results
+        for element_value in process_setting['ELEM_RESULT'].values():
+            element_value.window_results = {}
+    log_file = out_prefix + '_' + name + '_sweep.log'
+    with open(log_file, 'wt') as f:
+        f.write('')
+    log_array = []
+    log_object = model.RecordLog()
+    process_setting['START_LOG_VALUE'] = 0
+    try:
+        process_setting = stages.cal_relative(process_setting, log_array, log_object, log_file, 50)
+        process_setting = stages.cal_fatigue(process_setting, log_array, log_object, log_file, 50)
+        bundle_dir = bundle.write_bundle(out_prefix + '_' + name + '_results', process_setting)
+        log_array.append(['Sweep Variant ' + name + ' Succeed', 100])
+        log_object.add_record(log_array[-1], log_file)
+    finally:
+        log_object.close()
+    return name, bundle_dir
+
+
+def summarize(bundle_dir):
+    """
+    :return:                    dict, {(set, cycle, metric): (min, max)}
+    """
+    def add(key, data):
+        values = np.asarray(data, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            summary[key] = (float(values.min()), float(values.max()))
+
+    result_bundle = bundle.ResultBundle(bundle_dir)
+    summary = {}
+    for set_name in result_bundle.manifest['sets']:
+        rows = np.sort(result_bundle.set_rows(set_name))
+        add((set_name, 'ASSEMBLY', 'S11_INIT'), result_bundle.array('s11_init')[rows])
+        add((set_name, 'ASSEMBLY', 'S11_HOT'), result_bundle.array('s11_hot')[rows])
+        for cycle_index, cycle in enumerate(result_bundle.manifest['cycles']):
+            for metric, array_name, sub_index in aggregate.metric_list(result_bundle):
+                data = result_bundle.array(array_name)[cycle_index]
+                if sub_index is not None:
+                    data = data[sub_index]
+                add((set_name, cycle, metric), data[rows])
+    relative = result_bundle.array('relative')
+    for cycle_index, cycle in enumerate(result_bundle.manifest['cycles']):
+        for k, metric in enumerate(result_bundle.manifest['relative']):
+            add(('ALL_NODES', cycle, metric), relative[cycle_index, k])
+    return summary
+
+
+def write_comparison(csv_file, names, summaries):
+    """
+    :param names:               variant names, BASE first
+    :param summaries:           summarize result of each variant
+    """
+    with open(csv_file, 'wt') as f:
+        f.write(','.join(['VARIANT', 'SET', 'CYCLE', 'METRIC', 'MIN', 'MAX', 'MIN_CHANGE', 'MAX_CHANGE']) + '\n')
+        base = summaries[0]
+        for name, summary in zip(names, summaries):
+            for key in sorted(summary):
+                value_min, value_max = summary[key]
+                line = [name] + list(key) + ['%.4f' % value_min, '%.4f' % value_max]
+                if key in base:
+                    line += ['%.4f' % (value_min - base[key][0]), '%.4f' % (value_max - base[key][1])]
+                else:
+                    line += ['', '']
+                f.write(','.join(line) + '\n')
+    return csv_file
+
+
+def run_sweep(extracted_file, variants, out_prefix=None, processes=None):
+    """
+    :param extracted_file:      <odb>_extracted.pkl of a job run with COMPUTE_OFFLOAD = True
+    :param variants:            list of dict, NAME and the overrides, the BASE variant is added first
+    :param out_prefix:          output file name prefix, default the odb name
+    :param processes:           process count of the pool, default SWEEP_PROCESSES, 1 to run in the current process
+    :return:                    comparison table file
+    """
+    if processes is None:
+        processes = setting.environment_key['SWEEP_PROCESSES']
+    if not os.path.isfile(extracted_file):
+        raise IOError('extracted file not found: ' + extracted_file + ', run the job with COMPUTE_OFFLOAD = True')
+    process_setting = worker.load_extracted(extracted_file)
+    if out_prefix is None:
+        out_prefix = os.path.splitext(process_setting['ODB_FILE'])[0]
+    variants = [{'NAME': BASE_NAME}] + [dict(item) for item in variants if item.get('NAME') != BASE_NAME]
+    names = [str(item.get('NAME', '')) for item in variants]
+    if '' in names or len(set(names)) != len(names):
+        raise ValueError('every variant needs a unique NAME')
+    # parameter errors are raised before any variant is run
+    for variant in variants:
+        apply_overrides(dict(process_setting), {key: value for key, value in variant.items() if key != 'NAME'})
+    tasks = [(extracted_file, variant, out_prefix) for variant in variants]
+    if processes <= 1:
+        results = [run_variant(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            results = pool.map(run_variant, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    summaries = [summarize(bundle_dir) for name, bundle_dir in results]
+    return write_comparison(out_prefix + '_sweep.csv', names, summaries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='recompute relative motion and fatigue for parameter variants of a '
+                                                 'job run with COMPUTE_OFFLOAD = True')
+    parser.add_argument('extracted', help='<odb>_extracted.pkl, only written by the jobs run with COMPUTE_OFFLOAD')
+    parser.add_argument('variants', help='json file, list of {"NAME": ..., <parameter>: <value>}')
+    parser.add_argument('--prefix', default=None, help='output file name prefix, default the odb name')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+    with open(args.variants, 'rt') as f:
+        variants = json.load(f)
+    print ('COMPARISON: ' + run_sweep(args.extracted, variants, args.prefix, args.processes))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+streaming reductions of the element node S11, E11 over the fixed step windows, for the low memory mode (LOW_MEMORY_MODE).
+Each step read from odb updates the running values of the windows the step belongs to, the step results are not kept,
+so the memory does not grow with the step count. The same values are reduced from the blocks of the step store
+(compute.store) when the steps are kept. The reduced values are the same numbers set_final_results and
+cal_fatigue take from the full step lists.
+
+window of a fixed step (start from 1) is the steps fixed_step - 1 ~ fixed_step + cylinder_num - 1 (start from 0), the
+fixed step and the firing steps of all the cylinders.
+
+The relative motion (RLM, FDP) of the gasket nodes is reduced in the same way by RelativeReducer, the pairs of a window
+are calculated as the steps arrive with the contact output of the former steps of the window, the contact output is
+dropped when the window is closed. The memory of the nodes grows with the window count (pair results), not with the
+steps. The per step contact tables of the text report are empty in this mode. The displacement of the bore and cam
+node sets is still kept for all the steps, the Fourier and cam distortion are calculated for every step.
+"""
+import numpy as np
+from conf import setting
+
+
+class WindowReducer(object):
+    """
+    running values of the element node rows, rows in the order of lib.extract SE labels, rows of one element are
+    contiguous
+    """
+
+    def __init__(self, step_count, fixed_step, cylinder_num, init_assem, hot_assem, row_elements, dtype=np.float32):
+        """
+        :param step_count:          odb step count
+        :param fixed_step:          list of fixed steps, start from 1
+        :param cylinder_num:        firing cylinder count
+        :param init_assem:          initial assembly step, start from 1
+        :param hot_assem:           hot assembly step, start from 1
+        :param row_elements:        element label of each row
+        :param dtype:               precision of the running values, same as the step store
+        """
+        self.windows = [(oper_step - 1, min(oper_step + cylinder_num, step_count)) for oper_step in fixed_step]
+        self.pre_firing_end = fixed_step[0]
+        self.init_step = init_assem - 1
+        self.hot_step = hot_assem - 1
+        row_elements = np.asarray(row_elements)
+        row_count = len(row_elements)
+        window_count = len(self.windows)
+        self.element_start = np.flatnonzero(np.append(True, row_elements[1:] != row_elements[:-1])) if row_count \
+            else np.zeros(0, dtype=np.int64)
+        self.element_end = np.append(self.element_start[1:], row_count)
+        self.elements = row_elements[self.element_start]
+        self.s11_init = np.zeros(row_count, dtype=dtype)
+        self.s11_hot = np.zeros(row_count, dtype=dtype)
+        self.s11_pre_max = np.full(row_count, -np.inf, dtype=dtype)
+        self.s11_max = np.full((window_count, row_count), -np.inf, dtype=dtype)
+        self.s11_min = np.full((window_count, row_count), np.inf, dtype=dtype)
+        self.e11_max = np.full((window_count, row_count), -np.inf, dtype=dtype)
+        self.e11_min = np.full((window_count, row_count), np.inf, dtype=dtype)
+        self.e11_fixed = np.zeros((window_count, row_count), dtype=dtype)
+        # wear = abs(sum(S11 * E11) - count * first S11 * E11) of the window, the sum is float64 as the list sum
+        self.wear_sum = np.zeros((window_count, row_count), dtype=np.float64)
+        self.wear_first = np.zeros((window_count, row_count), dtype=np.float64)
+        self.wear_count = [end - start for start, end in self.windows]
+
+    def add_step(self, step_index, result, ratio_criteria=None):
+        """
+        :param step_index:          step order, start from 0
+        :param result:              array [row, 2], S11, E11 of the step
+        :param ratio_criteria:      STRESS_DIFFER_RATIO, if given, elements may have S11 ratio over the criteria are
+                                    returned
+        :return:                    list of (element, start row, end row) to check, empty if ratio_criteria is None
+        """
+        s11 = result[:, 0]
+        self._update(step_index, s11, result[:, 1], slice(None))
+        if ratio_criteria is None or not len(self.element_start):
+            return []
+        element_max = np.maximum.reduceat(s11, self.element_start).astype(np.float64)
+        element_min = np.minimum.reduceat(s11, self.element_start).astype(np.float64)
+        ratio = element_max / np.where(element_min < 0.001, 0.001, element_min)
+        # candidates only, the exact check is done by ChgElements.check_step with the scalar values
+        candidates = np.flatnonzero(ratio > ratio_criteria * (1 - 1e-6))
+        return [(self.elements[i], self.element_start[i], self.element_end[i]) for i in candidates]
+
+    def add_block(self, start, block):
+        """
+        update the rows of a store block with all the steps, same values as add_step for each step
+        :param start:               first row of the block
+        :param block:               array [row, step, 2], S11, E11, from compute.store.StepStore.iter_blocks
+        """
+        rows = slice(start, start + len(block))
+        for step_index in range(block.shape[1]):
+            self._update(step_index, block[:, step_index, 0], block[:, step_index, 1], rows)
+
+    def _update(self, step_index, s11, e11, rows):
+        if step_index == self.init_step:
+            self.s11_init[rows] = s11
+        if step_index == self.hot_step:
+            self.s11_hot[rows] = s11
+        if step_index < self.pre_firing_end:
+            self.s11_pre_max[rows] = np.maximum(self.s11_pre_max[rows], s11)
+        for i, (start, end) in enumerate(self.windows):
+            if step_index < start or step_index >= end:
+                continue
+            self.s11_max[i, rows] = np.maximum(self.s11_max[i, rows], s11)
+            self.s11_min[i, rows] = np.minimum(self.s11_min[i, rows], s11)
+            self.e11_max[i, rows] = np.maximum(self.e11_max[i, rows], e11)
+            self.e11_min[i, rows] = np.minimum(self.e11_min[i, rows], e11)
+            wear = s11 * e11
+            self.wear_sum[i, rows] += wear
+            if step_index == start:
+                self.e11_fixed[i, rows] = e11
+                self.wear_first[i, rows] = wear
+
+    def result(self, row):
+        """
+        :return:                    [s11_init, s11_hot, s11_max_before_firing, [[s11_max, s11_min, e11_max, e11_min,
+                                    wear, e11_fixed] for each window]], see ChgElements.window_results
+        """
+        windows = []
+        for i in range(len(self.windows)):
+            wear = abs(self.wear_sum[i, row] - self.wear_count[i] * self.wear_first[i, row])
+            windows.append([self.s11_max[i, row], self.s11_min[i, row], self.e11_max[i, row], self.e11_min[i, row],
+                            wear, self.e11_fixed[i, row]])
+        return [self.s11_init[row], self.s11_hot[row], self.s11_pre_max[row], windows]
+
+
+class RelativeReducer(object):
+    """
+    running relative motion of the gasket nodes over the fixed step windows, same pairs and formula
+    (conf.setting.relative_motion) as ChgNodes.cal_relative, the formula is applied to the arrays of all the nodes
+    """
+
+    def __init__(self, step_count, fixed_step, cylinder_num, node_count):
+        """
+        :param step_count:          odb step count
+        :param fixed_step:          list of fixed steps, start from 1
+        :param cylinder_num:        firing cylinder count
+        :param node_count:          gasket node count, rows in the order of lib.extract GASKET labels
+        """
+        self.windows = [(oper_step - 1, min(oper_step + cylinder_num, step_count)) for oper_step in fixed_step]
+        self.node_count = node_count
+        # pair index of the steps i < j of a window, in the order of ChgNodes.cal_relative
+        self.pairs = []
+        for start, end in self.windows:
+            pair_index = {}
+            for i in range(end - start):
+                for j in range(i + 1, end - start):
+                    pair_index[(i, j)] = len(pair_index)
+            self.pairs.append(pair_index)
+        self.rlm = [np.zeros((len(pair_index), node_count)) for pair_index in self.pairs]
+        self.fdp = [np.zeros((len(pair_index), node_count)) for pair_index in self.pairs]
+        # contact output of the arrived steps of the open windows, {window: [array [node, 4]]}
+        self.open_steps = {}
+
+    def add_step(self, step_index, contact):
+        """
+        :param step_index:          step order, start from 0
+        :param contact:             array [node, 4], cshear1, cshear2, cslip1, cslip2, None if not in the odb (0)
+        """
+        if contact is None:
+            contact = np.zeros((self.node_count, 4))
+        contact = np.asarray(contact, dtype=np.float64)
+        for w, (start, end) in enumerate(self.windows):
+            if step_index < start or step_index >= end:
+                continue
+            former = self.open_steps.setdefault(w, [])
+            j = step_index - start
+            for i, value in enumerate(former):
+                k = self.pairs[w][(i, j)]
+                self.rlm[w][k], self.fdp[w][k] = setting.relative_motion(value[:, 2], value[:, 3], contact[:, 2],
+                                                                         contact[:, 3], value[:, 0], value[:, 1],
+                                                                         contact[:, 0], contact[:, 1])
+            if step_index == end - 1:
+                del self.open_steps[w]
+            else:
+                former.append(contact)
+
+    def result(self, row):
+        """
+        :return:                    (relative_list, final_relative) of the node, see ChgNodes.cal_relative
+        """
+        relative_list = []
+        final_relative = []
+        for w in range(len(self.windows)):
+            res_rlm = self.rlm[w][:, row].tolist()
+            res_fdp = self.fdp[w][:, row].tolist()
+            relative_list.append([res_rlm, res_fdp])
+            if not res_rlm:
+                # single step window, no pair, the motion is 0 as for the tied nodes
+                final_relative.append([0.0, 0.0, 0.0, 0.0])
+                continue
+            final_relative.append([max(res_rlm), max(res_fdp), sum(res_rlm), sum(res_fdp)])
+        return relative_list, final_relative
@@ -0,0 +1,172 @@
+"""
+Run the compute stages on a normal worker node, no abaqus token is used.
+The abaqus side (core.src with COMPUTE_OFFLOAD = True) extracts the odb data and dumps process_setting to
+<odb>_extracted.pkl and the step store arrays to <odb>_extracted_arrays/, this module loads them, runs cal_distortion,
+cal_relative, cal_fatigue, cal_closure and dumps the results to <odb>_results.pkl (arrays in <odb>_results_arrays/),
+the text report <odb>_report.txt, the result bundle <odb>_results/, the WEB_EXCEL_SET spreadsheets, the WEB_REPORT_SET
+statistics and the raster thermal maps (compute.render). Progress records are appended to the same *_postprocess.log
+read by web.
+
+usage:
+    python -m compute.worker /data/Wei/FEA19-0840/FEA19-0840_extracted.pkl
+"""
+import io
+import os
+import pickle
+import shutil
+import sys
+import numpy as np
+
+from db import model
+from db import aggregate
+from db import bundle
+from db import export
+from db import report
+from compute import imagecache
+from compute import render
+from compute import stages
+from conf import setting
+from lib import instrument
+
+# objects bound to the running process, recreated on the worker, and the step store arrays written as .npy files
+EXCLUDED_KEYS = ['LOG_OBJECT', 'PROFILER', 'STEP_ARRAYS']
+
+
+def arrays_folder(pickle_file):
+    """
+    :return:                    folder of the step store arrays of the pickle file, <pickle name>_arrays
+    """
+    return os.path.splitext(pickle_file)[0] + '_arrays'
+
+
+def dump_extracted(process_setting, extracted_file):
+    """
+    dump process_setting as a sequence of (key, value) pickles, protocol 2 can be read by python 2 and python 3.
+    keys can not be pickled (odb objects kept by abaqus) are skipped and returned, the caller writes them to the log.
+    The step store arrays (STEP_ARRAYS, {variable: array}) are written as .npy files to arrays_folder, the step views
+    of the results are pickled with the file name of their array, the arrays are not copied into the pickle.
+    :param process_setting:     big dict, contained all results
+    :param extracted_file:      output file name
+    :return:                    list of skipped keys
+    """
+    names = {}
+    step_arrays = process_setting.get('STEP_ARRAYS') or {}
+    if step_arrays:
+        folder = arrays_folder(extracted_file)
+        if os.path.isdir(folder):
+            shutil.rmtree(folder)
+        os.makedirs(folder)
+        for variable, array in step_arrays.items():
+            file_name = variable.replace(':', '_') + '.npy'
+            # a memory mapped array is written by pages, it is not loaded as a whole
+            np.save(os.path.join(folder, file_name), array)
+            names[id(array)] = os.path.basename(folder) + '/' + file_name
+    skipped = []
+    with open(extracted_file, 'wb') as f:
+        for key, value in process_setting.items():
+            if key in EXCLUDED_KEYS:
+                continue
+            data = io.BytesIO()
+            pickler = pickle.Pickler(data, 2)
+            pickler.persistent_id = lambda obj: names.get(id(obj))
+            try:
+                pickler.dump((key, value))
+            except Exception:
+                skipped.append(key)
+                continue
+            f.write(data.getvalue())
+    return skipped
+
+
+def load_extracted(extracted_file):
+    """
+    :param extracted_file:      file written by dump_extracted, python 2 strings and numpy arrays are decoded as latin1
+    :return:                    process_setting dict, the step store arrays are read only memory mapped .npy files, kept
+                                in STEP_ARRAYS
+    """
+    process_setting = {}
+    step_arrays = {}
+    folder = os.path.dirname(os.path.abspath(extracted_file))
+
+    def load_array(name):
+        if name not in step_arrays:
+            step_arrays[name] = np.load(os.path.join(folder, name), mmap_mode='r')
+        return step_arrays[name]
+
+    with open(extracted_file, 'rb') as f:
+        while True:
+            if sys.version_info[0] > 2:
+                unpickler = pickle.Unpickler(f, encoding='latin1')
+            else:
+                unpickler = pickle.Unpickler(f)
+            unpickler.persistent_load = load_array
+            try:
+                key, value = unpickler.load()
+            except EOFError:
+                break
+            process_setting[key] = value
+    process_setting['STEP_ARRAYS'] = dict([(os.path.basename(name)[:-4], array)
+                                           for name, array in step_arrays.items()])
+    return process_setting
+
+
+def run_compute(extracted_file):
+    """
+    run the compute stages for one extracted job
+    :param extracted_file:      <odb>_extracted.pkl
+    :return:                    process_setting with the calculated results
+    """
+    process_setting = load_extracted(extracted_file)
+    log_file = process_setting['LOG_FILE']
+    log_array = process_setting['LOG_ARRAY']
+    log_object = model.RecordLog()
+    base_name = os.path.splitext(process_setting['ODB_FILE'])[0]
+    profiler = instrument.StageProfiler(base_name + '_compute_profile.json',
+                                        process_setting.get('PROFILE_CPROFILE', False))
+    process_setting['LOG_OBJECT'] = log_object
+    process_setting['PROFILER'] = profiler
+    # the abaqus side continued with the viewer stages, compute records use the reserved range
+    final_log_value = process_setting['START_LOG_VALUE']
+    process_setting['START_LOG_VALUE'] = process_setting['COMPUTE_START_LOG_VALUE']
+    try:
+        with profiler.stage('cal_distortion'):
+            process_setting = stages.cal_distortion(process_setting, log_array, log_object, log_file, 0)
+        with profiler.stage('cal_relative'):
+            process_setting = stages.cal_relative(process_setting, log_array, log_object, log_file, 2)
+        with profiler.stage('cal_fatigue'):
+            process_setting = stages.cal_fatigue(process_setting, log_array, log_object, log_file, 4)
+        with profiler.stage('cal_closure'):
+            process_setting = stages.cal_closure(process_setting, log_array, log_object, log_file, 0)
+        with profiler.stage('dump_results'):
+            dump_extracted(process_setting, base_name + '_results.pkl')
+        with profiler.stage('write_report'):
+            report.write_report(process_setting.get('REPORT_FILE', base_name + '_report.txt'), process_setting)
+        with profiler.stage('write_bundle'):
+            bundle.write_bundle(process_setting.get('BUNDLE_DIR', base_name + '_results'), process_setting)
+        with profiler.stage('export_excel_set'):
+            export.export_sets(process_setting.get('BUNDLE_DIR', base_name + '_results'),
+                               process_setting['WEB_EXCEL_SET'], base_name)
+        with profiler.stage('aggregate_report_set'):
+            aggregate.aggregate_sets(process_setting.get('BUNDLE_DIR', base_name + '_results'),
+                                     process_setting['WEB_REPORT_SET'], base_name)
+        if process_setting.get('RENDER_SCENE'):
+            # thermal maps of the raster backend, the scene is written by the abaqus side
+            image_cache = imagecache.open_cache()
+            with profiler.stage('render_scene'):
+                render.render_scene(process_setting['RENDER_SCENE'], setting.environment_key['RENDER_PROCESSES'],
+                                    image_cache)
+            shutil.rmtree(process_setting['RENDER_SCENE'], ignore_errors=True)
+            if image_cache is not None:
+                profiler.count('image_cache_evicted', image_cache.evict())
+        process_setting['START_LOG_VALUE'] = final_log_value
+        log_array.append(['Compute Stages Succeed', final_log_value])
+        log_object.add_record(log_array[-1], log_file)
+    finally:
+        log_object.close()
+        profiler.dump()
+    return process_setting
+
+
+if __name__ == '__main__':
+    for item in sys.argv[1:]:
+        run_compute(item)
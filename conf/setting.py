@@ -22,6 +22,9 @@ environment_key = {
     # use input the bore node set for manually calculate the bore distortion, program will auto create a new set in case
     # several node sets are provided by user. This set is a combined set with all bore nodes.
     'BORE_DISTORTION_NODES': 'NBORE_AUTO',
+    # instance of the cam node labels of the user input (multi-instance odb), None for the first instance with all the
+    # labels, the instance of the gasket sets checked first
+    'CAM_NODE_INSTANCE': None,
     # Maximum Fourier order calculated by program, 12 should be enough already.
     'FOURIER_ORDER': 12,
     # using unique bore center for all layers in one cylinder, default is true, is set false, will calculate the center
@@ -45,6 +48,15 @@ environment_key = {
     # e.g. max_load is 10, load_number is 20, line load output is 10.1234, typically rubber LDs.
     'GASKET_DECIMAL_NUMBER': 3,
     'FATIGUE_CRITERIA_NAME': ['GOODMAN', 'GERBER', 'AVERAGE', 'DANGVON', 'SWT'],
+    # the fatigue of a cycle is not interpolated if the lower bound of the safety factor from the min, max allowed ratio
+    # of the fatigue table is over this value for all the criteria, the lower bound is kept as the safety factor. None
+    # to interpolate all the element nodes
+    'FATIGUE_SCREEN_FACTOR': 2.0,
+    # gasket nodes without contact output in all the steps are tied, the relative motion of the tied nodes is 0 without
+    # calculation. If set and CSTATUS is in the odb, the nodes with CSTATUS (0 open, 1 closed sticking, 2 closed
+    # slipping) at most this value in all the steps are also tied, sticking nodes still have elastic micro slip (CSLIP)
+    # counted by RLM, FDP, so 1 changes the results, 0 ties the always open nodes only.
+    'RELATIVE_TIED_STATUS': None,
     # max_s11 / min_s11, if greater than 100, means the element is not meshed fine enough.
     'STRESS_DIFFER_RATIO': 100,
     # Scale the current plot to make legend do not overlap with displayed object
@@ -53,6 +65,81 @@ environment_key = {
     'TEMPERATURE_XPAN': 0.1,
     # Rotate the current plot to make legend do not overlap with displayed object
     'TEMPERATURE_ROTATE': -180,
+    # the progress log is buffered in memory and the new lines are appended to the file at most once per interval
+    # (seconds), set 0 to write the file on every record
+    'LOG_FLUSH_INTERVAL': 1.0,
+    # every stage is timed and written to <odb>_profile.json, if True, also dump a cProfile file for each stage, only
+    # for deep dives, cProfile slows down the whole job.
+    'PROFILE_CPROFILE': False,
+    # if True, abaqus only extracts the odb data and dumps it to <odb>_extracted.pkl (step arrays in
+    # <odb>_extracted_arrays/), the compute stages (distortion, relative motion, fatigue) are run by compute.worker on a
+    # normal worker node without abaqus token.
+    'COMPUTE_OFFLOAD': False,
+    # daemon mode (core.daemon), folder watched for *_userinput.json jobs, poll interval in second
+    'DAEMON_SPOOL_DIR': '/data/spool/',
+    'DAEMON_POLL_INTERVAL': 2.0,
+    # opened odb kept by the daemon, least recently used odb is closed when the count or the estimated memory (MB)
+    # exceeds the limit
+    'DAEMON_ODB_CACHE_SIZE': 3,
+    'DAEMON_ODB_MEMORY_CAP': 16000,
+    # estimated memory of a job = odb file size * factor, used by the daemon when the memory of an opened odb can not
+    # be measured, and by the batch runner (core.batch) to schedule the jobs
+    'ODB_MEMORY_FACTOR': 0.5,
+    # batch runner, parallel job count and total estimated memory (MB) of the running jobs
+    'BATCH_WORKERS': 4,
+    'BATCH_MEMORY_LIMIT': 64000,
+    # command to run one job in a new process, {json} is replaced by the user input json, {root} by the project folder
+    'BATCH_COMMAND': ['abaqus', 'cae', 'noGUI={root}/run.py', '--', '{json}'],
+    # shared folder of the distributed extraction (lib.distribute), None to read all the steps in the current process.
+    # workers are started by: abaqus cae noGUI=run_worker.py -- <DISTRIBUTED_DIR>
+    'DISTRIBUTED_DIR': None,
+    'DISTRIBUTED_STEPS_PER_UNIT': 4,
+    # a claimed unit without lease refresh for this time (second) is given to other workers
+    'DISTRIBUTED_LEASE_TIMEOUT': 300,
+    'DISTRIBUTED_POLL_INTERVAL': 1.0,
+    # low memory mode, the node displacement, contact output and the element S11, E11 of every step are not kept, the
+    # step results and the relative motion are reduced to the fixed step window values when read (compute.window). The
+    # per step tables of the text report are empty in this mode.
+    'LOW_MEMORY_MODE': False,
+    # step results of the normal mode are kept in the columnar step store (compute.store), the arrays are memory mapped
+    # files in a scratch folder under STEP_STORE_DIR (None for the system temporary folder) if their size is over
+    # STEP_STORE_RAM_BUDGET (MB). The stages read the store by blocks of STEP_STORE_CHUNK_ROWS element nodes.
+    'STEP_STORE_RAM_BUDGET': 8000,
+    'STEP_STORE_DIR': None,
+    'STEP_STORE_CHUNK_ROWS': 100000,
+    # precision of the step store and the window reductions, 'float32' as stored in odb, or 'float64'. The reports print
+    # at most 5 decimals, run python -m bench.accuracy to see the deviation of float32 on the synthetic models. The
+    # coordinates and the bore, cam displacement of the Fourier and distortion calculation are always float64.
+    'STEP_STORE_DTYPE': 'float32',
+    # spreadsheet export of WEB_EXCEL_SET (db.export), 'csv' or 'xlsx', xlsx requires xlsxwriter, csv is written if
+    # xlsxwriter is not installed. rows are read from the result bundle and written in chunks of EXPORT_CHUNK_ROWS
+    'EXPORT_FORMAT': 'csv',
+    'EXPORT_CHUNK_ROWS': 50000,
+    # grouped statistics of WEB_REPORT_SET (db.aggregate), angle bin width in degree and the percentiles of each group
+    'AGGREGATE_ANGLE_BIN': 10.0,
+    'AGGREGATE_PERCENTILES': [5, 50, 95],
+    # thermal maps and gasket plots, 'viewer' prints the abaqus viewport, 'raster' draws the same files from the mesh
+    # and NT11 without the viewer (compute.render), undeformed, image size in pixel. The abaqus kernel is never forked,
+    # the images are drawn in the kernel one after the other, or in RENDER_PROCESSES processes of a separate
+    # RENDER_PYTHON process (python command with numpy, e.g. 'python3', None for the kernel). In COMPUTE_OFFLOAD mode
+    # the raster images are drawn by compute.worker in RENDER_PROCESSES processes
+    'RENDER_BACKEND': 'viewer',
+    'RENDER_PROCESSES': 4,
+    'RENDER_PYTHON': None,
+    'RENDER_IMAGE_SIZE': [1200, 900],
+    # images of the same odb, step, display sets and view are reused from RENDER_CACHE_DIR (compute.imagecache), None
+    # to print every image. The least recently used images are removed if the cache is over RENDER_CACHE_MB
+    'RENDER_CACHE_DIR': None,
+    'RENDER_CACHE_MB': 2000,
+    # processes of the offline parameter sweep (compute.sweep) of a COMPUTE_OFFLOAD job, one variant in each process
+    'SWEEP_PROCESSES': 4,
+    # section force of the gasket sets, 'free_body' writes the viewer free body report of a Z cut for each set and
+    # step, 'direct' sums S11 * area of the element nodes (compute.sectionforce) without the viewer, an estimate checked
+    # against the closed form of a uniform pressure (bench.section_force), not validated against abaqus free body cuts
+    'SECTION_FORCE_MODE': 'free_body',
+    # history outputs of the BOLT_NODESET nodes read with all the increments (compute.bolt), TF1 is always read, add
+    # 'TF2', 'TF3', 'U1', 'U2', 'U3' if they are requested in the model
+    'BOLT_HISTORY_OUTPUTS': ['TF1'],
 }
 
 
@@ -0,0 +1,174 @@
+# coding=utf-8
+"""
+batch runner, runs many *_userinput.json jobs in parallel processes, abaqus is not imported here, each job is started by
+BATCH_COMMAND (abaqus cae noGUI=run.py -- <json>).
+
+scheduling:
+    - at most BATCH_WORKERS jobs run at the same time
+    - the estimated memory (odb file size * ODB_MEMORY_FACTOR) of the running jobs is kept under BATCH_MEMORY_LIMIT, a
+      job larger than the limit is run alone
+    - two jobs on the same odb are never run at the same time, the odb is locked by abaqus
+    - jobs are started in the given order, a job waiting for its odb does not block the jobs behind it
+
+usage:
+    python -m core.batch /data/Wei/*/*_userinput.json --workers 4 --summary batch_summary.txt
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+from conf import setting
+
+
+def collect_jobs(patterns):
+    """
+    :param patterns:        list of json files or glob patterns
+    :return:                list of json files, duplicates removed, order kept
+    """
+    jobs = []
+    for pattern in patterns:
+        matched = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for item in matched:
+            item = os.path.abspath(item)
+            if item not in jobs:
+                jobs.append(item)
+    return jobs
+
+
+def read_job(json_file, memory_factor):
+    """
+    read the odb file of the job and estimate the memory
+    :return:                dict, job record used by the scheduler
+    """
+    job = {'json': json_file, 'odb': None, 'memory': 0.0, 'status': 'WAITING', 'start': None, 'duration': None,
+           'return_code': None, 'process': None, 'output': os.path.splitext(json_file)[0] + '_batch.out'}
+    try:
+        with open(json_file, 'rt') as f:
+            input_data = json.load(f)
+        # same odb name rule as src.load_process_setting
+        odb_name = input_data['main_input_file']
+        if odb_name.endswith('.inp'):
+            odb_name = odb_name[:-4]
+        job['odb'] = os.path.normcase(os.path.abspath(os.path.join(input_data['server_path'], odb_name) + '.odb'))
+        job['memory'] = os.path.getsize(job['odb']) * memory_factor / 1024.0 / 1024.0
+    except Exception as e:
+        job['status'] = 'INVALID'
+        job['error'] = str(e)
+    return job
+
+
+def can_start(job, running, workers, memory_limit):
+    if len(running) >= workers:
+        return False
+    if job['odb'] in [item['odb'] for item in running]:
+        return False
+    if running and sum([item['memory'] for item in running]) + job['memory'] > memory_limit:
+        return False
+    return True
+
+
+def start_job(job, command):
+    """
+    :return:                True if the process is started, the job is FAILED with the error if the command can not
+                            be started (bad BATCH_COMMAND, abaqus not in PATH)
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [item.replace('{json}', job['json']).replace('{root}', root) for item in command]
+    try:
+        output = open(job['output'], 'wt')
+        try:
+            job['process'] = subprocess.Popen(command, stdout=output, stderr=subprocess.STDOUT)
+        finally:
+            output.close()
+    except (OSError, IOError) as e:
+        job['status'] = 'FAILED'
+        job['error'] = str(e)
+        job['duration'] = 0.0
+        print ('JOB FAILED: ' + job['json'] + ' ' + job['error'])
+        return False
+    job['status'] = 'RUNNING'
+    job['start'] = time.time()
+    print ('JOB START: ' + job['json'] + ' (%.0fMB)' % job['memory'])
+    return True
+
+
+def run_batch(json_files, workers=None, memory_limit=None, command=None, poll_interval=0.5):
+    """
+    :param json_files:          list of *_userinput.json
+    :param workers:             max parallel jobs, default BATCH_WORKERS
+    :param memory_limit:        max estimated memory of running jobs, unit MB, default BATCH_MEMORY_LIMIT
+    :param command:             command list to run one job, default BATCH_COMMAND
+    :param poll_interval:       seconds between two checks of the running jobs
+    :return:                    list of job records, same order as json_files
+    """
+    if workers is None:
+        workers = setting.environment_key['BATCH_WORKERS']
+    if memory_limit is None:
+        memory_limit = setting.environment_key['BATCH_MEMORY_LIMIT']
+    if command is None:
+        command = setting.environment_key['BATCH_COMMAND']
+    memory_factor = setting.environment_key['ODB_MEMORY_FACTOR']
+
+    jobs = [read_job(json_file, memory_factor) for json_file in json_files]
+    waiting = [job for job in jobs if job['status'] == 'WAITING']
+    running = []
+    while waiting or running:
+        for job in list(running):
+            return_code = job['process'].poll()
+            if return_code is None:
+                continue
+            job['duration'] = time.time() - job['start']
+            job['return_code'] = return_code
+            job['status'] = 'DONE' if return_code == 0 else 'FAILED'
+            job['process'] = None
+            running.remove(job)
+            print ('JOB ' + job['status'] + ': ' + job['json'] + ' %.1fs' % job['duration'])
+        for job in list(waiting):
+            if can_start(job, running, workers, memory_limit):
+                waiting.remove(job)
+                if start_job(job, command):
+                    running.append(job)
+        if running:
+            time.sleep(poll_interval)
+    return jobs
+
+
+def summary_table(jobs):
+    """
+    :return:            str, one line for each job, duration and status
+    """
+    lines = ['JOB'.ljust(60) + 'MEMORY(MB)'.rjust(12) + 'DURATION(S)'.rjust(14) + 'STATUS'.rjust(10)]
+    for job in jobs:
+        name = job['json'] if len(job['json']) <= 58 else '...' + job['json'][-55:]
+        duration = '%14.1f' % job['duration'] if job['duration'] is not None else '-'.rjust(14)
+        lines.append(name.ljust(60) + '%12.0f' % job['memory'] + duration + job['status'].rjust(10))
+    for job in jobs:
+        if job.get('error'):
+            lines.append('ERROR ' + job['json'] + ': ' + job['error'])
+    total = [job for job in jobs if job['status'] == 'DONE']
+    lines.append(str(len(total)) + ' / ' + str(len(jobs)) + ' JOBS DONE')
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run post process jobs in parallel')
+    parser.add_argument('jobs', nargs='+', help='*_userinput.json files or glob patterns')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--memory-limit', type=float, default=None, help='unit MB')
+    parser.add_argument('--summary', default=None, help='write the summary table to this file')
+    args = parser.parse_args(argv)
+
+    jobs = run_batch(collect_jobs(args.jobs), args.workers, args.memory_limit)
+    table = summary_table(jobs)
+    print (table)
+    if args.summary:
+        with open(args.summary, 'wt') as f:
+            f.write(table)
+    return 0 if all([job['status'] == 'DONE' for job in jobs]) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# coding=utf-8
+"""
+daemon mode, the post process is kept running in one abaqus session and watches a spool folder for the
+*_userinput.json jobs from web. Jobs are processed back to back, recently used odb are kept open, so the jobs on the same
+odb (e.g. the user changes the report sets) do not pay the odb open time again.
+
+spool folder layout:
+    <spool>/*_userinput.json        waiting jobs, oldest first
+    <spool>/running/                job in process
+    <spool>/done/                   finished jobs
+    <spool>/failed/                 failed jobs, with <job>.traceback
+    <spool>/STOP                    create this file to stop the daemon after the current job
+
+the progress log of each job is written to <server_path>/<odb>_postprocess.log, same as the single job mode.
+"""
+from abaqus import *
+from abaqusConstants import *
+
+import collections
+import glob
+import os
+import shutil
+import time
+import traceback
+from conf import setting
+from core import src
+from lib import instrument
+
+
+class OdbCache(object):
+    """
+    least recently used cache of opened odb, the odb is closed if it is evicted, or the odb file is changed (the analysis
+    is re-run). Memory of each odb is estimated by the resident memory growth of the process when the odb is opened and
+    processed, or the odb file size * ODB_MEMORY_FACTOR if the memory can not be measured.
+    """
+
+    def __init__(self, max_count=None, memory_cap=None, memory_factor=None):
+        """
+        :param max_count:           max opened odb count
+        :param memory_cap:          max estimated memory of all the opened odb, unit MB
+        :param memory_factor:       estimated memory = odb file size * memory_factor
+        """
+        if max_count is None:
+            max_count = setting.environment_key['DAEMON_ODB_CACHE_SIZE']
+        if memory_cap is None:
+            memory_cap = setting.environment_key['DAEMON_ODB_MEMORY_CAP']
+        if memory_factor is None:
+            memory_factor = setting.environment_key['ODB_MEMORY_FACTOR']
+        self.max_count = max_count
+        self.memory_cap = memory_cap
+        self.memory_factor = memory_factor
+        # {odb_file: {'odb': opened odb, 'mtime': odb file modify time, 'memory': estimated memory, MB}}
+        self.odbs = collections.OrderedDict()
+
+    @staticmethod
+    def _key(odb_file):
+        return os.path.normcase(os.path.abspath(odb_file))
+
+    def get(self, odb_file):
+        """
+        :param odb_file:        odb file with full path
+        :return:                opened odb, True if the odb was already opened
+        """
+        key = self._key(odb_file)
+        mtime = os.path.getmtime(odb_file)
+        if key in self.odbs:
+            record = self.odbs.pop(key)
+            if record['mtime'] == mtime:
+                self.odbs[key] = record
+                return record['odb'], True
+            # odb is overwritten by a new analysis
+            record['odb'].close()
+        rss = instrument.current_rss()
+        opened_odb = session.openOdb(name=odb_file)
+        self.odbs[key] = {'odb': opened_odb, 'mtime': mtime, 'memory': 0.0}
+        if rss is None:
+            self.odbs[key]['memory'] = os.path.getsize(odb_file) * self.memory_factor / 1024.0 / 1024.0
+        else:
+            self.add_memory(odb_file, instrument.current_rss() - rss)
+        self.evict(keep=key)
+        return opened_odb, False
+
+    def add_memory(self, odb_file, memory):
+        """
+        add the memory growth during a job to the odb, data of odb is loaded lazily, most of the memory is taken by the
+        first job, not by the odb open.
+        """
+        key = self._key(odb_file)
+        if key in self.odbs and memory > 0:
+            self.odbs[key]['memory'] += memory
+
+    def memory(self):
+        return sum([record['memory'] for record in self.odbs.values()])
+
+    def evict(self, keep=None):
+        """
+        close the least recently used odb until the count and memory are under the limit, odb of keep is never closed
+        """
+        for key in list(self.odbs.keys()):
+            if len(self.odbs) <= self.max_count and self.memory() <= self.memory_cap:
+                break
+            if key == keep:
+                continue
+            record = self.odbs.pop(key)
+            record['odb'].close()
+            print ('ODB CLOSED: ' + key)
+
+    def discard(self, odb_file):
+        key = self._key(odb_file)
+        if key in self.odbs:
+            record = self.odbs.pop(key)
+            try:
+                record['odb'].close()
+            except Exception:
+                pass
+
+    def close(self):
+        for key in list(self.odbs.keys()):
+            self.discard(key)
+
+
+def pending_jobs(spool_dir):
+    """
+    :return:            *_userinput.json in spool folder, oldest first
+    """
+    jobs = glob.glob(os.path.join(spool_dir, '*_userinput.json'))
+    jobs.sort(key=lambda item: (os.path.getmtime(item), item))
+    return jobs
+
+
+def move_job(job_file, target_dir):
+    target_file = os.path.join(target_dir, os.path.basename(job_file))
+    if os.path.exists(target_file):
+        os.remove(target_file)
+    shutil.move(job_file, target_file)
+    return target_file
+
+
+def run_job(job_file, odb_cache):
+    """
+    run one job with the odb from the cache, the log and profile are closed even if the job failed.
+    :param job_file:        *_userinput.json
+    :param odb_cache:       OdbCache
+    :return:                process_setting
+    """
+    process_setting = src.load_process_setting(job_file)
+    log_array = process_setting['LOG_ARRAY']
+    log_object = process_setting['LOG_OBJECT']
+    log_file = process_setting['LOG_FILE']
+    profiler = process_setting['PROFILER']
+    odb_file = process_setting['ODB_FILE']
+    try:
+        with profiler.stage('open_odb'):
+            opened_odb, warm = odb_cache.get(odb_file)
+        profiler.count('odb_cache_hit', int(warm))
+        rss = instrument.current_rss()
+        try:
+            process_setting = src.run_process(opened_odb, process_setting)
+        except Exception:
+            log_array.append(['Post Process Failed', process_setting['START_LOG_VALUE']])
+            log_object.add_record(log_array[-1], log_file)
+            # the odb display may be left in any state, do not reuse it
+            odb_cache.discard(odb_file)
+            raise
+        if rss is not None:
+            odb_cache.add_memory(odb_file, instrument.current_rss() - rss)
+        odb_cache.evict(keep=odb_cache._key(odb_file))
+    finally:
+        log_object.close()
+        profiler.dump()
+    return process_setting
+
+
+def serve(spool_dir=None, poll_interval=None, odb_cache=None, once=False):
+    """
+    watch the spool folder and run the jobs back to back
+    :param spool_dir:           folder of *_userinput.json, default DAEMON_SPOOL_DIR
+    :param poll_interval:       seconds between two checks of an empty spool folder, default DAEMON_POLL_INTERVAL
+    :param odb_cache:           OdbCache, a new one is created if None
+    :param once:                if True, return when the spool folder is empty
+    :return:                    dict, {'done': [job], 'failed': [job]}
+    """
+    if spool_dir is None:
+        spool_dir = setting.environment_key['DAEMON_SPOOL_DIR']
+    if poll_interval is None:
+        poll_interval = setting.environment_key['DAEMON_POLL_INTERVAL']
+    if odb_cache is None:
+        odb_cache = OdbCache()
+    running_dir = os.path.join(spool_dir, 'running')
+    done_dir = os.path.join(spool_dir, 'done')
+    failed_dir = os.path.join(spool_dir, 'failed')
+    for folder in [running_dir, done_dir, failed_dir]:
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+    # job left in running folder by a killed daemon is not retried automatically
+    for job_file in glob.glob(os.path.join(running_dir, '*_userinput.json')):
+        move_job(job_file, failed_dir)
+
+    stop_file = os.path.join(spool_dir, 'STOP')
+    summary = {'done': [], 'failed': []}
+    try:
+        while True:
+            if os.path.isfile(stop_file):
+                os.remove(stop_file)
+                break
+            jobs = pending_jobs(spool_dir)
+            if not jobs:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            job_name = os.path.basename(jobs[0])
+            job_file = move_job(jobs[0], running_dir)
+            start_time = time.time()
+            print ('JOB START: ' + job_name)
+            try:
+                run_job(job_file, odb_cache)
+            except Exception:
+                move_job(job_file, failed_dir)
+                with open(os.path.join(failed_dir, job_name + '.traceback'), 'wt') as f:
+                    f.write(traceback.format_exc())
+                summary['failed'].append(job_name)
+                print ('JOB FAILED: ' + job_name)
+            else:
+                move_job(job_file, done_dir)
+                summary['done'].append(job_name)
+                print ('JOB DONE: ' + job_name + ' %.1fs' % (time.time() - start_time) +
+                       ', OPENED ODB: ' + str(len(odb_cache.odbs)) + ', %.0fMB' % odb_cache.memory())
+    finally:
+        odb_cache.close()
+    return summary
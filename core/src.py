@@ -11,8 +11,15 @@ import displayGroupOdbToolset as dgo
 import json
 import os
 from db import model
+from db import aggregate
+from db import bundle
+from db import export
+from db import report
 from conf import setting
 from lib import common
+from lib import instrument
+from lib import setindex
+from compute import worker
 
 
 def unicode_convert(input_data):
@@ -26,7 +33,12 @@ def unicode_convert(input_data):
         return input_data
 
 
-def abaqus_process(json_file):
+def load_process_setting(json_file):
+    """
+    read the user input json, create the log and profile objects, the log file is cleared.
+    :param json_file:           *_userinput.json from web
+    :return:                    dict, process_setting used by all stages
+    """
     setting.environment_key['VIEW_NAME'] = 'Viewport: 1'
 
     with open(json_file, 'rt') as f:
@@ -49,6 +61,9 @@ def abaqus_process(json_file):
         f.write('')
 
     section_force_file = log_file.split('.')[0] + '.sforce'
+    profile_file = os.path.join(odb_path, odb_name + '_profile.json')
+    profiler = instrument.StageProfiler(profile_file, setting.environment_key['PROFILE_CPROFILE'])
+    compute_offload = setting.environment_key['COMPUTE_OFFLOAD']
 
     process_setting = {
         'WEB_REPORT_SET': input_data['report_set'],                                 # ["HB", "FB", ..., "stopper"]
@@ -75,15 +90,27 @@ def abaqus_process(json_file):
         #       }
         'WEB_FATIGUE_DATA': input_data['gasket_section'],                           #
         'FATIGUE_CRITERIA_NAME': setting.environment_key['FATIGUE_CRITERIA_NAME'],   # ['GOODMAN', ... 'SWT']
+        'FATIGUE_SCREEN_FACTOR': setting.environment_key['FATIGUE_SCREEN_FACTOR'],   # 2.0
         'MAX_NODE_NUMBER': 0,
         'MAX_ELEMENT_NUMBER': 0,
         'GASKET_MAX_Z': 0,
         'GASKET_MIN_Z': 0,
         'GASKET_SET': 0,
         'ENGINE_SET': 0,
+        'SET_INDEX': {},                                                            # lib.setindex
+        'INSTANCE_SETS': {},                                                        # lib.setindex, instance map
+        'GASKET_INSTANCE': setindex.DEFAULT_INSTANCE,                               # "PART-1-1"
+        'ADDED_SET_NAMES': {},                                                      # user set name: odb set
+        'RENDER_SCENE': None,                                                       # compute.render, offload mode
         'LOG_FILE': log_file,
         'LOG_ARRAY': [],
         'LOG_OBJECT': write_to_log,
+        'PROFILER': profiler,
+        'PROFILE_CPROFILE': setting.environment_key['PROFILE_CPROFILE'],
+        'COMPUTE_OFFLOAD': compute_offload,
+        'EXTRACTED_FILE': os.path.join(odb_path, odb_name + '_extracted.pkl'),
+        'REPORT_FILE': os.path.join(odb_path, odb_name + '_report.txt'),
+        'BUNDLE_DIR': os.path.join(odb_path, odb_name + '_results'),
         'ODB_FILE': odb_file,
         'INI_ASSEM': input_data['ini_assem'],                                       # 2
         'HOT_ASSEM': input_data['hot_assem'],                                       # 3
@@ -124,49 +151,110 @@ def abaqus_process(json_file):
     except:
         process_setting['BORE_DISTORTION_LINER'] = None
 
+    return process_setting
+
+
+def run_process(opened_odb, process_setting):
+    """
+    run all the stages on an opened odb, the odb is not closed, so it can be reused for next job.
+    :param opened_odb:          odb opened by session.openOdb
+    :param process_setting:     dict from load_process_setting
+    :return:                    process_setting with all the results
+    """
     log_array = process_setting['LOG_ARRAY']
     log_object = process_setting['LOG_OBJECT']
+    log_file = process_setting['LOG_FILE']
+    profiler = process_setting['PROFILER']
+    compute_offload = process_setting['COMPUTE_OFFLOAD']
 
-    opened_odb = session.openOdb(name=odb_file)
     log_array.append(['Launch ODB Succeed', 8])
     log_object.add_record(log_array[-1], log_file)
     # 1. Read material, procedure_length = 1, start = 9
-    process_setting = common.get_material_data(opened_odb, process_setting, log_array, log_object, log_file, 1,
-                                               'MATERIAL')
+    with profiler.stage('get_material_data.MATERIAL'):
+        process_setting = common.get_material_data(opened_odb, process_setting, log_array, log_object, log_file, 1,
+                                                   'MATERIAL')
     # 2. Read Section, procedure_length = 1, start = 10
-    process_setting = common.get_material_data(opened_odb, process_setting, log_array, log_object, log_file, 1,
-                                               'SECTION')
+    with profiler.stage('get_material_data.SECTION'):
+        process_setting = common.get_material_data(opened_odb, process_setting, log_array, log_object, log_file, 1,
+                                                   'SECTION')
     # 3. Read element and node data, procedure_length = 45, start = 11
-    process_setting = common.read_from_odb(opened_odb, process_setting, log_array, log_object, log_file, 45)
-    # 4. Calculate the relative motion, procedure_length = 2, start = 56
-    process_setting = common.cal_relative(process_setting, log_array, log_object, log_file, 2)
-    # 5. Calculate the fatigue, procedure_length = 4, start = 58
-    process_setting = common.cal_fatigue(process_setting, log_array, log_object, log_file, 4)
+    with profiler.stage('read_from_odb'):
+        process_setting = common.read_from_odb(opened_odb, process_setting, log_array, log_object, log_file, 45)
+    if compute_offload:
+        # compute stages run on a worker node from the extracted file, see compute.worker, keep their log range
+        process_setting['COMPUTE_START_LOG_VALUE'] = process_setting['START_LOG_VALUE']
+        process_setting['START_LOG_VALUE'] += 6
+    else:
+        # Bore and cam distortion, procedure_length = 0, start = 56
+        with profiler.stage('cal_distortion'):
+            process_setting = common.cal_distortion(process_setting, log_array, log_object, log_file, 0)
+        # 4. Calculate the relative motion, procedure_length = 2, start = 56
+        with profiler.stage('cal_relative'):
+            process_setting = common.cal_relative(process_setting, log_array, log_object, log_file, 2)
+        # 5. Calculate the fatigue, procedure_length = 4, start = 58
+        with profiler.stage('cal_fatigue'):
+            process_setting = common.cal_fatigue(process_setting, log_array, log_object, log_file, 4)
+        # gasket closure on the loading curves, procedure_length = 0, start = 62
+        with profiler.stage('cal_closure'):
+            process_setting = common.cal_closure(process_setting, log_array, log_object, log_file, 0)
     # Print pictures, Status record percentage 60 ~ 65
-    process_setting = common.plot_thermal_map(opened_odb, process_setting, log_array, log_object, log_file, 5)
+    with profiler.stage('plot_thermal_map'):
+        process_setting = common.plot_thermal_map(opened_odb, process_setting, log_array, log_object, log_file, 5)
     # Read Total force of section. Status record percentage 66~70
-    process_setting = common.get_section_force(opened_odb, process_setting, log_array, log_object, log_file, 5)
+    with profiler.stage('get_section_force'):
+        process_setting = common.get_section_force(opened_odb, process_setting, log_array, log_object, log_file, 5)
     # read bolt force, Status record percentage 71
-    process_setting = common.get_bolt_force(opened_odb, process_setting, log_array, log_object, log_file, 1)
+    with profiler.stage('get_bolt_force'):
+        process_setting = common.get_bolt_force(opened_odb, process_setting, log_array, log_object, log_file, 1)
+
+    if not compute_offload:
+        # every element, node and bore layer for double check, written by compute.worker in offload mode
+        with profiler.stage('write_report'):
+            report.write_report(process_setting['REPORT_FILE'], process_setting)
+        # binary results for the web, see db.bundle
+        with profiler.stage('write_bundle'):
+            bundle.write_bundle(process_setting['BUNDLE_DIR'], process_setting)
+        with profiler.stage('export_excel_set'):
+            export.export_sets(process_setting['BUNDLE_DIR'], process_setting['WEB_EXCEL_SET'],
+                               os.path.splitext(process_setting['ODB_FILE'])[0])
+        with profiler.stage('aggregate_report_set'):
+            aggregate.aggregate_sets(process_setting['BUNDLE_DIR'], process_setting['WEB_REPORT_SET'],
+                                     os.path.splitext(process_setting['ODB_FILE'])[0])
+
+    # the step views of the results keep the store arrays, only the store itself is dropped
+    step_store = process_setting.pop('STEP_STORE', None)
+    if compute_offload:
+        if step_store is not None:
+            process_setting['STEP_ARRAYS'] = step_store.arrays
+        with profiler.stage('dump_extracted'):
+            skipped = worker.dump_extracted(process_setting, process_setting['EXTRACTED_FILE'])
+        for key in skipped:
+            log_array.append(['Extracted Data ' + key + ' Skipped', process_setting['START_LOG_VALUE']])
+            log_object.add_record(log_array[-1], log_file)
+        log_array.append(['Extracted Data Saved, Waiting For Compute Worker', process_setting['START_LOG_VALUE']])
+        log_object.add_record(log_array[-1], log_file)
+    if step_store is not None:
+        step_store.close()
+    return process_setting
 
-    opened_odb.close()
 
-    # test use
-    elem = process_setting['ELEM_RESULT']
-    node = process_setting['NODE_RESULT']
-    bore_distortion = process_setting['BORE_DISTORTION_DATA']
-    elem_list = [90006423, 90007297, 90005512, 90022176]
-    node_list = [90000931, 90001675, 90000720, 90015414, 90010920, 90007031, 90015652]
+def abaqus_process(json_file):
+    process_setting = load_process_setting(json_file)
+    log_object = process_setting['LOG_OBJECT']
+    profiler = process_setting['PROFILER']
+
     try:
-        for item in elem_list:
-            print (elem[item])
-        for item in node_list:
-            print (node[item])
-        bore_node = process_setting['NEW_BORE_NODE'][0]
-        bore_z_level = process_setting['Z_LEVEL_LIST'][0]
-        print (bore_distortion[1][bore_z_level])
-    except:
-        pass
+        with profiler.stage('open_odb'):
+            opened_odb = session.openOdb(name=process_setting['ODB_FILE'])
+        process_setting = run_process(opened_odb, process_setting)
+        opened_odb.close()
+    finally:
+        log_object.close()
+        profiler.dump()
+
+    if process_setting['COMPUTE_OFFLOAD']:
+        return process_setting
 
-    print (process_setting)
-    #insert the bore distortion value for a double check
+    # test use, the full results are in the report file, not printed to the replay log
+    print ('REPORT SAVED TO ' + process_setting['REPORT_FILE'])
+    return process_setting
@@ -0,0 +1,188 @@
+"""
+grouped statistics of the element node results, read from the result bundle (db.bundle). Rows of a gasket set are
+grouped by (cylinder, angle bin) for the line load versus angle curves, and by cylinder for the cylinder summary, for
+each cycle. Each group has count, mean, area weighted mean (ChgElements.area), min, max and percentiles. The reductions
+are bincount for the sums and one sort of (group, value) for min, max and percentiles, no loop over the groups.
+
+output, one row for each cycle, cylinder, (angle bin), metric:
+    <prefix>_<set>_angle_stats.csv
+    <prefix>_<set>_cylinder_stats.csv
+
+usage:
+    python -m db.aggregate /data/Wei/FEA19-0840/FEA19-0840_results FB STOPPER --bin 5
+"""
+import argparse
+import sys
+import numpy as np
+from conf import setting
+from db import bundle
+
+# metric: (bundle array, index of the array axis after cycle)
+METRICS = [
+    ('LINE_LOAD_MAX', 'line_load_max', None),
+    ('LINE_LOAD_MIN', 'line_load_min', None),
+    ('HEAD_LIFT', 'head_lift', None),
+    ('WEAR', 'wear', None),
+]
+
+
+def metric_list(result_bundle):
+    """
+    :return:                list of (metric, bundle array, index), safety factors of all criteria are added
+    """
+    criteria = result_bundle.manifest['fatigue_criteria']
+    return METRICS + [('SF_' + item, 'safety_factor', i) for i, item in enumerate(criteria)]
+
+
+def group_stats(groups, values, weights, group_count, percentiles, value_order=None):
+    """
+    :param groups:          int array, group of each value, 0 ~ group_count - 1
+    :param values:          float array, NaN is ignored
+    :param weights:         float array, weight of the weighted mean
+    :param group_count:     number of groups
+    :param percentiles:     list of percentiles, 0 ~ 100, linear interpolation as numpy.percentile
+    :param value_order:     argsort of values, shared by the groupings of the same values
+    :return:                dict of arrays [group], COUNT, MEAN, AREA_MEAN, MIN, MAX, P<percentile>, NaN if empty
+    """
+    if value_order is None:
+        value_order = np.argsort(values)
+    valid = ~np.isnan(values)
+    # ascending values, then a stable sort by group, the small integer groups are sorted by radix sort
+    order = value_order[valid[value_order]]
+    order = order[np.argsort(groups[order].astype(np.int16 if group_count < 32768 else np.int64), kind='mergesort')]
+    # values of one group are contiguous and in ascending order
+    sorted_values = values[order]
+    groups = groups[valid]
+    values = values[valid]
+    weights = weights[valid]
+    count = np.bincount(groups, minlength=group_count)
+    weight_sum = np.bincount(groups, weights, minlength=group_count)
+    empty = count == 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(groups, values, minlength=group_count) / count.astype(np.float64)
+        area_mean = np.bincount(groups, values * weights, minlength=group_count) / weight_sum.astype(np.float64)
+    result = {'COUNT': count, 'MEAN': np.where(empty, np.nan, mean), 'AREA_MEAN': np.where(empty, np.nan, area_mean)}
+    if not len(sorted_values):
+        # all the groups are empty, the results are masked
+        sorted_values = np.zeros(1)
+    start = np.minimum(np.concatenate(([0], np.cumsum(count)[:-1])), len(sorted_values) - 1)
+    last = np.maximum(start + count - 1, start)
+    result['MIN'] = np.where(empty, np.nan, sorted_values[start])
+    result['MAX'] = np.where(empty, np.nan, sorted_values[last])
+    for percentile in percentiles:
+        position = start + (last - start) * (percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        value = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+        result['P' + ('%g' % percentile)] = np.where(empty, np.nan, value)
+    return result
+
+
+def aggregate_set(result_bundle, set_name, angle_bin=None, percentiles=None):
+    """
+    :param result_bundle:   bundle.ResultBundle
+    :param set_name:        gasket set name
+    :param angle_bin:       angle bin width, degree, default AGGREGATE_ANGLE_BIN
+    :param percentiles:     default AGGREGATE_PERCENTILES
+    :return:                (angle table, cylinder table), dict of column lists, one row for each cycle, cylinder,
+                            (angle bin), metric, empty groups are removed
+    """
+    if angle_bin is None:
+        angle_bin = setting.environment_key['AGGREGATE_ANGLE_BIN']
+    if percentiles is None:
+        percentiles = setting.environment_key['AGGREGATE_PERCENTILES']
+    rows, element_index = result_bundle.set_rows(set_name, return_elements=True)
+    # file order, the cycle arrays are read in order
+    order = np.argsort(rows)
+    rows = rows[order]
+    element_index = element_index[order]
+    cylinder = np.asarray(result_bundle.array('element_cylinder')[element_index], dtype=np.int64)
+    angle = np.asarray(result_bundle.array('element_angle')[element_index], dtype=np.float64)
+    area = np.asarray(result_bundle.array('element_area')[element_index], dtype=np.float64)
+    bin_count = int(np.ceil(360.0 / angle_bin))
+    angle_index = np.clip(np.floor(np.nan_to_num(angle) / angle_bin).astype(np.int64), 0, bin_count - 1)
+    cylinder_count = int(cylinder.max()) + 1 if len(cylinder) else 0
+    groupings = {
+        'angle': (cylinder * bin_count + angle_index, cylinder_count * bin_count),
+        'cylinder': (cylinder, cylinder_count),
+    }
+    tables = {'angle': {'CYCLE': [], 'CYLINDER': [], 'ANGLE': [], 'METRIC': []},
+              'cylinder': {'CYCLE': [], 'CYLINDER': [], 'METRIC': []}}
+    for cycle_index, cycle in enumerate(result_bundle.manifest['cycles']):
+        for metric, array_name, sub_index in metric_list(result_bundle):
+            data = result_bundle.array(array_name)[cycle_index]
+            if sub_index is not None:
+                data = data[sub_index]
+            values = np.asarray(data[rows], dtype=np.float64)
+            value_order = np.argsort(values)
+            for table_name, (groups, group_count) in groupings.items():
+                columns = tables[table_name]
+                stats = group_stats(groups, values, area, group_count, percentiles, value_order)
+                used = np.flatnonzero(stats['COUNT'] > 0)
+                columns['CYCLE'].extend([cycle] * len(used))
+                columns['METRIC'].extend([metric] * len(used))
+                if table_name == 'angle':
+                    columns['CYLINDER'].extend((used // bin_count + 1).tolist())
+                    columns['ANGLE'].extend(((used % bin_count + 0.5) * angle_bin).tolist())
+                else:
+                    columns['CYLINDER'].extend((used + 1).tolist())
+                for key, value in stats.items():
+                    columns.setdefault(key, []).extend(value[used].tolist())
+    return tables['angle'], tables['cylinder']
+
+
+def write_table(csv_file, columns, percentiles):
+    names = ['CYCLE', 'CYLINDER'] + (['ANGLE'] if 'ANGLE' in columns else []) + \
+        ['METRIC', 'COUNT', 'MEAN', 'AREA_MEAN', 'MIN', 'MAX'] + ['P' + ('%g' % item) for item in percentiles]
+    with open(csv_file, 'wt') as f:
+        f.write(','.join(names) + '\n')
+        for i in range(len(columns['CYCLE'])):
+            line = []
+            for name in names:
+                value = columns[name][i]
+                line.append(('%.4f' % value) if isinstance(value, float) else str(value))
+            f.write(','.join(line) + '\n')
+    return csv_file
+
+
+def aggregate_sets(bundle_dir, sets, out_prefix, angle_bin=None, percentiles=None):
+    """
+    :param bundle_dir:          result bundle folder, written by db.bundle.write_bundle
+    :param sets:                gasket set names, e.g. WEB_REPORT_SET, sets not in the bundle are skipped
+    :param out_prefix:          output file name prefix, e.g. /data/Wei/FEA19-0840/FEA19-0840
+    :return:                    list of written files
+    """
+    if percentiles is None:
+        percentiles = setting.environment_key['AGGREGATE_PERCENTILES']
+    result_bundle = bundle.ResultBundle(bundle_dir)
+    sets = [set_name.strip().upper() for set_name in sets if set_name.strip() != '']
+    files = []
+    for set_name in sets:
+        if set_name not in result_bundle.manifest['sets']:
+            continue
+        angle_table, cylinder_table = aggregate_set(result_bundle, set_name, angle_bin, percentiles)
+        files.append(write_table(out_prefix + '_' + set_name + '_angle_stats.csv', angle_table, percentiles))
+        files.append(write_table(out_prefix + '_' + set_name + '_cylinder_stats.csv', cylinder_table, percentiles))
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='grouped statistics of the element set results')
+    parser.add_argument('bundle', help='result bundle folder, <odb>_results')
+    parser.add_argument('sets', nargs='+', help='element set names')
+    parser.add_argument('--bin', type=float, default=None, help='angle bin width, degree')
+    parser.add_argument('--prefix', default=None, help='output file name prefix, default the odb name')
+    args = parser.parse_args(argv)
+
+    out_prefix = args.prefix
+    if out_prefix is None:
+        out_prefix = args.bundle.rstrip('/\\')
+        if out_prefix.endswith('_results'):
+            out_prefix = out_prefix[:-len('_results')]
+    for file_name in aggregate_sets(args.bundle, args.sets, out_prefix, args.bin):
+        print ('WRITTEN: ' + file_name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
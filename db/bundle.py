@@ -0,0 +1,469 @@
+"""
+binary result bundle for the web front end. The results are written as columnar numpy arrays (.npy, one file per
+array) with a json manifest, every array can be opened with mmap, so one element, one cylinder or one cycle is read
+without loading the rest.
+
+bundle folder, <odb>_results/:
+    manifest.json               format, version, names of cycles / criteria / sets, shape and row index of each array
+    <array>.npy                 see ARRAYS
+
+row index:
+    element_node                row of (element, node) pair, sorted by element label, then connectivity order.
+                                rows of element elements[i] are element_offset[i]:element_offset[i + 1]
+    element                     row of element, sorted by element label
+    node                        row of node, sorted by node label
+    cycle                       first axis of the cycle arrays, [cycle, ...], one cycle is one contiguous block
+"""
+import json
+import numbers
+import os
+import shutil
+import time
+
+import numpy as np
+
+BUNDLE_FORMAT = 'chg-result-bundle'
+# 1: first format, 2: bolt history, closure arrays and node_tied. A reader reads the bundles of its version and the
+# former ones, the arrays added later are checked by name
+BUNDLE_VERSION = 2
+MANIFEST_FILE = 'manifest.json'
+
+# name: (row index, description), cycle arrays are [cycle, ..., row]
+ARRAYS = {
+    'elements': ('element', 'element label, sorted'),
+    'element_offset': ('element', 'first element_node row of the element, length = elements + 1'),
+    'element_cylinder': ('element', 'cylinder order of the element, start from 0'),
+    'element_area': ('element', 'element area, mm2'),
+    'element_angle': ('element', 'element angle around the cylinder, degree'),
+    'element_width': ('element', 'equivalent element width, mm'),
+    'en_element': ('element_node', 'element label of the row'),
+    'en_node': ('element_node', 'node label of the row'),
+    's11_init': ('element_node', 'S11 at initial assembly step'),
+    's11_hot': ('element_node', 'S11 at hot assembly step'),
+    'line_load_max': ('element_node', '[cycle, row], max S11 of the cycle'),
+    'line_load_min': ('element_node', '[cycle, row], min S11 of the cycle'),
+    'head_lift': ('element_node', '[cycle, row], head lift of the cycle, um'),
+    'wear': ('element_node', '[cycle, row], wear of the cycle'),
+    'safety_factor': ('element_node', '[cycle, criteria, row], fatigue safety factor'),
+    'thermal_motion': ('element_node', '[cycle pair, row], thermal motion between two cycles, um'),
+    'gasket_closure': ('element_node', '[cycle, row], closure on the loading curve at the max S11 of the cycle'),
+    'closure_margin': ('element_node', '[cycle, row], last closure of the loading curve - max E11 of the cycle'),
+    'pressure_margin': ('element_node', '[cycle, row], last pressure of the loading curve - max S11 of the cycle'),
+    'nodes': ('node', 'node label, sorted'),
+    'relative': ('node', '[cycle, 4, row], max RLM, max FDP, sum RLM, sum FDP'),
+    'node_tied': ('node', '1 for the tied node, relative motion not calculated, 0 otherwise'),
+    'bore_z': ('bore', '[cylinder, layer], z level of the bore layer'),
+    'bore_fourier': ('bore', '[cylinder, layer, step, order + 1, 2], fourier coefficient and phase angle'),
+    'bore_angle': ('bore', 'angle of bore_angle_data, radian'),
+    'bore_angle_data': ('bore', '[cylinder, layer, step, angle], delta diameter'),
+    'section_force': ('section', '[set, step], resultant force of the gasket set'),
+    'bolt_force': ('bolt', '[step, bolt], bolt force'),
+    'bolt_nodes': ('bolt', 'bolt node label'),
+    'bolt_history': ('bolt', '[output, bolt, increment], history outputs of all the steps, see bolt_outputs'),
+    'bolt_time': ('bolt', '[increment], step time of the increment'),
+    'bolt_step_offset': ('bolt', 'first increment of the step, length = steps + 1'),
+    'bolt_load_loss': ('bolt', '[cycle, bolt], TF1 at initial assembly - min TF1 of the cycle'),
+    'bolt_load_loss_ratio': ('bolt', '[cycle, bolt], load loss / TF1 at initial assembly'),
+    'set_elements': ('set', 'element labels of all the sets, rows of set i are set_offset[i]:set_offset[i + 1]'),
+    'set_offset': ('set', 'first set_elements row of the set, length = sets + 1'),
+}
+
+# compute.closure arrays, not in the bundles of former versions
+CLOSURE_ARRAYS = ['gasket_closure', 'closure_margin', 'pressure_margin']
+
+
+def _nan(shape):
+    result = np.empty(shape, dtype=np.float64)
+    result.fill(np.nan)
+    return result
+
+
+def _bolt_arrays(history, load_loss):
+    """
+    :param history:             BOLT_HISTORY, see compute.bolt
+    :param load_loss:           BOLT_LOAD_LOSS, None if not calculated
+    :return:                    dict of the bolt arrays, the increments of all the steps are concatenated
+    """
+    bolt_count = len(history['NODES'])
+    step_offset = np.zeros(len(history['TIME']) + 1, dtype=np.int64)
+    step_offset[1:] = np.cumsum([len(times) for times in history['TIME']])
+    arrays = {
+        'bolt_nodes': np.asarray(history['NODES'], dtype=np.int64),
+        'bolt_time': np.concatenate([np.asarray(times, dtype=np.float64) for times in history['TIME']] +
+                                    [np.zeros(0)]),
+        'bolt_step_offset': step_offset,
+        'bolt_history': np.asarray([np.concatenate(list(history[output]) + [np.zeros((bolt_count, 0))], axis=1)
+                                    for output in history['OUTPUTS']], dtype=np.float64),
+    }
+    if load_loss is not None:
+        arrays['bolt_load_loss'] = np.asarray(load_loss['LOSS'], dtype=np.float64)
+        arrays['bolt_load_loss_ratio'] = np.asarray(load_loss['LOSS_RATIO'], dtype=np.float64)
+    return arrays
+
+
+def _element_arrays(process_setting, cycle_count, criteria_count):
+    element_result = process_setting['ELEM_RESULT']
+    elements = sorted(element_result)
+    element_offset = np.zeros(len(elements) + 1, dtype=np.int64)
+    en_element = []
+    en_node = []
+    for i, element in enumerate(elements):
+        connectivity = element_result[element].connectivity
+        en_element.extend([element] * len(connectivity))
+        en_node.extend(connectivity)
+        element_offset[i + 1] = element_offset[i] + len(connectivity)
+    row_count = len(en_node)
+    pair_count = cycle_count * (cycle_count - 1) // 2
+    arrays = {
+        'elements': np.asarray(elements, dtype=np.int64),
+        'element_offset': element_offset,
+        'element_cylinder': np.zeros(len(elements), dtype=np.int32),
+        'element_area': _nan(len(elements)),
+        'element_angle': _nan(len(elements)),
+        'element_width': _nan(len(elements)),
+        'en_element': np.asarray(en_element, dtype=np.int64),
+        'en_node': np.asarray(en_node, dtype=np.int64),
+        's11_init': _nan(row_count),
+        's11_hot': _nan(row_count),
+        'line_load_max': _nan((cycle_count, row_count)),
+        'line_load_min': _nan((cycle_count, row_count)),
+        'head_lift': _nan((cycle_count, row_count)),
+        'wear': _nan((cycle_count, row_count)),
+        'safety_factor': _nan((cycle_count, criteria_count, row_count)),
+        'thermal_motion': _nan((pair_count, row_count)),
+        'gasket_closure': _nan((cycle_count, row_count)),
+        'closure_margin': _nan((cycle_count, row_count)),
+        'pressure_margin': _nan((cycle_count, row_count)),
+    }
+    row = 0
+    for i, element in enumerate(elements):
+        element_value = element_result[element]
+        arrays['element_cylinder'][i] = getattr(element_value, 'bore_center', 0)
+        arrays['element_area'][i] = getattr(element_value, 'area', np.nan)
+        arrays['element_angle'][i] = getattr(element_value, 'angle', np.nan)
+        arrays['element_width'][i] = getattr(element_value, 'width', np.nan)
+        for node in element_value.connectivity:
+            final_result = element_value.final_results.get(node)
+            if final_result:
+                arrays['s11_init'][row] = final_result[0]
+                arrays['s11_hot'][row] = final_result[1]
+                for j in range(min(cycle_count, len(final_result[2]))):
+                    arrays['line_load_max'][j, row] = final_result[2][j][0]
+                    arrays['line_load_min'][j, row] = final_result[2][j][1]
+                    arrays['head_lift'][j, row] = final_result[3][j]
+                    arrays['wear'][j, row] = final_result[6][j]
+                    safety_factor = final_result[4][j]
+                    # failed fatigue interpolation has no safety factor
+                    if len(safety_factor) == criteria_count:
+                        arrays['safety_factor'][j, :, row] = safety_factor
+                for j, value in enumerate(final_result[5][:pair_count]):
+                    arrays['thermal_motion'][j, row] = value
+            # compute.closure, not in the results of former versions
+            closure_result = getattr(element_value, 'closure_results', {}).get(node)
+            if closure_result:
+                for j, value in enumerate(closure_result[:cycle_count]):
+                    arrays['gasket_closure'][j, row] = value[0]
+                    arrays['closure_margin'][j, row] = value[1]
+                    arrays['pressure_margin'][j, row] = value[2]
+            row += 1
+    return arrays
+
+
+def _node_arrays(process_setting, cycle_count):
+    node_result = process_setting['NODE_RESULT']
+    nodes = sorted(node_result)
+    relative = _nan((cycle_count, 4, len(nodes)))
+    tied = np.zeros(len(nodes), dtype=np.int8)
+    for i, node in enumerate(nodes):
+        for j, value in enumerate(node_result[node].final_relative[:cycle_count]):
+            relative[j, :, i] = value
+        tied[i] = getattr(node_result[node], 'tied', False)
+    return {'nodes': np.asarray(nodes, dtype=np.int64), 'relative': relative, 'node_tied': tied}
+
+
+def _bore_arrays(process_setting):
+    bore_distortion = process_setting.get('BORE_DISTORTION_DATA')
+    if not bore_distortion:
+        return {}
+    cylinders = sorted(bore_distortion)
+    layer_count = max([len(bore_distortion[cylinder]) for cylinder in cylinders])
+    step_count = 0
+    order_count = 0
+    angle_list = []
+    for cylinder in cylinders:
+        for layer in bore_distortion[cylinder].values():
+            if layer.fourier_result:
+                step_count = max(step_count, len(layer.fourier_result))
+                order_count = max(order_count, len(layer.fourier_result[0]))
+            if len(layer.angle_list) > len(angle_list):
+                angle_list = layer.angle_list
+    arrays = {
+        'bore_z': _nan((len(cylinders), layer_count)),
+        'bore_fourier': _nan((len(cylinders), layer_count, step_count, order_count, 2)),
+        'bore_angle': np.asarray(angle_list, dtype=np.float64),
+        'bore_angle_data': _nan((len(cylinders), layer_count, step_count, len(angle_list))),
+    }
+    for i, cylinder in enumerate(cylinders):
+        # z level from top to bottom, same as Z_LEVEL_LIST
+        for j, z_level in enumerate(sorted(bore_distortion[cylinder], reverse=True)):
+            layer = bore_distortion[cylinder][z_level]
+            arrays['bore_z'][i, j] = z_level
+            for k, step_result in enumerate(layer.fourier_result):
+                arrays['bore_fourier'][i, j, k, :len(step_result), :] = step_result
+            for k, step_result in enumerate(layer.angle_data):
+                arrays['bore_angle_data'][i, j, k, :len(step_result)] = step_result
+    return arrays
+
+
+def write_bundle(bundle_dir, process_setting):
+    """
+    write the result bundle, the bundle is written to a temporary folder first, so the web never reads a half
+    written bundle
+    :param bundle_dir:          output folder, replaced if exists
+    :param process_setting:     big dict, contained all results, after cal_fatigue
+    :return:                    bundle_dir
+    """
+    cycles = list(process_setting['TEMPERATURE_NAME'])
+    criteria = list(process_setting.get('FATIGUE_CRITERIA_NAME') or [])
+    arrays = _element_arrays(process_setting, len(cycles), len(criteria))
+    arrays.update(_node_arrays(process_setting, len(cycles)))
+    arrays.update(_bore_arrays(process_setting))
+
+    section_sets = []
+    if 'SECTION_FORCE' in process_setting:
+        section_force = process_setting['SECTION_FORCE']
+        section_sets = list(section_force.keys())
+        arrays['section_force'] = np.asarray([section_force[item] for item in section_sets], dtype=np.float64)
+    if process_setting.get('BOLT_FORCE_VALUE'):
+        arrays['bolt_force'] = np.asarray(process_setting['BOLT_FORCE_VALUE'], dtype=np.float64)
+    bolt_outputs = []
+    if process_setting.get('BOLT_HISTORY'):
+        arrays.update(_bolt_arrays(process_setting['BOLT_HISTORY'], process_setting.get('BOLT_LOAD_LOSS')))
+        bolt_outputs = list(process_setting['BOLT_HISTORY']['OUTPUTS'])
+
+    set_elements = process_setting.get('GASKET_SET_ELEMENTS', {})
+    sets = sorted(set_elements)
+    set_offset = np.zeros(len(sets) + 1, dtype=np.int64)
+    for i, set_name in enumerate(sets):
+        set_offset[i + 1] = set_offset[i] + len(set_elements[set_name])
+    arrays['set_elements'] = np.asarray([label for set_name in sets for label in set_elements[set_name]],
+                                        dtype=np.int64)
+    arrays['set_offset'] = set_offset
+
+    thermal_pairs = []
+    for i in range(len(cycles)):
+        for j in range(i + 1, len(cycles)):
+            thermal_pairs.append(cycles[i] + '-' + cycles[j])
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'odb': process_setting['ODB_FILE'],
+        'customer': process_setting.get('CUSTOMER'),
+        'project': process_setting.get('PROJECT'),
+        'request_no': process_setting.get('REQUEST_NO'),
+        'cycles': cycles,
+        'fixed_step': list(process_setting.get('TEMPERATURE_STEP', [])),
+        'cylinders': process_setting.get('TOTAL_CYLINDER_NAME'),
+        'fatigue_criteria': criteria,
+        'thermal_pairs': thermal_pairs,
+        'relative': ['RLM_MAX', 'FDP_MAX', 'RLM_SUM', 'FDP_SUM'],
+        'section_sets': section_sets,
+        'bolt_outputs': bolt_outputs,
+        'sets': sets,
+        'arrays': {},
+    }
+    temp_dir = bundle_dir.rstrip('/\\') + '.tmp-' + str(os.getpid())
+    if os.path.isdir(temp_dir):
+        shutil.rmtree(temp_dir)
+    os.makedirs(temp_dir)
+    for name, value in arrays.items():
+        np.save(os.path.join(temp_dir, name + '.npy'), value)
+        manifest['arrays'][name] = {'file': name + '.npy', 'dtype': str(value.dtype), 'shape': list(value.shape),
+                                    'index': ARRAYS[name][0], 'description': ARRAYS[name][1]}
+    with open(os.path.join(temp_dir, MANIFEST_FILE), 'wt') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    if os.path.isdir(bundle_dir):
+        old_dir = temp_dir + '.old'
+        os.rename(bundle_dir, old_dir)
+        os.rename(temp_dir, bundle_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.rename(temp_dir, bundle_dir)
+    return bundle_dir
+
+
+class ResultBundle(object):
+    """
+    read access of a result bundle, arrays are opened with mmap on first use, only the read rows are loaded.
+        bundle = ResultBundle('/data/Wei/FEA19-0840/FEA19-0840_results')
+        bundle.element(90006423)            all results of one element
+        bundle.cylinder_elements(0)         element labels of the first cylinder
+        bundle.cycle('Cycle_1')             cycle arrays of one cycle
+        bundle.set_elements('FB')           element labels of the set
+        bundle.bolt_history('TF1', 3)       TF1 of the bolts at all the increments of the fourth step
+    """
+
+    def __init__(self, bundle_dir, mmap_mode='r'):
+        self.bundle_dir = bundle_dir
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), 'rt') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != BUNDLE_FORMAT:
+            raise Exception('NOT A RESULT BUNDLE: ' + bundle_dir)
+        if self.manifest.get('version', 0) > BUNDLE_VERSION:
+            raise Exception('RESULT BUNDLE VERSION ' + str(self.manifest['version']) + ' IS NOT SUPPORTED')
+        self._arrays = {}
+
+    def __contains__(self, name):
+        return name in self.manifest['arrays']
+
+    def array(self, name):
+        if name not in self._arrays:
+            file_name = os.path.join(self.bundle_dir, self.manifest['arrays'][name]['file'])
+            self._arrays[name] = np.load(file_name, mmap_mode=self.mmap_mode)
+        return self._arrays[name]
+
+    def _row(self, name, label):
+        labels = self.array(name)
+        i = int(np.searchsorted(labels, label))
+        if i >= len(labels) or labels[i] != label:
+            raise KeyError(label)
+        return i
+
+    def index_of(self, name, labels, order=None):
+        """
+        :param name:        sorted label array, 'elements' or 'nodes'
+        :param labels:      label array
+        :param order:       argsort of labels if known, any order that makes the labels mostly sorted is faster
+        :return:            row of each label in the array, mask of labels found
+        """
+        sorted_labels = np.asarray(self.array(name))
+        labels = np.asarray(labels, dtype=np.int64)
+        if not len(sorted_labels):
+            return np.zeros(len(labels), dtype=np.int64), np.zeros(len(labels), dtype=bool)
+        # sorted keys are searched much faster than random keys, memory access of the label array is in order
+        if order is None:
+            order = np.argsort(labels)
+        index = np.empty(len(labels), dtype=np.int64)
+        index[order] = np.searchsorted(sorted_labels, labels[order])
+        index[index >= len(sorted_labels)] = 0
+        return index, sorted_labels[index] == labels
+
+    def element_rows(self, element):
+        """
+        :return:            slice of the element_node rows of the element
+        """
+        i = self._row('elements', element)
+        offset = self.array('element_offset')
+        return slice(int(offset[i]), int(offset[i + 1]))
+
+    def element(self, element):
+        """
+        :return:            dict, element properties and the element_node results of all cycles, rows in
+                            connectivity order
+        """
+        i = self._row('elements', element)
+        rows = self.element_rows(element)
+        result = {'element': element, 'nodes': np.array(self.array('en_node')[rows])}
+        for name in ['element_cylinder', 'element_area', 'element_angle', 'element_width']:
+            result[name[8:]] = self.array(name)[i].item()
+        for name in ['s11_init', 's11_hot']:
+            result[name] = np.array(self.array(name)[rows])
+        for name in ['line_load_max', 'line_load_min', 'head_lift', 'wear', 'safety_factor', 'thermal_motion']:
+            result[name] = np.array(self.array(name)[..., rows])
+        for name in CLOSURE_ARRAYS:
+            if name in self.manifest['arrays']:
+                result[name] = np.array(self.array(name)[..., rows])
+        return result
+
+    def node(self, node):
+        """
+        :return:            relative motion of the node, [cycle, 4]
+        """
+        return np.array(self.array('relative')[:, :, self._row('nodes', node)])
+
+    def tied_nodes(self):
+        """
+        :return:            labels of the tied nodes, empty for the bundles of former versions
+        """
+        if 'node_tied' not in self.manifest['arrays']:
+            return np.zeros(0, dtype=np.int64)
+        return np.array(self.array('nodes')[np.asarray(self.array('node_tied')) == 1])
+
+    def cylinder_elements(self, cylinder):
+        """
+        :param cylinder:    cylinder order, start from 0
+        :return:            element labels of the cylinder
+        """
+        return np.array(self.array('elements')[np.asarray(self.array('element_cylinder')) == cylinder])
+
+    def cycle_index(self, cycle):
+        if isinstance(cycle, numbers.Integral):
+            return cycle
+        return self.manifest['cycles'].index(cycle)
+
+    def cycle(self, cycle):
+        """
+        :param cycle:       cycle name or index
+        :return:            dict, element_node results of the cycle, row order as en_element / en_node
+        """
+        i = self.cycle_index(cycle)
+        result = {}
+        for name in ['line_load_max', 'line_load_min', 'head_lift', 'wear', 'safety_factor', 'relative']:
+            result[name] = np.array(self.array(name)[i])
+        for name in CLOSURE_ARRAYS:
+            if name in self.manifest['arrays']:
+                result[name] = np.array(self.array(name)[i])
+        return result
+
+    def bolt_history(self, output='TF1', step=None):
+        """
+        :param output:      history output name, see manifest bolt_outputs
+        :param step:        step order, start from 0, None for all the steps
+        :return:            (step time [increment], values [bolt, increment]), rows in bolt_nodes order
+        """
+        outputs = self.manifest.get('bolt_outputs', [])
+        if output not in outputs:
+            # version 1 bundles and the jobs without BOLT_NODESET have no bolt history
+            raise Exception('BOLT HISTORY ' + output + ' IS NOT IN THE RESULT BUNDLE')
+        i = outputs.index(output)
+        rows = slice(None)
+        if step is not None:
+            offset = self.array('bolt_step_offset')
+            rows = slice(int(offset[step]), int(offset[step + 1]))
+        return np.array(self.array('bolt_time')[rows]), np.array(self.array('bolt_history')[i, :, rows])
+
+    def set_elements(self, set_name):
+        i = self.manifest['sets'].index(set_name)
+        offset = self.array('set_offset')
+        return np.array(self.array('set_elements')[int(offset[i]):int(offset[i + 1])])
+
+    def set_rows(self, set_name, return_elements=False):
+        """
+        :param return_elements: if True, the index of the element in elements is also returned for each row
+        :return:            element_node rows of the set, sorted by cylinder, angle, element, connectivity order
+        """
+        elements = self.array('elements')
+        element_offset = self.array('element_offset')
+        set_elements = self.set_elements(set_name)
+        index = np.searchsorted(elements, set_elements)
+        index[index >= len(elements)] = 0
+        index = index[np.asarray(elements[index]) == set_elements]
+        order = np.lexsort((np.asarray(elements[index]), np.asarray(self.array('element_angle')[index]),
+                            np.asarray(self.array('element_cylinder')[index])))
+        index = index[order]
+        starts = np.asarray(element_offset[index])
+        counts = np.asarray(element_offset[index + 1]) - starts
+        # rows of each element are contiguous, start of the element repeated + position in the output
+        rows = np.arange(counts.sum(), dtype=np.int64) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        if return_elements:
+            return rows, np.repeat(index, counts)
+        return rows
+
+    def bore(self, cylinder):
+        """
+        :return:            z levels, fourier [layer, step, order + 1, 2], angle data [layer, step, angle]
+        """
+        return (np.array(self.array('bore_z')[cylinder]), np.array(self.array('bore_fourier')[cylinder]),
+                np.array(self.array('bore_angle_data')[cylinder]))
@@ -0,0 +1,162 @@
+"""
+spreadsheet export of the WEB_EXCEL_SET sets, one table for each set and cycle. Rows are read from the result bundle
+(db.bundle) in chunks, sorted by cylinder and angle, only one chunk of rows is held in memory.
+
+output:
+    csv         <prefix>_<set>_<cycle>.csv
+    xlsx        <prefix>_<set>.xlsx, one sheet for each cycle, a sheet over XLSX_MAX_ROWS is continued in <cycle>_2 ...
+
+usage:
+    python -m db.export /data/Wei/FEA19-0840/FEA19-0840_results FB STOPPER --format xlsx
+"""
+import argparse
+import sys
+import numpy as np
+from conf import setting
+from db import bundle
+
+try:
+    import xlsxwriter
+except ImportError:
+    # xlsx export is optional, csv is written instead
+    xlsxwriter = None
+
+# rows of one sheet, header included
+XLSX_MAX_ROWS = 1048576
+
+
+def table_columns(result_bundle, cycle_index):
+    """
+    :return:                list of (header, format), thermal motion of the cycle pairs contained this cycle
+    """
+    manifest = result_bundle.manifest
+    cycle = manifest['cycles'][cycle_index]
+    columns = [('CYLINDER', '%d'), ('ELEMENT', '%d'), ('NODE', '%d'), ('ANGLE', '%.1f'), ('WIDTH', '%.3f'),
+               ('LINE_LOAD_MAX', '%.3f'), ('LINE_LOAD_MIN', '%.3f'), ('HEAD_LIFT', '%.3f')]
+    for criteria in manifest['fatigue_criteria']:
+        columns.append(('SF_' + criteria, '%.3f'))
+    for pair in manifest['thermal_pairs']:
+        if cycle in pair.split('-'):
+            columns.append(('THERMAL_' + pair, '%.3f'))
+    columns.append(('WEAR', '%.3f'))
+    return columns
+
+
+def table_chunks(result_bundle, rows, cycle_index, chunk_rows):
+    """
+    :return:                generator of float64 array [row, column], columns as table_columns
+    """
+    manifest = result_bundle.manifest
+    cycle = manifest['cycles'][cycle_index]
+    pairs = [i for i, pair in enumerate(manifest['thermal_pairs']) if cycle in pair.split('-')]
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        element_index = np.searchsorted(result_bundle.array('elements'), result_bundle.array('en_element')[chunk])
+        columns = [np.asarray(result_bundle.array('element_cylinder')[element_index]) + 1,
+                   result_bundle.array('en_element')[chunk],
+                   result_bundle.array('en_node')[chunk],
+                   result_bundle.array('element_angle')[element_index],
+                   result_bundle.array('element_width')[element_index],
+                   result_bundle.array('line_load_max')[cycle_index, chunk],
+                   result_bundle.array('line_load_min')[cycle_index, chunk],
+                   result_bundle.array('head_lift')[cycle_index, chunk]]
+        safety_factor = result_bundle.array('safety_factor')
+        for i in range(safety_factor.shape[1]):
+            columns.append(safety_factor[cycle_index, i, chunk])
+        for i in pairs:
+            columns.append(result_bundle.array('thermal_motion')[i, chunk])
+        columns.append(result_bundle.array('wear')[cycle_index, chunk])
+        yield np.column_stack([np.asarray(item, dtype=np.float64) for item in columns])
+
+
+def write_csv(csv_file, result_bundle, rows, cycle_index, chunk_rows):
+    columns = table_columns(result_bundle, cycle_index)
+    with open(csv_file, 'wt') as f:
+        f.write(','.join([item[0] for item in columns]) + '\n')
+        for chunk in table_chunks(result_bundle, rows, cycle_index, chunk_rows):
+            np.savetxt(f, chunk, fmt=[item[1] for item in columns], delimiter=',')
+    return csv_file
+
+
+def write_sheets(workbook, result_bundle, rows, cycle_index, chunk_rows):
+    """
+    write one cycle into new sheets, the workbook is in constant memory mode, rows are flushed when written
+    """
+    header = [item[0] for item in table_columns(result_bundle, cycle_index)]
+    sheet_name = result_bundle.manifest['cycles'][cycle_index][:31]
+    worksheet = workbook.add_worksheet(sheet_name)
+    worksheet.write_row(0, 0, header)
+    sheet_count = 1
+    row_number = 1
+    for chunk in table_chunks(result_bundle, rows, cycle_index, chunk_rows):
+        for values in chunk.tolist():
+            if row_number >= XLSX_MAX_ROWS:
+                sheet_count += 1
+                suffix = '_' + str(sheet_count)
+                worksheet = workbook.add_worksheet(sheet_name[:31 - len(suffix)] + suffix)
+                worksheet.write_row(0, 0, header)
+                row_number = 1
+            worksheet.write_row(row_number, 0, values)
+            row_number += 1
+
+
+def export_sets(bundle_dir, sets, out_prefix, file_format=None, chunk_rows=None):
+    """
+    :param bundle_dir:          result bundle folder, written by db.bundle.write_bundle
+    :param sets:                element set names, e.g. WEB_EXCEL_SET, sets not in the bundle are skipped
+    :param out_prefix:          output file name prefix, e.g. /data/Wei/FEA19-0840/FEA19-0840
+    :param file_format:         'csv' or 'xlsx', default EXPORT_FORMAT
+    :param chunk_rows:          rows read and written at once, default EXPORT_CHUNK_ROWS
+    :return:                    list of written files
+    """
+    if file_format is None:
+        file_format = setting.environment_key['EXPORT_FORMAT']
+    if chunk_rows is None:
+        chunk_rows = setting.environment_key['EXPORT_CHUNK_ROWS']
+    if file_format == 'xlsx' and xlsxwriter is None:
+        print ('XLSXWRITER IS NOT INSTALLED, EXPORT TO CSV')
+        file_format = 'csv'
+    result_bundle = bundle.ResultBundle(bundle_dir)
+    cycles = result_bundle.manifest['cycles']
+    sets = [set_name.strip().upper() for set_name in sets if set_name.strip() != '']
+    files = []
+    for set_name in sets:
+        if set_name not in result_bundle.manifest['sets']:
+            continue
+        rows = result_bundle.set_rows(set_name)
+        if file_format == 'xlsx':
+            xlsx_file = out_prefix + '_' + set_name + '.xlsx'
+            workbook = xlsxwriter.Workbook(xlsx_file, {'constant_memory': True, 'nan_inf_to_errors': True})
+            try:
+                for i in range(len(cycles)):
+                    write_sheets(workbook, result_bundle, rows, i, chunk_rows)
+            finally:
+                workbook.close()
+            files.append(xlsx_file)
+        else:
+            for i, cycle in enumerate(cycles):
+                files.append(write_csv(out_prefix + '_' + set_name + '_' + cycle + '.csv', result_bundle, rows, i,
+                                       chunk_rows))
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='export the element set results to spreadsheets')
+    parser.add_argument('bundle', help='result bundle folder, <odb>_results')
+    parser.add_argument('sets', nargs='+', help='element set names')
+    parser.add_argument('--format', default=None, choices=['csv', 'xlsx'])
+    parser.add_argument('--prefix', default=None, help='output file name prefix, default the odb name')
+    args = parser.parse_args(argv)
+
+    out_prefix = args.prefix
+    if out_prefix is None:
+        out_prefix = args.bundle.rstrip('/\\')
+        if out_prefix.endswith('_results'):
+            out_prefix = out_prefix[:-len('_results')]
+    for file_name in export_sets(args.bundle, args.sets, out_prefix, args.format):
+        print ('EXPORTED: ' + file_name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,23 +1,106 @@
 import math
+import os
+import threading
 import numpy as np
 import time
 from conf import setting
+try:
+    from cStringIO import StringIO
+except ImportError:
+    # python 3, the compute package runs outside abaqus
+    from io import StringIO
+
+
+class ProgressWriter(object):
+    """
+    buffered progress file writer, the new lines are kept in memory and a background thread appends them to the file at
+    most once per flush interval. Only the lines not yet written are kept, each flush is one write of the new lines
+    to the end of the file, so the file I/O grows with the new lines, not with the whole log. A poller may see the last
+    line partly written while a flush runs, a line is complete when it ends with a newline.
+    """
+
+    def __init__(self, log_file, flush_interval):
+        """
+        :param log_file:            progress file read by web, existing lines are kept
+        :param flush_interval:      seconds between two file writes, 0 means write on every new line
+        """
+        self.log_file = log_file
+        self.flush_interval = flush_interval
+        # lines not written to the file yet
+        self.lines = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.flush_interval)
+            self.flush()
+
+    def write(self, line):
+        with self._lock:
+            self.lines.append(line)
+        if self._thread is None:
+            self.flush()
+
+    def flush(self):
+        # the background thread and the caller (RecordLog.flush, close) both flush, the writer lock is held for the
+        # take and the append, so the lines are written once and in order
+        with self._write_lock:
+            with self._lock:
+                if not self.lines:
+                    return
+                data = ''.join(self.lines)
+                self.lines = []
+            with open(self.log_file, 'at') as f:
+                f.write(data)
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
 
 
 class RecordLog(object):
     """
     used to record the process status
-    when add the new record, write to the log file will be executed.
+    when add the new record, the line is handed to a buffered ProgressWriter, the log file is updated at most once per
+    LOG_FLUSH_INTERVAL, close() must be called at the end of the job to write the last lines.
     """
 
-    def __init__(self):
+    def __init__(self, flush_interval=None):
         self.record = []
+        if flush_interval is None:
+            flush_interval = setting.environment_key['LOG_FLUSH_INTERVAL']
+        self.flush_interval = flush_interval
+        self.writers = {}
+
+    @staticmethod
+    def format_record(arr):
+        return str(arr[0]).ljust(20) + str(arr[1]).ljust(80) + str(int(arr[2])).ljust(20) + '\n'
 
     def add_record(self, arr, log_file):
         arr.insert(0, time.strftime("%X", time.localtime()))
         self.record.append(arr)
-        with open(log_file, 'at') as f:
-            f.write(str(arr[0]).ljust(20) + str(arr[1]).ljust(80) + str(int(arr[2])).ljust(20) + '\n')
+        if log_file not in self.writers:
+            self.writers[log_file] = ProgressWriter(log_file, self.flush_interval)
+        self.writers[log_file].write(self.format_record(arr))
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
 
     def __str__(self):
         return str(self.record)
@@ -45,12 +128,17 @@ class ChgElements(object):
         self.bore_center = 0
         self.center_coord_list = []
         self.step_results = {}
+        # step results reduced to the fixed step windows, compute.window, {node: [s11_init, s11_hot,
+        # s11_max_before_firing, [[s11_max, s11_min, e11_max, e11_min, wear, e11_fixed] for each fixed step window]]}
+        self.window_results = {}
         self.cycle_name = []
         for node in connectivity:
             self.step_results[node] = []
         # final results only include max, min, head lift, relative motion for operation and results for initial assembly
         self.final_results = {}
         self.fatigue_results = {}
+        # compute.closure, {node: [[closure, closure margin, pressure margin] for each fixed step window]}
+        self.closure_results = {}
         self.warning = []
 
     def _getlength(self, node1, node2):
@@ -185,6 +273,33 @@ class ChgElements(object):
         """
         self.step_results[node_id].append(result)
 
+    def set_step_results(self, node_id, results):
+        """
+        set all the step results of the node at once
+        :param node_id: node number
+        :param results: compute.store.StepView, [S11, E11] of each step
+        """
+        self.step_results[node_id] = results
+
+    @staticmethod
+    def _step_status(step_index, node_list, temp, ratio_criteria):
+        """
+        :return:            warning of one step if the S11 ratio of the nodes is over the criteria, otherwise None
+        """
+        min_value = min(temp)
+        max_value = max(temp)
+        if min_value < 0.001:
+            ratio = max_value / 0.001
+        else:
+            ratio = max_value / min_value
+        if ratio > ratio_criteria:
+            node_max = node_list[temp.index(max_value)]
+            node_min = node_list[temp.index(min_value)]
+            return ('STEP_' + str(step_index + 1) + ': MAX: ' + ' NODE: ' + '%20u' % node_max + ' VALUE:' +
+                    '%10.2f' % max_value + '--- MIN:' + ' NODE: ' + '%20u' % node_min + ' VALUE:' +
+                    '%10.2f' % min_value + '--- RATIO: ' + '%10.2f' % ratio)
+        return None
+
     def _check_status(self):
         s11_list = []
         node_list = []
@@ -196,32 +311,74 @@ class ChgElements(object):
             s11_list.append(temp)
         for i, item in enumerate(self.center_coord_list):
             temp = [x[i] for x in s11_list]
-            min_value = min(temp)
-            max_value = max(temp)
-            if min_value < 0.001:
-                ratio = max_value / 0.001
-            else:
-                ratio = max_value / min_value
-            if ratio > ratio_criteria:
-                node_max = node_list[temp.index(max_value)]
-                node_min = node_list[temp.index(min_value)]
-                info_list.append('STEP_' + str(i + 1) + ': MAX: ' + ' NODE: ' + '%20u' % node_max + ' VALUE:' +
-                                 '%10.2f' % max_value + '--- MIN:' + ' NODE: ' + '%20u' % node_min + ' VALUE:' +
-                                 '%10.2f' % min_value + '--- RATIO: ' + '%10.2f' % ratio)
+            info = self._step_status(i, node_list, temp, ratio_criteria)
+            if info is not None:
+                info_list.append(info)
         if info_list:
             self.warning = ['WARNING'] + info_list
 
+    def check_step(self, step_index, s11):
+        """
+        low memory mode, check the S11 ratio of one step when the step is read
+        :param step_index:  step order, start from 0
+        :param s11:         dict, {node: S11 of the step}
+        """
+        info = self._step_status(step_index, self.connectivity, [s11[node] for node in self.connectivity],
+                                 setting.environment_key['STRESS_DIFFER_RATIO'])
+        if info is not None:
+            if not self.warning:
+                self.warning = ['WARNING']
+            self.warning.append(info)
+
+    def set_window_results(self, node_id, result):
+        """
+        set the reduced step results of the node, see compute.window
+        """
+        self.window_results[node_id] = result
+
+    def get_window_s11(self, node_id, fixed_step, cylinder_num):
+        """
+        :return:            max S11 before the first fixed step, [[max S11, min S11] of each fixed step window]
+        """
+        if node_id in self.window_results:
+            result = self.window_results[node_id]
+            return result[2], [[item[0], item[1]] for item in result[3]]
+        s11_list = [x[0] for x in self.step_results[node_id]]
+        windows = []
+        for oper_step in fixed_step:
+            current_s11_list = s11_list[oper_step - 1:oper_step + cylinder_num]
+            windows.append([max(current_s11_list), min(current_s11_list)])
+        return max(s11_list[:fixed_step[0]]), windows
+
+    def get_window_max(self, node_id, fixed_step, cylinder_num):
+        """
+        :return:            [[max S11, max E11] of each fixed step window]
+        """
+        if node_id in self.window_results:
+            return [[item[0], item[2]] for item in self.window_results[node_id][3]]
+        windows = []
+        for oper_step in fixed_step:
+            current_list = list(self.step_results[node_id])[oper_step - 1:oper_step + cylinder_num]
+            windows.append([max([x[0] for x in current_list]), max([x[1] for x in current_list])])
+        return windows
+
+    def set_closure(self, node_id, closure_result):
+        self.closure_results[node_id] = closure_result
+
     def set_final_results(self, node, init_assem, hot_assem, fixed_step, cylinder_num):
+        self._check_status()
+        if node in self.window_results:
+            self._set_final_window(node, fixed_step)
+            return
         s11 = [x[0] for x in self.step_results[node]]
         e11 = [x[1] for x in self.step_results[node]]
         line_load = []
         head_lift = []
         wear_list = []
-        self._check_status()
         for oper_step in fixed_step:
             current_s11_list = s11[oper_step - 1:oper_step + cylinder_num]
             current_e11_list = e11[oper_step - 1:oper_step + cylinder_num]
-            wear = map(lambda (a, b): a * b, zip(current_s11_list, current_e11_list))
+            wear = [a * b for a, b in zip(current_s11_list, current_e11_list)]
             line_load.append([max(current_s11_list), min(current_s11_list)])
             head_lift.append((max(current_e11_list) - min(current_e11_list)) * 1000)
             wear_list.append(abs(sum(wear) - len(wear) * wear[0]))
@@ -231,90 +388,112 @@ class ChgElements(object):
             for j in range(i + 1, len(fixed_step)):
                 e11_another_fixed = e11[fixed_step[j] - 1]
                 thermal_motion.append((e11_fixed - e11_another_fixed) * 1000)
+        self._set_final(node, s11[init_assem - 1], s11[hot_assem - 1], line_load, head_lift, thermal_motion,
+                        wear_list)
+
+    def _set_final_window(self, node, fixed_step):
+        """
+        same results as set_final_results from the reduced window results
+        """
+        s11_init, s11_hot, _, windows = self.window_results[node]
+        line_load = [[item[0], item[1]] for item in windows]
+        head_lift = [(item[2] - item[3]) * 1000 for item in windows]
+        wear_list = [item[4] for item in windows]
+        thermal_motion = []
+        for i in range(len(fixed_step)):
+            for j in range(i + 1, len(fixed_step)):
+                thermal_motion.append((windows[i][5] - windows[j][5]) * 1000)
+        self._set_final(node, s11_init, s11_hot, line_load, head_lift, thermal_motion, wear_list)
+
+    def _set_final(self, node, s11_init, s11_hot, line_load, head_lift, thermal_motion, wear_list):
         fatigue_data = []
         fatigue_all = self.fatigue_results[node]
-        for i, oper_step in enumerate(fixed_step):
+        for i in range(len(line_load)):
             fatigue_data.append([])
             fatigue_data[-1] = fatigue_all[i + 1][12]
-        self.final_results[node] = [s11[init_assem - 1], s11[hot_assem - 1], line_load, head_lift,
-                                    fatigue_data, thermal_motion, wear_list]
+        self.final_results[node] = [s11_init, s11_hot, line_load, head_lift, fatigue_data, thermal_motion, wear_list]
 
-    def __str__(self):
+    def write(self, f, fatigue_criteria_name=None):
+        """
+        :param fatigue_criteria_name:   FATIGUE_CRITERIA_NAME of the job, the criteria of the fatigue results, None for
+                                        the current setting
+        """
         keys_1 = ['fix_load', 'firing_load', 'pre_load', 'unload_ratio', 'left_load', 'left_ratio',
                   'right_load', 'right_ratio']
         keys_2 = ['First Interpolation', 'Second Interpolation', 'Final Results', 'No Preload Interpolation',
                   'Safety Factor', 'Adjust Data']
-        fatigue_criteria_name = setting.environment_key['FATIGUE_CRITERIA_NAME']
-        data = '**' + '=' * 50 + '\n'
-        data += '**' + 'ELEMENT NUMBER: '.rjust(25) + str(self.number) + '\n'
-        data += '**' + 'CONNECTIVITY: '.rjust(25) + str(self.connectivity) + '\n'
-        data += '**' + 'AREA: '.rjust(25) + str('%10.3f' % self.area) + '\n'
-        data += '**' + 'ANGLE: '.rjust(25) + str('%10.1f' % self.angle) + '\n'
-        data += '**' + 'WIDTH: '.rjust(25) + str('%10.3f' % self.width) + '\n'
-        data += '**' + 'BORE ORDER: '.rjust(25) + str('%10u' % (self.bore_center + 1)) + '\n'
-        data += '**' + 'MATERIAL: '.rjust(25) + str(self.material) + '\n'
-        data += 'CENTER COORDINATE'.center(80, '*') + '\n'
+        if fatigue_criteria_name is None:
+            fatigue_criteria_name = setting.environment_key['FATIGUE_CRITERIA_NAME']
+        f.write('**' + '=' * 50 + '\n')
+        f.write('**' + 'ELEMENT NUMBER: '.rjust(25) + str(self.number) + '\n')
+        f.write('**' + 'CONNECTIVITY: '.rjust(25) + str(self.connectivity) + '\n')
+        f.write('**' + 'AREA: '.rjust(25) + str('%10.3f' % self.area) + '\n')
+        f.write('**' + 'ANGLE: '.rjust(25) + str('%10.1f' % self.angle) + '\n')
+        f.write('**' + 'WIDTH: '.rjust(25) + str('%10.3f' % self.width) + '\n')
+        f.write('**' + 'BORE ORDER: '.rjust(25) + str('%10u' % (self.bore_center + 1)) + '\n')
+        f.write('**' + 'MATERIAL: '.rjust(25) + str(self.material) + '\n')
+        f.write('CENTER COORDINATE'.center(80, '*') + '\n')
         for i, item in enumerate(self.center_coord_list):
-            data += ('STEP_' + str(i + 1)).rjust(20) * 3
-        data += '\n'
+            f.write(('STEP_' + str(i + 1)).rjust(20) * 3)
+        f.write('\n')
         for i, item in enumerate(self.center_coord_list):
-            data += 'X'.rjust(20) + 'Y'.rjust(20) + 'Z'.rjust(20)
-        data += '\n'
+            f.write('X'.rjust(20) + 'Y'.rjust(20) + 'Z'.rjust(20))
+        f.write('\n')
         for i, item in enumerate(self.center_coord_list):
             center_coord = [value.mean() for value in item]
             for coord in center_coord:
-                data += '%20.4f' % coord
-        data += '\n'
-        data += 'RESULTS'.center(80, '*') + '\n' + 'NODE'.rjust(20)
+                f.write('%20.4f' % coord)
+        f.write('\n')
+        f.write('RESULTS'.center(80, '*') + '\n' + 'NODE'.rjust(20))
         for i, item in enumerate(self.center_coord_list):
-            data += ('STEP_' + str(i + 1)).rjust(20) * 2
-        data += '\n' + 'NUM'.rjust(20)
+            f.write(('STEP_' + str(i + 1)).rjust(20) * 2)
+        f.write('\n' + 'NUM'.rjust(20))
         for i, item in enumerate(self.center_coord_list):
-            data += 'S11'.rjust(20) + 'E11'.rjust(20)
-        data += '\n'
+            f.write('S11'.rjust(20) + 'E11'.rjust(20))
+        f.write('\n')
         for node in self.connectivity:
-            data += '%20u' % node
+            f.write('%20u' % node)
             for i, item in enumerate(self.center_coord_list):
                 current_result = self.step_results[node][i]
-                data += '%20.2f' % current_result[0] + '%20.4f' % current_result[1]
-            data += '\n'
+                f.write('%20.2f' % current_result[0] + '%20.4f' % current_result[1])
+            f.write('\n')
         # print the fatigue data, create a if block to make code look nice
         if True:
-            data += '**' + ('FATIGUE DATA FOR ELEMENT - ' + str(self.number)).rjust(50) + '\n'
+            f.write('**' + ('FATIGUE DATA FOR ELEMENT - ' + str(self.number)).rjust(50) + '\n')
             for cycle_num, cycle in enumerate(self.cycle_name):
-                data += '=' * 50 + '\n'
-                data += ('Cycle_' + cycle).center(50, '=') + '\n'
+                f.write('=' * 50 + '\n')
+                f.write(('Cycle_' + cycle).center(50, '=') + '\n')
                 # first line            NODE NUM            Status
-                data += 'Node Num'.rjust(20) + 'Status'.rjust(10)
-                data += cycle.center(len(keys_1) * 20 + len(keys_2) * 50)
-                data += '\n'
+                f.write('Node Num'.rjust(20) + 'Status'.rjust(10))
+                f.write(cycle.center(len(keys_1) * 20 + len(keys_2) * 50))
+                f.write('\n')
                 # second line                       FIX, FIRING, PRE...
-                data += ''.rjust(30)
+                f.write(''.rjust(30))
                 for keys in keys_1:
-                    data += keys.rjust(20)
+                    f.write(keys.rjust(20))
                 for keys in keys_2:
-                    data += keys.center(50)
-                data += '\n'
+                    f.write(keys.center(50))
+                f.write('\n')
                 # third line                                    GOODMAN, GERBER, AVEREAGE, DANGVON, SWT
-                data += ''.rjust(30)
+                f.write(''.rjust(30))
                 for keys in keys_1:
-                    data += ''.rjust(20)
+                    f.write(''.rjust(20))
                 for keys in keys_2:
                     for name in fatigue_criteria_name:
-                        data += name.rjust(10)
-                data += '\n'
+                        f.write(name.rjust(10))
+                f.write('\n')
                 for node in self.connectivity:
                     fatigue_has_data = self.fatigue_results[node][0]
                     # start the data print
-                    data += '%20u' % node + fatigue_has_data.rjust(10)
+                    f.write('%20u' % node + fatigue_has_data.rjust(10))
                     fatigue_data = self.fatigue_results[node][1 + cycle_num]
                     for j, keys in enumerate(keys_1):
-                        data += '%20.2f' % fatigue_data[j]
+                        f.write('%20.2f' % fatigue_data[j])
                     for k, keys in enumerate(keys_2):
                         unload_ratio = fatigue_data[j + k + 1]
                         for num in unload_ratio:
-                            data += '%10.4f' % num
-                    data += '\n'
+                            f.write('%10.4f' % num)
+                    f.write('\n')
         # print the final data
         # get the thermal motion name list
         thermal_motion_name = []
@@ -322,59 +501,63 @@ class ChgElements(object):
             for j in range(i + 1, len(self.cycle_name)):
                 thermal_motion_name.append(self.cycle_name[i] + '-' + self.cycle_name[j])
         # first line
-        data += 'Final Data'.center(50, '*') + '\n'
+        f.write('Final Data'.center(50, '*') + '\n')
         # second line
-        data += 'Node'.rjust(20) + 'Init_Assem'.rjust(20) + 'Hot_Assem'.rjust(20)
+        f.write('Node'.rjust(20) + 'Init_Assem'.rjust(20) + 'Hot_Assem'.rjust(20))
         # 3 means the cycle_max_line_load, cycle_min_line_load, cycle_max_head_lift
         for cycle_num, cycle in enumerate(self.cycle_name):
-            data += (cycle.rjust(20)) * (3 + len(fatigue_criteria_name))
-        data += ('THERMAL'.rjust(20)) * (len(thermal_motion_name))
-        data += 'WEAR'.rjust(20)
-        data += '\n'
+            f.write((cycle.rjust(20)) * (3 + len(fatigue_criteria_name)))
+        f.write(('THERMAL'.rjust(20)) * (len(thermal_motion_name)))
+        f.write('WEAR'.rjust(20))
+        f.write('\n')
         # third line
-        data += 'Num'.rjust(20) + 'LINE_LOAD'.rjust(20) * 2
+        f.write('Num'.rjust(20) + 'LINE_LOAD'.rjust(20) * 2)
         for i in range(len(self.cycle_name)):
-            data += 'LINE_LOAD'.rjust(20) * 2
-            data += 'HEAD_LIFT'.rjust(20)
+            f.write('LINE_LOAD'.rjust(20) * 2)
+            f.write('HEAD_LIFT'.rjust(20))
             for j in range(len(fatigue_criteria_name)):
-                data += 'FATIGUE'.rjust(20)
+                f.write('FATIGUE'.rjust(20))
         for i in range(len(thermal_motion_name)):
-            data += 'MOTION'.rjust(20)
-        data += 'WEAR'.rjust(20)
-        data += '\n'
+            f.write('MOTION'.rjust(20))
+        f.write('WEAR'.rjust(20))
+        f.write('\n')
         # fourth line
-        data += ''.rjust(60)
+        f.write(''.rjust(60))
         for i in range(len(self.cycle_name)):
-            data += 'MAX'.rjust(20) + 'MIN'.rjust(20) + 'MAX'.rjust(20)
+            f.write('MAX'.rjust(20) + 'MIN'.rjust(20) + 'MAX'.rjust(20))
             for j in range(len(fatigue_criteria_name)):
-                data += fatigue_criteria_name[j].rjust(20)
+                f.write(fatigue_criteria_name[j].rjust(20))
         for j in range(len(thermal_motion_name)):
-            data += thermal_motion_name[j].rjust(20)
-        data += 'WEAR'.rjust(20)
-        data += '\n'
+            f.write(thermal_motion_name[j].rjust(20))
+        f.write('WEAR'.rjust(20))
+        f.write('\n')
         # now is the data line
         for node in self.connectivity:
             current_result = self.final_results[node]
-            data += '%20u' % node
-            data += '%20.2f' % current_result[0]
-            data += '%20.2f' % current_result[1]
+            f.write('%20u' % node)
+            f.write('%20.2f' % current_result[0])
+            f.write('%20.2f' % current_result[1])
             for i in range(len(self.cycle_name)):
-                data += '%20.2f' % current_result[2][i][0]
-                data += '%20.2f' % current_result[2][i][1]
-                data += '%20.2f' % current_result[3][i]
+                f.write('%20.2f' % current_result[2][i][0])
+                f.write('%20.2f' % current_result[2][i][1])
+                f.write('%20.2f' % current_result[3][i])
                 safety_factor = current_result[4][i]
                 for j in range(len(fatigue_criteria_name)):
-                    data += '%20.4f' % safety_factor[j]
+                    f.write('%20.4f' % safety_factor[j])
             for value in current_result[5]:
-                data += '%20.2f' % value
-            data += '%20.2f' % current_result[6][i]
-            data += '\n'
+                f.write('%20.2f' % value)
+            f.write('%20.2f' % current_result[6][i])
+            f.write('\n')
         if self.warning:
-            data += 'ELEMENT CHECK WARNING!!!'.center(30, '=') + '\n'
+            f.write('ELEMENT CHECK WARNING!!!'.center(30, '=') + '\n')
             for item in self.warning[1:]:
-                data += item + '\n'
-        data += 'ELEMENT PRINT FINISHED'.center(50, '=') + '\n'
-        return data
+                f.write(item + '\n')
+        f.write('ELEMENT PRINT FINISHED'.center(50, '=') + '\n')
+
+    def __str__(self):
+        f = StringIO()
+        self.write(f)
+        return f.getvalue()
 
 
 class ChgNodes(object):
@@ -392,6 +575,8 @@ class ChgNodes(object):
         self.cycle_name = ''
         self.cylinder_num = 1
         self.fixed_step = []
+        self.tied = False
+        self.reduced = False
 
     def set_init_coord(self, coord):
         """
@@ -409,6 +594,16 @@ class ChgNodes(object):
         """
         self.displacement.append(displacement)
 
+    def set_step_values(self, displacement, relative):
+        """
+        set the displacement and relative value of all steps at once
+        :param displacement: compute.store.StepView, [u1, u2, u3] of each step
+        :param relative: compute.store.StepView or list, [cshear1, cshear2, cslip1, cslip2] of each step
+        :return:
+        """
+        self.displacement = displacement
+        self.relative = relative
+
     def set_relative(self, relative_value):
         """
         collect the relative value
@@ -417,22 +612,49 @@ class ChgNodes(object):
         """
         self.relative.append(relative_value)
 
+    def set_relative_results(self, relative_list, final_relative):
+        """
+        low memory mode, the relative motion reduced when read (compute.window.RelativeReducer), the contact output of
+        the steps is not kept
+        :param relative_list: [[rlm pairs, fdp pairs] for each fixed step window]
+        :param final_relative: [[max rlm, max fdp, sum rlm, sum fdp] for each fixed step window]
+        :return:
+        """
+        self.relative = []
+        self.relative_list = relative_list
+        self.final_relative = final_relative
+        self.reduced = True
+
+    def set_tied(self, tied=True):
+        """
+        tied node, no contact output (or CSTATUS at most RELATIVE_TIED_STATUS) in all the steps, the relative motion is
+        0 without calculation
+        :param tied: True for tied node
+        :return:
+        """
+        self.tied = tied
+
     def cal_relative(self, fixed_step, cylinder_num, cycle_name):
         # do the calculation for RLM, FDP, but ignore MFFDP
         self.cycle_name = cycle_name
         self.cylinder_num = cylinder_num
         self.fixed_step = fixed_step
-        cshear1 = [x[0] for x in self.relative]
-        cshear2 = [x[1] for x in self.relative]
-        cslip1 = [x[2] for x in self.relative]
-        cslip2 = [x[3] for x in self.relative]
+        if getattr(self, 'tied', False):
+            # same layout as the calculated values, all the pairs are 0
+            pair_count = cylinder_num * (cylinder_num + 1) // 2
+            self.relative_list = [[[0.0] * pair_count, [0.0] * pair_count] for oper_step in fixed_step]
+            self.final_relative = [[0.0] * 4 for oper_step in fixed_step]
+            return
+        if getattr(self, 'reduced', False):
+            return
         relative_results = []
         final_results = []
         for oper_step in fixed_step:
-            shear_list_1 = cshear1[oper_step - 1:oper_step + cylinder_num]
-            shear_list_2 = cshear2[oper_step - 1:oper_step + cylinder_num]
-            slip_list_1 = cslip1[oper_step - 1:oper_step + cylinder_num]
-            slip_list_2 = cslip2[oper_step - 1:oper_step + cylinder_num]
+            window = self.relative[oper_step - 1:oper_step + cylinder_num]
+            shear_list_1 = [x[0] for x in window]
+            shear_list_2 = [x[1] for x in window]
+            slip_list_1 = [x[2] for x in window]
+            slip_list_2 = [x[3] for x in window]
             res_rlm = []
             res_fdp = []
             relative_results.append([])
@@ -455,82 +677,88 @@ class ChgNodes(object):
     def get_displacement(self):
         return self.displacement
 
-    def __str__(self):
+    def write(self, f):
         title = ['FIXED']
         for i in range(self.cylinder_num):
             title.append('FIRING_' + str(i + 1))
         sub_title = ['SHEAR1', 'SHEAR2', 'SLIP1', 'SLIP2']
-        data = 'NODE PRINT DATA'.center(80, '=') + '\n'
+        f.write('NODE PRINT DATA'.center(80, '=') + '\n')
 
-        data += 'BASE INFORMATION'.center(50, '=') + '\n'
-        data += 'NODE'.rjust(20) + 'ORIGINAL'.center(30)
+        f.write('BASE INFORMATION'.center(50, '=') + '\n')
+        f.write('NODE'.rjust(20) + 'ORIGINAL'.center(30))
         for i in range(len(self.displacement)):
-            data += ('STEP_' + str(i + 1)).center(30)
-        data += '\n' + 'NUMBER'.rjust(20) + 'X'.rjust(10) + 'Y'.rjust(10) + 'Z'.rjust(10)
+            f.write(('STEP_' + str(i + 1)).center(30))
+        f.write('\n' + 'NUMBER'.rjust(20) + 'X'.rjust(10) + 'Y'.rjust(10) + 'Z'.rjust(10))
         for i in range(len(self.displacement)):
-            data += 'U1'.rjust(10) + 'U2'.rjust(10) + 'U3'.rjust(10)
-        data += '\n'
-        data += str(self.node_number).rjust(20)
+            f.write('U1'.rjust(10) + 'U2'.rjust(10) + 'U3'.rjust(10))
+        f.write('\n')
+        f.write(str(self.node_number).rjust(20))
         for item in self.init_coord:
-            data += '%10.4f' % item
+            f.write('%10.4f' % item)
         for i, item in enumerate(self.displacement):
             for value in item:
-                data += '%10.4f' % value
-        data += '\n'
+                f.write('%10.4f' % value)
+        f.write('\n')
 
-        data += 'RELATIVE RAW DATA'.center(50, '=') + '\n'
-        data += 'NODE'.rjust(20)
+        f.write('RELATIVE RAW DATA'.center(50, '=') + '\n')
+        f.write('NODE'.rjust(20))
         for cycle in self.cycle_name:
-            data += cycle.center(40 * (self.cylinder_num + 1))
-        data += '\n' + 'NUMBER'.rjust(20)
+            f.write(cycle.center(40 * (self.cylinder_num + 1)))
+        f.write('\n' + 'NUMBER'.rjust(20))
         for cycle in self.cycle_name:
             for item in title:
                 for i in sub_title:
-                    data += item.rjust(10)
-        data += '\n' + ''.rjust(20)
+                    f.write(item.rjust(10))
+        f.write('\n' + ''.rjust(20))
         for cycle in self.cycle_name:
             for item in title:
                 for key in sub_title:
-                    data += key.rjust(10)
-        data += '\n' + str(self.node_number).rjust(20)
-        for oper_step in self.fixed_step:
+                    f.write(key.rjust(10))
+        f.write('\n' + str(self.node_number).rjust(20))
+        # the contact output of the steps is not kept in low memory mode, the raw data is empty
+        for oper_step in self.fixed_step if len(self.relative) else []:
             for i in range(self.cylinder_num + 1):
                 relative_data = self.relative[oper_step + i - 1]
                 for item in relative_data:
-                    data += '%10.4f' % item
-        data += '\n'
+                    f.write('%10.4f' % item)
+        f.write('\n')
 
-        data += 'RELATIVE CALCULATED DATA'.center(50, '=') + '\n'
+        header = 'RELATIVE CALCULATED DATA' + (', TIED' if getattr(self, 'tied', False) else '')
+        f.write(header.center(50, '=') + '\n')
         data_size = 0
         for i in range(self.cylinder_num + 1):
             data_size += i
-        data += 'NODE'.rjust(20)
+        f.write('NODE'.rjust(20))
         for cycle in self.cycle_name:
             for i in range(data_size):
-                data += (cycle + '_RLM').rjust(20)
+                f.write((cycle + '_RLM').rjust(20))
             for i in range(data_size):
-                data += (cycle + '_FDP').rjust(20)
-            data += (cycle + '_RLM').rjust(20) + (cycle + '_FDP').rjust(20)
-            data += (cycle + '_RLM_SUM').rjust(20) + (cycle + '_FDP_SUM').rjust(20)
-        data += '\n' + 'NUMBER'.rjust(20)
+                f.write((cycle + '_FDP').rjust(20))
+            f.write((cycle + '_RLM').rjust(20) + (cycle + '_FDP').rjust(20))
+            f.write((cycle + '_RLM_SUM').rjust(20) + (cycle + '_FDP_SUM').rjust(20))
+        f.write('\n' + 'NUMBER'.rjust(20))
         temp_data = ''
         for i, item in enumerate(title):
             for j in range(i + 1, len(title)):
                 temp_data += (item + '-' + title[j]).rjust(20)
         for cycle in self.cycle_name:
-            data += temp_data * 2 + 'FINAL'.rjust(20) * 4
-        data += '\n' + str(self.node_number).rjust(20)
+            f.write(temp_data * 2 + 'FINAL'.rjust(20) * 4)
+        f.write('\n' + str(self.node_number).rjust(20))
         for i in range(len(self.fixed_step)):
             current_relative = self.relative_list[i]
             for item in current_relative:
                 for value in item:
-                    data += '%20.2f' % value
+                    f.write('%20.2f' % value)
             current_relative = self.final_relative[i]
             for item in current_relative:
-                data += '%20.2f' % item
-        data += '\n'
-        data += 'NODE PRINT DATA FINISHED'.center(80, '=') + '\n'
-        return data
+                f.write('%20.2f' % item)
+        f.write('\n')
+        f.write('NODE PRINT DATA FINISHED'.center(80, '=') + '\n')
+
+    def __str__(self):
+        f = StringIO()
+        self.write(f)
+        return f.getvalue()
 
 
 class ChgMaterial(object):
@@ -854,6 +1082,9 @@ class FatigueData(object):
         self.preload = preload
         self.fatigue_name = fatigue_name
         self.fatigue_data = {}
+        # min, max allowed ratio of the whole table for each criteria, used by the fatigue screen of cal_fatigue
+        self.allowable_min = []
+        self.allowable_max = []
 
     def set_fatigue_data(self, fatigue_value):
         for i, fixload in enumerate(self.fixload):
@@ -865,6 +1096,13 @@ class FatigueData(object):
                 self.fatigue_data[fixload][preload] = current_fatigue[start_num: end_num]
                 start_num = end_num
                 end_num += len(self.fatigue_name)
+        columns = [[] for name in self.fatigue_name]
+        for fixload_data in self.fatigue_data.values():
+            for ratio_list in fixload_data.values():
+                for k, value in enumerate(ratio_list[:len(columns)]):
+                    columns[k].append(value)
+        self.allowable_min = [min(values) if values else 0 for values in columns]
+        self.allowable_max = [max(values) if values else 0 for values in columns]
         return None
 
     def __str__(self):
@@ -943,8 +1181,8 @@ class BoreNodeLayer(object):
         :return:            None
         """
         node_count = len(self.bore_nodes)
-        # bore_nodes.items()[0], get the first element of bore_nodes, bore_nodes.items()[0][1] is the value
-        step_count = len(self.bore_nodes.items()[0][1]) - 1
+        # the first value of bore_nodes, [[x, y, z], [u1, u2, u3]...]
+        step_count = len(list(self.bore_nodes.values())[0]) - 1
         center_all_steps = []
         if self.bore_unique_center:  # using unique circle center for all layers in one cylinder.
             for step_num in range(step_count):
@@ -1083,75 +1321,79 @@ class BoreNodeLayer(object):
     def get_fourier(self):
         return self.fourier_result
 
-    def __str__(self):
-        data = 'BORE DISTORTION PRINT START' + '\n'
-        data += 'Cylinder Num:'.rjust(30) + str(self.cylinder_num + 1).rjust(20) + '\n'
-        data += 'Z Depth:'.rjust(30) + str(self.z_depth).rjust(20) + '\n'
-        data += 'Fourier Order:'.rjust(30) + str(self.fourier_order).rjust(20) + '\n'
-        data += 'Using Unique Bore Center?'.rjust(30) + str(self.bore_unique_center).rjust(20) + '\n'
-        data += 'Normal Center X:'.rjust(30) + '%20.3f' % self.bore_x + '\n'
-        data += 'Normal Center Y:'.rjust(30) + '%20.3f' % self.bore_y + '\n'
-        data += 'Normal Bore Radius:'.rjust(30) + '%20.3f' % self.radius + '\n'
-
-        data += 'LAYER NODE DISPLACEMENT PRINT START'.center(30, '=') + '\n'
+    def write(self, f):
+        f.write('BORE DISTORTION PRINT START' + '\n')
+        f.write('Cylinder Num:'.rjust(30) + str(self.cylinder_num + 1).rjust(20) + '\n')
+        f.write('Z Depth:'.rjust(30) + str(self.z_depth).rjust(20) + '\n')
+        f.write('Fourier Order:'.rjust(30) + str(self.fourier_order).rjust(20) + '\n')
+        f.write('Using Unique Bore Center?'.rjust(30) + str(self.bore_unique_center).rjust(20) + '\n')
+        f.write('Normal Center X:'.rjust(30) + '%20.3f' % self.bore_x + '\n')
+        f.write('Normal Center Y:'.rjust(30) + '%20.3f' % self.bore_y + '\n')
+        f.write('Normal Bore Radius:'.rjust(30) + '%20.3f' % self.radius + '\n')
+
+        f.write('LAYER NODE DISPLACEMENT PRINT START'.center(30, '=') + '\n')
         print_title = True
         for key, value in self.bore_nodes.items():
             if print_title:
-                data += 'NODE NUM'.rjust(20)
-                data += 'ORIGINAL_DISP_X'.rjust(20) + 'ORIGINAL_DISP_Y'.rjust(20) + 'ORIGINAL_DISP_Z'.rjust(20)
+                f.write('NODE NUM'.rjust(20))
+                f.write('ORIGINAL_DISP_X'.rjust(20) + 'ORIGINAL_DISP_Y'.rjust(20) + 'ORIGINAL_DISP_Z'.rjust(20))
                 for j in range(1, len(value)):
-                    data += ('STEP_' + str(j) + '_U1').rjust(20) + ('STEP_' + str(j) + '_U2').rjust(20) + (
-                            'STEP_' + str(j) + '_U3').rjust(20)
-                data += '\n'
+                    f.write(('STEP_' + str(j) + '_U1').rjust(20) + ('STEP_' + str(j) + '_U2').rjust(20) + (
+                            'STEP_' + str(j) + '_U3').rjust(20))
+                f.write('\n')
                 print_title = False
-            data += '%20u' % key
+            f.write('%20u' % key)
             for i, disp in enumerate(value):
                 for disp_value in disp:
-                    data += '%20.4f' % disp_value
-            data += '\n'
-        data += 'LAYER NODE DISPLACEMENT PRINT DONE'.center(30, '=') + '\n'
+                    f.write('%20.4f' % disp_value)
+            f.write('\n')
+        f.write('LAYER NODE DISPLACEMENT PRINT DONE'.center(30, '=') + '\n')
 
-        data += 'LAYER CENTER COORDINATE PRINT START'.center(30, '=') + '\n'
+        f.write('LAYER CENTER COORDINATE PRINT START'.center(30, '=') + '\n')
         for i, value in enumerate(self.center):
-            data += ('STEP_' + str(i + 1) + '_X').rjust(20) + ('STEP_' + str(i + 1) + '_Y').rjust(20) + (
-                            'STEP_' + str(i + 1) + '_Z').rjust(20)
-        data += '\n'
+            f.write(('STEP_' + str(i + 1) + '_X').rjust(20) + ('STEP_' + str(i + 1) + '_Y').rjust(20) + (
+                            'STEP_' + str(i + 1) + '_Z').rjust(20))
+        f.write('\n')
         for i, value in enumerate(self.center):
             for disp in value:
-                data += '%20.3f' % disp
-        data += '\n'
-        data += 'LAYER CENTER COORDINATE PRINT DONE'.center(30, '=') + '\n'
+                f.write('%20.3f' % disp)
+        f.write('\n')
+        f.write('LAYER CENTER COORDINATE PRINT DONE'.center(30, '=') + '\n')
 
-        data += 'FOURIER RESULTS PRINT START'.center(30, '=') + '\n'
-        data += 'ORDER'.rjust(20)
+        f.write('FOURIER RESULTS PRINT START'.center(30, '=') + '\n')
+        f.write('ORDER'.rjust(20))
         for i in range(self.fourier_order + 1):
-            data += str(i).rjust(20)*2
-        data += '\n'
-        data += ''.rjust(20)
+            f.write(str(i).rjust(20)*2)
+        f.write('\n')
+        f.write(''.rjust(20))
         for i in range(self.fourier_order):
-            data += 'COEFFICIENT'.rjust(20) + 'PHASE_ANGLE'.rjust(20)
-        data += '\n'
+            f.write('COEFFICIENT'.rjust(20) + 'PHASE_ANGLE'.rjust(20))
+        f.write('\n')
         for i in range(len(self.center)):
-            data += ('STEP' + str(i + 1)).rjust(20)
+            f.write(('STEP' + str(i + 1)).rjust(20))
             current_result = self.fourier_result[i]
             for j, value in enumerate(current_result):
-                data += '%20.2f' % value[0] + '%20.4f' % value[1]
-            data += '\n'
-        data += 'FOURIER RESULTS PRINT DONE'.center(30, '=') + '\n'
+                f.write('%20.2f' % value[0] + '%20.4f' % value[1])
+            f.write('\n')
+        f.write('FOURIER RESULTS PRINT DONE'.center(30, '=') + '\n')
 
-        data += 'STANDARD DISTORTION DATA PRINT START'.center(30, '=') + '\n'
-        data += 'ANGLE'.rjust(20)
+        f.write('STANDARD DISTORTION DATA PRINT START'.center(30, '=') + '\n')
+        f.write('ANGLE'.rjust(20))
         for angle in self.angle_list:
-            data += '%20.1f' % angle
-        data += '\n'
+            f.write('%20.1f' % angle)
+        f.write('\n')
         for i in range(len(self.center)):
-            data += ('STEP' + str(i + 1)).rjust(20)
+            f.write(('STEP' + str(i + 1)).rjust(20))
             delta_r_list = self.angle_data[i]
             for delta_r in delta_r_list:
-                data += '%20.5f' % delta_r
-            data += '\n'
-        data += 'STANDARD DISTORTION DATA PRINT DONE'.center(30, '=') + '\n'
-        return data
+                f.write('%20.5f' % delta_r)
+            f.write('\n')
+        f.write('STANDARD DISTORTION DATA PRINT DONE'.center(30, '=') + '\n')
+
+    def __str__(self):
+        f = StringIO()
+        self.write(f)
+        return f.getvalue()
 
 
 class CamNode(object):
@@ -1196,20 +1438,24 @@ class CamNode(object):
     def get_cam_distortion(self):
         return self.cam_distortion
 
-    def __str__(self):
-        data = 'CAM DISTORTION PRINT START'.center(50, '*') + '\n'
-        data += 'NODE'.rjust(20)
+    def write(self, f):
+        f.write('CAM DISTORTION PRINT START'.center(50, '*') + '\n')
+        f.write('NODE'.rjust(20))
         for step_num in range(1, self.total_step_num):
-            data += ('STEP_' + str(step_num)).rjust(20)
-        data += '\n'
+            f.write(('STEP_' + str(step_num)).rjust(20))
+        f.write('\n')
         for node in self.sort_node:
-            data += '%20u' % node
+            f.write('%20u' % node)
             value = self.cam_distortion[node]
             for item in value:
-                data += '%20.3f' % item
-            data += '\n'
-        data = 'CAM DISTORTION PRINT DONE'.center(50, '*') + '\n'
-        return data
+                f.write('%20.3f' % item)
+            f.write('\n')
+        f.write('CAM DISTORTION PRINT DONE'.center(50, '*') + '\n')
+
+    def __str__(self):
+        f = StringIO()
+        self.write(f)
+        return f.getvalue()
 
 
 
@@ -0,0 +1,162 @@
+"""
+top-k critical locations of the computed results, read from the result bundle (db.bundle). For each gasket set,
+cylinder and cycle the worst k locations of every metric are selected by partial sort (argpartition), the full rows are
+never sorted.
+
+metrics:
+    SF_<criteria>       fatigue safety factor of FATIGUE_CRITERIA_NAME, lowest first, element node
+    HEAD_LIFT           head lift, highest first, element node
+    LINE_LOAD_MAX       max line load, highest first, element node
+    RLM_MAX             max relative motion of the cycle, highest first, node
+    FDP_MAX             max frictional power density of the cycle, highest first, node
+
+usage:
+    python -m db.query /data/Wei/FEA19-0840/FEA19-0840_results --top 5 --metric SF_GOODMAN --metric RLM_MAX
+"""
+import argparse
+import json
+import sys
+import numpy as np
+from db import bundle
+
+# metric: (bundle array, index of the array axis after cycle, True if the lowest is the worst, node metric)
+METRICS = {
+    'HEAD_LIFT': ('head_lift', None, False, False),
+    'LINE_LOAD_MAX': ('line_load_max', None, False, False),
+    'RLM_MAX': ('relative', 0, False, True),
+    'FDP_MAX': ('relative', 1, False, True),
+}
+
+
+def metric_names(result_bundle):
+    """
+    :return:                all metrics of the bundle, safety factors first
+    """
+    return ['SF_' + item for item in result_bundle.manifest['fatigue_criteria']] + sorted(METRICS)
+
+
+def _metric(result_bundle, name):
+    if name.startswith('SF_'):
+        return 'safety_factor', result_bundle.manifest['fatigue_criteria'].index(name[3:]), True, False
+    if name not in METRICS:
+        raise Exception('UNKNOWN METRIC ' + name)
+    return METRICS[name]
+
+
+def top_k(values, k, lowest):
+    """
+    :param values:          1d array, NaN is ignored
+    :param k:               location count
+    :param lowest:          True to select the smallest values
+    :return:                index of the k worst values, worst first
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid) or k <= 0:
+        return valid[:0]
+    key = values[valid] if lowest else -values[valid]
+    if len(valid) > k:
+        selected = np.argpartition(key, k - 1)[:k]
+    else:
+        selected = np.arange(len(valid))
+    return valid[selected[np.argsort(key[selected], kind='mergesort')]]
+
+
+def query(result_bundle, k=10, metrics=None, sets=None, cycles=None):
+    """
+    :param result_bundle:   bundle.ResultBundle or bundle folder
+    :param k:               locations of each (metric, set, cylinder, cycle)
+    :param metrics:         metric names, default all metrics
+    :param sets:            gasket set names, default all sets of the bundle
+    :param cycles:          cycle names, default all cycles
+    :return:                list of dict, metric, set, cylinder (start from 1), cycle, rank, element, node, value
+    """
+    if not isinstance(result_bundle, bundle.ResultBundle):
+        result_bundle = bundle.ResultBundle(result_bundle)
+    manifest = result_bundle.manifest
+    if metrics is None:
+        metrics = metric_names(result_bundle)
+    if sets is None:
+        sets = manifest['sets']
+    if cycles is None:
+        cycles = manifest['cycles']
+    sets = [item.strip().upper() for item in sets]
+    records = []
+    for set_name in sets:
+        if set_name not in manifest['sets']:
+            continue
+        rows, element_index = result_bundle.set_rows(set_name, return_elements=True)
+        cylinder = np.asarray(result_bundle.array('element_cylinder')[element_index])
+        # each cylinder is one slice, rows in file order inside the cylinder, the arrays are read in order
+        order = np.lexsort((rows, cylinder))
+        rows = rows[order]
+        cylinder = cylinder[order]
+        row_elements = np.asarray(result_bundle.array('en_element')[rows])
+        row_nodes = np.asarray(result_bundle.array('en_node')[rows])
+        cylinder_list = np.unique(cylinder)
+        bounds = np.searchsorted(cylinder, np.append(cylinder_list, cylinder_list[-1] + 1)) if len(rows) else []
+        # one node is shared by several element rows, node metrics use the first row of each node in the cylinder
+        key = (cylinder.astype(np.int64) << 32) | row_nodes
+        order = np.argsort(key)
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = key[order][1:] != key[order][:-1]
+        node_first = np.zeros(len(rows), dtype=bool)
+        node_first[order[first]] = True
+        node_index, node_found = result_bundle.index_of('nodes', row_nodes, order)
+        node_first &= node_found
+        for cycle in cycles:
+            cycle_index = result_bundle.cycle_index(cycle)
+            for name in metrics:
+                array_name, sub_index, lowest, node_metric = _metric(result_bundle, name)
+                data = result_bundle.array(array_name)[cycle_index]
+                if sub_index is not None:
+                    data = data[sub_index]
+                if node_metric:
+                    values = np.array(data[node_index], dtype=np.float64)
+                    values[~node_first] = np.nan
+                else:
+                    values = np.asarray(data[rows], dtype=np.float64)
+                for i, cylinder_order in enumerate(cylinder_list):
+                    start, end = bounds[i], bounds[i + 1]
+                    current = values[start:end]
+                    for rank, j in enumerate(top_k(current, k, lowest)):
+                        records.append({'metric': name, 'set': set_name, 'cylinder': int(cylinder_order) + 1,
+                                        'cycle': manifest['cycles'][cycle_index], 'rank': rank + 1,
+                                        'element': int(row_elements[start + j]), 'node': int(row_nodes[start + j]),
+                                        'value': float(current[j])})
+    return records
+
+
+def format_table(records):
+    """
+    :return:                str, one line for each record
+    """
+    lines = ['METRIC'.ljust(16) + 'SET'.ljust(16) + 'CYLINDER'.rjust(10) + 'CYCLE'.rjust(12) + 'RANK'.rjust(6) +
+             'ELEMENT'.rjust(12) + 'NODE'.rjust(12) + 'VALUE'.rjust(14)]
+    for item in records:
+        lines.append(item['metric'].ljust(16) + item['set'].ljust(16) + str(item['cylinder']).rjust(10) +
+                     item['cycle'].rjust(12) + str(item['rank']).rjust(6) + str(item['element']).rjust(12) +
+                     str(item['node']).rjust(12) + ('%14.4f' % item['value']))
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='top-k critical locations of the post process results')
+    parser.add_argument('bundle', help='result bundle folder, <odb>_results')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--metric', action='append', default=None, help='metric name, repeat for more metrics')
+    parser.add_argument('--set', action='append', default=None, help='gasket set name, repeat for more sets')
+    parser.add_argument('--cycle', action='append', default=None, help='cycle name, repeat for more cycles')
+    parser.add_argument('--json', action='store_true', help='print the records as json')
+    args = parser.parse_args(argv)
+
+    records = query(args.bundle, args.top, args.metric, args.set, args.cycle)
+    if args.json:
+        print (json.dumps(records, indent=1))
+    else:
+        print (format_table(records))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+full text report of the post process results. Every element, node, bore layer and cam node set is streamed to a
+buffered file by its own write(f), in the same fixed width layout as its __str__, the whole text is never held in
+memory.
+"""
+
+# write buffer of the report file, byte
+REPORT_BUFFER_SIZE = 1024 * 1024
+
+
+def write_section_title(f, title):
+    f.write('\n' + (' ' + title + ' ').center(100, '#') + '\n')
+
+
+def write_report(report_file, process_setting):
+    """
+    write all the elements, nodes, bore distortion layers and cam nodes into one report file, in one pass
+    :param report_file:         output file name
+    :param process_setting:     big dict, contained all results, after cal_fatigue
+    :return:                    report_file
+    """
+    with open(report_file, 'wt', REPORT_BUFFER_SIZE) as f:
+        f.write(('**==CUSTOMER: ' + str(process_setting['CUSTOMER'])).ljust(50, '=') + '\n')
+        f.write(('**==PROJECT: ' + str(process_setting['PROJECT'])).ljust(50, '=') + '\n')
+        f.write(('**==REQUEST_NO: ' + str(process_setting['REQUEST_NO'])).ljust(50, '=') + '\n')
+        f.write(('**==ODB: ' + str(process_setting['ODB_FILE'])).ljust(50, '=') + '\n')
+
+        element_result = process_setting.get('ELEM_RESULT', {})
+        write_section_title(f, 'ELEMENT RESULTS: ' + str(len(element_result)))
+        fatigue_criteria_name = process_setting.get('FATIGUE_CRITERIA_NAME')
+        for element in sorted(element_result):
+            element_result[element].write(f, fatigue_criteria_name)
+
+        node_result = process_setting.get('NODE_RESULT', {})
+        write_section_title(f, 'NODE RESULTS: ' + str(len(node_result)))
+        for node in sorted(node_result):
+            node_result[node].write(f)
+
+        if 'BORE_DISTORTION_DATA' in process_setting:
+            bore_distortion = process_setting['BORE_DISTORTION_DATA']
+            write_section_title(f, 'BORE DISTORTION')
+            for cylinder in sorted(bore_distortion):
+                # z level from top to bottom, same as Z_LEVEL_LIST
+                for z_level in sorted(bore_distortion[cylinder], reverse=True):
+                    bore_distortion[cylinder][z_level].write(f)
+
+        if 'CAM_DISTORTION_DATA' in process_setting:
+            cam_distortion = process_setting['CAM_DISTORTION_DATA']
+            write_section_title(f, 'CAM DISTORTION')
+            for node_set in sorted(cam_distortion):
+                f.write(node_set.center(50, '*') + '\n')
+                cam_distortion[node_set].write(f)
+    return report_file
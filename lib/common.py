@@ -8,9 +8,46 @@ import visualization
 import displayGroupOdbToolset as dgo
 from db import model
 from conf import setting
+from lib import instrument
+from lib import extract
+from lib import distribute
+from lib import setindex
+from compute import store
+from compute import window
+from compute import render
+from compute import imagecache
+from compute import sectionforce
+from compute import bolt
+from compute import closure
+# compute stages are kept in the abaqus free compute package, imported here for the existing callers
+from compute.stages import find_fatigue_adjacent, fatigue_interpolate, fatigue_tables, cal_relative, cal_fatigue, \
+    cal_distortion, cal_closure
 import os
+import shutil
 import time
 import math
+import numpy as np
+
+
+# element sets added by the jobs on the odb kept open by the daemon, {(odb path, instance name): set names}, the sets of
+# a former job are not indexed for the next jobs
+added_element_sets = {}
+
+
+def unique_set_name(repository, set_name):
+    """
+    sets can not be deleted from an opened odb, when the odb is kept open for the next job (daemon mode) the set
+    created by the former job still exists, a numbered name is returned in this case.
+    :param repository:      nodeSets or elementSets of the instance
+    :param set_name:        preferred set name
+    :return:                set_name, or set_name_1, set_name_2, ... if set_name already exists
+    """
+    if set_name not in repository.keys():
+        return set_name
+    i = 1
+    while set_name + '_' + str(i) in repository.keys():
+        i += 1
+    return set_name + '_' + str(i)
 
 
 # current_session is the current displayed object in window, will be used for many functions, set as global
@@ -88,7 +125,10 @@ def bore_distortion_auto(process_setting, log_array, log_object, log_file, bore_
                                                                 bore_distortion_radius, True,
                                                                 fourier_order)  # type: model.BoreNodeLayer
 
-    leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + bore_distortion_auto_liner,))
+    liner_instance = setindex.find_instance(process_setting['INSTANCE_SETS'], bore_distortion_auto_liner,
+                                            prefer=process_setting['GASKET_INSTANCE'])
+    leaf = dgo.LeafFromElementSets(elementSets=((liner_instance or process_setting['GASKET_INSTANCE']) + '.' +
+                                                bore_distortion_auto_liner,))
     current_session.odbDisplay.displayGroup.replace(leaf=leaf)
 
     # search for right radius, all liner should have same radius, so only one cylinder is checked.
@@ -192,6 +232,8 @@ def get_material_data(opened_odb, process_setting, log_array, log_object, log_fi
     start_record_value = process_setting['START_LOG_VALUE']
     i = 0
     if choice == 'MATERIAL':
+        # compiled loading curves of the gasket materials, compute.closure
+        gasket_curves = {}
         all_materials = opened_odb.materials
         number_interval = float(procedure_length) / len(all_materials)
         for k, v in all_materials.items():
@@ -218,6 +260,7 @@ def get_material_data(opened_odb, process_setting, log_array, log_object, log_fi
                 current_material.set_type(behavior_type)
                 loading_curve = behavior.table
                 current_material.set_loading(loading_curve)
+                gasket_curves[name] = closure.compile_material(current_material.loading)
                 if hasattr(behavior, 'unloadingTable'):
                     loading_curve = behavior.unloadingTable
                     current_material.set_unloading(loading_curve)
@@ -232,6 +275,7 @@ def get_material_data(opened_odb, process_setting, log_array, log_object, log_fi
             log_object.add_record(log_array[-1], log_file)
             i += 1
         process_setting['MATERIAL_DATA'] = result_from_odb
+        process_setting['GASKET_CURVES'] = gasket_curves
     elif choice == 'SECTION':
         all_sections = opened_odb.sections
         number_interval = float(procedure_length) / len(all_sections)
@@ -292,22 +336,36 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
     element_result = {}
     node_result = {}
 
-    gasket_node_set = setting.environment_key['GASKET_ALL_NODES']
     report_set = [elem_set.strip().upper() for elem_set in report_set if elem_set != '']
     excel_set = [elem_set.strip().upper() for elem_set in excel_set if elem_set != '']
     fatigue_set = [elem_set.strip().upper() for elem_set in fatigue_set if elem_set != '']
     add_elem_set = [elem_set.strip().upper() for elem_set in add_elem_set if elem_set != '']
+
+    # instance map of the odb sets, the gasket sets are in one instance, the gasket node set and the added element
+    # sets are created in it
+    instances = opened_odb.rootAssembly.instances
+    instance_sets = setindex.build_instance_sets(instances)
+    process_setting['INSTANCE_SETS'] = instance_sets
+    process_setting['GASKET_INSTANCE'] = setindex.gasket_instance(instance_sets, report_set + excel_set + fatigue_set)
+    gasket_instance = instances[process_setting['GASKET_INSTANCE']]
+    gasket_node_set = unique_set_name(gasket_instance.nodeSets, setting.environment_key['GASKET_ALL_NODES'])
     gasket_elem_set = report_set + excel_set + fatigue_set + add_elem_set
     gasket_elem_set = list(set(gasket_elem_set))
     gasket_elem_set = [elem_set for elem_set in gasket_elem_set if elem_set != '']
 
     process_setting['GASKET_ELEM_SETS'] = gasket_elem_set
     start_record_value = process_setting['START_LOG_VALUE']
+    profiler = process_setting['PROFILER']  # type: instrument.StageProfiler
 
     total_cylinder_num = process_setting['TOTAL_CYLINDER_NAME']
     view_name = setting.environment_key['VIEW_NAME']
     global current_session
-    current_session = session.Viewport(name=view_name)
+    if view_name in session.viewports.keys():
+        # odb kept open by the daemon, reuse the viewport of former job and remove its view cut
+        current_session = session.viewports[view_name]
+        current_session.odbDisplay.setValues(viewCut=OFF)
+    else:
+        current_session = session.Viewport(name=view_name)
     current_session.makeCurrent()
     current_session.maximize()
     current_session.setValues(displayedObject=opened_odb)
@@ -332,22 +390,41 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
     cam_distortion_step = read_distortion_step(cam_distortion_step, 'Cam', start_record_value, log_array, log_object,
                                                log_file)
 
-    # Create the new Added Element Set
-    if add_elem_set:
-        for i, set_name in enumerate(add_elem_set):
-            current_list = add_elem_list[i].split(',')
-            elem_list = []
-            for item in current_list:
-                elem_list.append(int(item))
-            elem_list = tuple(elem_list)
+    # Create the new Added Element Set, the set is created with a numbered name if the name is used by a model set or
+    # a set of a former job with other elements, added_names maps the user set name to the set in the odb
+    former_sets = added_element_sets.setdefault((opened_odb.path, process_setting['GASKET_INSTANCE']), set())
+    added_names = {}
+    for i, set_name in enumerate(add_elem_set):
+        elem_list = sorted([int(item) for item in add_elem_list[i].split(',')])
+        all_elem_sets = gasket_instance.elementSets
+        candidates = [set_name] + sorted([name for name in former_sets if name.startswith(set_name + '_')])
+        for name in candidates:
+            if name in all_elem_sets.keys() and sorted([elem.label for elem in all_elem_sets[name].elements]) == \
+                    elem_list:
+                # model set or created by former job on the same odb with the same elements
+                added_names[set_name] = name
+                break
+        if set_name not in added_names:
+            odb_set_name = unique_set_name(all_elem_sets, set_name)
             try:
-                _ = opened_odb.rootAssembly.instances['PART-1-1'].ElementSetFromElementLabels(name=set_name.upper(),
-                                                                                              elementLabels=elem_list)
-                log_array.append(['Added Element Set ' + set_name + ' Succeed', start_record_value])
+                _ = gasket_instance.ElementSetFromElementLabels(name=odb_set_name, elementLabels=tuple(elem_list))
                 time.sleep(cache_time)
             except Exception as e:
                 log_array.append(['Added Element Set ' + set_name + ' Failed', start_record_value])
-            log_object.add_record(log_array[-1], log_file)
+                log_object.add_record(log_array[-1], log_file)
+                raise Exception('**===ADDED ELEMENT SET ' + set_name + ' IS NOT CREATED: ' + str(e))
+            former_sets.add(odb_set_name)
+            added_names[set_name] = odb_set_name
+        log_array.append(['Added Element Set ' + set_name + ' Succeed', start_record_value])
+        log_object.add_record(log_array[-1], log_file)
+    process_setting['ADDED_SET_NAMES'] = added_names
+
+    # element type and representative node of all the element sets, added sets included, the added sets are indexed
+    # by the user set name, the sets added by the former jobs are skipped
+    renamed = dict([(value, key) for key, value in added_names.items() if value != key])
+    excluded = former_sets - set(added_names.values())
+    process_setting['SET_INDEX'] = setindex.build_set_index(instances, process_setting['GASKET_INSTANCE'], renamed,
+                                                            excluded)
 
     # Get the element property
     odb_sections = process_setting['SECTION_DATA']
@@ -358,25 +435,16 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
             section_material[item] = result[1]
 
     # Get the fatigue data
-    fatigue_web_info = process_setting['WEB_FATIGUE_DATA']
-    fatigue_criteria_name = process_setting['FATIGUE_CRITERIA_NAME']
-    fatigue_data = {}
-    for k, v in fatigue_web_info.items():
-        material_name = v[0]
-        initial_gap = v[1]
-        fatigue_id = v[2]
-        preload = v[3][0]
-        fixload = v[3][1]
-        fatigue_value = v[3][2]
-        res = model.FatigueData(k, material_name, initial_gap, fatigue_id, fixload, preload, fatigue_criteria_name)
-        res.set_fatigue_data(fatigue_value)
-        fatigue_data[material_name] = res
-    process_setting['FATIGUE_DATA'] = fatigue_data
-
-    all_elem_sets = opened_odb.rootAssembly.instances['PART-1-1'].elementSets
+    process_setting['FATIGUE_DATA'] = fatigue_tables(process_setting['WEB_FATIGUE_DATA'],
+                                                     process_setting['FATIGUE_CRITERIA_NAME'])
+
+    all_elem_sets = gasket_instance.elementSets
+    # set name: element labels, the set membership is kept for the result bundle
+    set_elements = {}
     # Create Element and Node Class dict
     for elem_set in gasket_elem_set:
-        elem_in_set = all_elem_sets[elem_set].elements
+        elem_in_set = all_elem_sets[added_names.get(elem_set, elem_set)].elements
+        set_elements[elem_set] = [item.label for item in elem_in_set]
         if elem_set in section_material:
             material_name = section_material[elem_set]
         else:
@@ -391,21 +459,23 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
                 if node not in node_result:
                     node_result[node] = model.ChgNodes(node)
 
+    process_setting['GASKET_SET_ELEMENTS'] = set_elements
     node_labels = tuple([keys for keys in node_result])
     process_setting['MAX_NODE_NUMBER'] = max(node_labels)
     element_labels = tuple([keys for keys in element_result])
     process_setting['MAX_ELEMENT_NUMBER'] = max(element_labels)
+    profiler.count('nodes', len(node_labels))
+    profiler.count('element_nodes', sum([len(element_result[elem].connectivity) for elem in element_result]))
 
     start_record_value += 1
     log_array.append(['Gasket Element - Node dict Succeed', start_record_value])
     log_object.add_record(log_array[-1], log_file)
 
-    _ = opened_odb.rootAssembly.instances['PART-1-1'].NodeSetFromNodeLabels(name=gasket_node_set,
-                                                                            nodeLabels=node_labels)
+    _ = gasket_instance.NodeSetFromNodeLabels(name=gasket_node_set, nodeLabels=node_labels)
     start_record_value += 1
     log_array.append(['Added Gasket Node Set Succeed', start_record_value])
     log_object.add_record(log_array[-1], log_file)
-    gasket_node_set_obj = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[gasket_node_set].nodes
+    gasket_node_set_obj = gasket_instance.nodeSets[gasket_node_set].nodes
     for node in gasket_node_set_obj:
         node_result[node.label].set_init_coord(node.coordinates)
 
@@ -436,10 +506,14 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
                 # Read Bore Node based on user input bore node set
                 for item in temp:
                     bore_distortion_nodeset.append(item.strip().upper())
+                # the bore node sets are in one instance, the new bore node set is created in it
+                bore_instance = setindex.find_instance(instance_sets, bore_distortion_nodeset[0], 'NODE',
+                                                       process_setting['GASKET_INSTANCE'])
+                bore_instance = instances[bore_instance or process_setting['GASKET_INSTANCE']]
                 try:
                     for item in bore_distortion_nodeset:
                         # bore_node exist in model, can be read directly
-                        node_region = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[item]
+                        node_region = bore_instance.nodeSets[item]
                         for node in node_region.nodes:
                             temp_result[node.label] = node.coordinates
                             z_coord_list.append(float('%10.1f' % node.coordinates[-1]))
@@ -482,10 +556,10 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
                 new_bore_set = []
                 for keys in temp_result:
                     new_bore_set.append(keys)
-                new_bore_set_name = setting.environment_key['BORE_DISTORTION_NODES']
+                new_bore_set_name = unique_set_name(bore_instance.nodeSets,
+                                                    setting.environment_key['BORE_DISTORTION_NODES'])
                 try:
-                    _ = opened_odb.rootAssembly.instances['PART-1-1'].NodeSetFromNodeLabels(name=new_bore_set_name,
-                                                                                            nodeLabels=new_bore_set)
+                    _ = bore_instance.NodeSetFromNodeLabels(name=new_bore_set_name, nodeLabels=new_bore_set)
                     time.sleep(cache_time)
                     log_array.append(['Added Bore Node Set ' + new_bore_set_name + ' Succeed', start_record_value])
                 except Exception as e:
@@ -513,22 +587,27 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
     if add_cam_node_list and cam_distortion_step:
         cam_check = True
         cam_node_result = {}
+        # the cam node labels of the user input are labels of one instance
+        cam_instance = setting.environment_key['CAM_NODE_INSTANCE']
+        if not cam_instance:
+            cam_labels = [int(node) for item in add_cam_node_list for node in item.split(',')]
+            cam_instance = setindex.label_instance(instances, cam_labels, process_setting['GASKET_INSTANCE'])
+        cam_instance = instances[cam_instance]
         for i, item in enumerate(add_cam_node_list):
             temp_result = {}
             current_list = item.split(',')
             node_list = []
-            node_set_name = 'AUTO_ADD_CAM' + str(i + 1)
+            node_set_name = unique_set_name(cam_instance.nodeSets, 'AUTO_ADD_CAM' + str(i + 1))
             for node in current_list:
                 node_list.append(int(node))
             try:
-                _ = opened_odb.rootAssembly.instances['PART-1-1'].NodeSetFromNodeLabels(name=node_set_name,
-                                                                                        nodeLabels=tuple(node_list))
+                _ = cam_instance.NodeSetFromNodeLabels(name=node_set_name, nodeLabels=tuple(node_list))
                 log_array.append(['Added Cam Node Set ' + node_set_name + ' Succeed', start_record_value])
                 # wait for 1 sec to make sure the new node set is created successfully
                 time.sleep(cache_time)
                 # find the node in node set will be much faster than from all node
-                # node_region = opened_odb.rootAssembly.instances['PART-1-1'].nodes can also find the right node
-                node_region = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[node_set_name]
+                # node_region = cam_instance.nodes can also find the right node
+                node_region = cam_instance.nodeSets[node_set_name]
                 for node in node_region.nodes:
                     temp_result[node.label] = [node.coordinates]
             except Exception as e:
@@ -540,96 +619,151 @@ def read_from_odb(opened_odb, process_setting, log_array, log_object, log_file,
     number_interval = float(procedure_length) / len(odb_steps)
     # from num 15 to 60 is set the range for step reading
 
-    for step_num, current_step in enumerate(odb_steps):
-        # ================================================================================
-        # if step_num > 3:
-        #     break
-        # ================================================================================
-        # First read node result, including displacement, shear force and slip value
-        # no matter relative is required or not, the value will be set to both cases.
-        node_region = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[gasket_node_set]
-        current_result = opened_odb.steps[current_step].frames[-1].fieldOutputs['U'].getSubset(region=node_region)
-        temp_result = {}
-        for item in current_result.values:
-            node_result[item.nodeLabel].set_displacement(item.data)
-            # set the default value here, since if cslip, cshear are required to output, but in fact the gasket face is
-            # tied with head or block, then the tied node will have no value in cshear1...
-            temp_result[item.nodeLabel] = [0, 0, 0, 0]
-        if process_setting['RELATIVE_MOTION'] == 'YES':
-            cshear1 = opened_odb.steps[current_step].frames[-1].fieldOutputs['CSHEAR1']
-            cshear2 = opened_odb.steps[current_step].frames[-1].fieldOutputs['CSHEAR2']
-            cslip1 = opened_odb.steps[current_step].frames[-1].fieldOutputs['CSLIP1']
-            cslip2 = opened_odb.steps[current_step].frames[-1].fieldOutputs['CSLIP2']
-            for item in cshear1.values:
-                if item.nodeLabel in node_labels:
-                    temp_result[item.nodeLabel][0] = item.data
-            for item in cshear2.values:
-                if item.nodeLabel in node_labels:
-                    temp_result[item.nodeLabel][1] = item.data
-            for item in cslip1.values:
-                if item.nodeLabel in node_labels:
-                    temp_result[item.nodeLabel][2] = item.data
-            for item in cslip2.values:
-                if item.nodeLabel in node_labels:
-                    temp_result[item.nodeLabel][3] = item.data
-        for keys in temp_result:
-            node_result[keys].set_relative(temp_result[keys])
-        log_array.append(['Node Result Read_' + current_step, start_record_value + step_num * number_interval])
-        log_object.add_record(log_array[-1], log_file)
-        # bore distortion node displacement read in
-        if bore_check:
-            if bore_distortion_manually:
-                node_region = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[new_bore_set_name]
-                current_result = opened_odb.steps[current_step].frames[-1].fieldOutputs['U'].getSubset(
-                    region=node_region)
-                for item in current_result.values:
-                    current_cylinder = bore_distortion_node_key[item.nodeLabel][0]
-                    z_level = bore_distortion_node_key[item.nodeLabel][1]
-                    bore_distortion_results[current_cylinder][z_level].set_displacement(item.nodeLabel, item.data)
-                log_array.append(['Bore Node Read_' + current_step, start_record_value + step_num * number_interval])
-                log_object.add_record(log_array[-1], log_file)
-        if cam_check:
-            for node_set in cam_node_result:
-                node_region = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[node_set]
-                current_result = opened_odb.steps[current_step].frames[-1].fieldOutputs['U'].getSubset(
-                    region=node_region)
-                for item in current_result.values:
-                    cam_node_result[node_set].set_displacement(item.nodeLabel, item.data)
-        # followings are for element calculation, only S11, E11 are required, consider the centroid value is required,
-        # angle, area are non of business of ODB itself.
-        current_result = opened_odb.steps[current_step].frames[-1].fieldOutputs['S'].getSubset(position=ELEMENT_NODAL)
-        temp_result = {}
-        for item in current_result.values:
-            element_id = item.elementLabel
-            if element_id in element_labels:
-                temp_result.setdefault(element_id, {})
-                temp_result[element_id][item.nodeLabel] = [item.data[0]]
-        current_result = opened_odb.steps[current_step].frames[-1].fieldOutputs['E'].getSubset(position=ELEMENT_NODAL)
-        for item in current_result.values:
-            element_id = item.elementLabel
-            if element_id in element_labels:
-                temp_result[element_id][item.nodeLabel].append(item.data[0])
-        for item in element_result:
-            for node in element_result[item].connectivity:
-                element_result[item].set_result(node, temp_result[item][node])
-        log_array.append(['Element Result Read_' + current_step, start_record_value + step_num * number_interval])
-        log_object.add_record(log_array[-1], log_file)
-
-    if bore_check:
-        for current_cylinder in range(total_cylinder_num):
-            for z_level in z_coord_list:
-                print (bore_distortion_results[current_cylinder][z_level].get_bore_nodes())
-                bore_distortion_results[current_cylinder][z_level].cal_fourier()
-                bore_distortion_results[current_cylinder][z_level].cal_angle_data()
-            log_array.append(
-                ['Bore Distortion for Cylinder_' + str(current_cylinder + 1),
-                 start_record_value + step_num * number_interval])
+    # step results are read as arrays (lib.extract), in this process, or by the workers of the distributed queue
+    bore_nodes = None
+    if bore_check and bore_distortion_manually:
+        bore_nodes = new_bore_set
+    cam_sets = {}
+    if cam_check:
+        for node_set in cam_node_result:
+            cam_sets[node_set] = list(cam_node_result[node_set].get_displacement().keys())
+    labels = extract.build_labels(node_labels, element_result, bore_nodes, cam_sets)
+    regions = {'GASKET': (gasket_instance.name, gasket_node_set)}
+    if bore_nodes is not None:
+        regions['BORE'] = (bore_instance.name, new_bore_set_name)
+    for node_set in cam_sets:
+        regions[node_set] = (cam_instance.name, node_set)
+    variables = extract.step_variables(bore_nodes is not None, sorted(cam_sets.keys()),
+                                       process_setting['RELATIVE_MOTION'] == 'YES')
+    distributed_dir = setting.environment_key['DISTRIBUTED_DIR']
+    extract_length = 0
+    if distributed_dir:
+        # 80% of the log range for the units, the rest for the assembly
+        extract_length = procedure_length * 0.8
+        number_interval = float(procedure_length - extract_length) / len(odb_steps)
+        job_dir = distribute.submit(distributed_dir, process_setting['ODB_FILE'], odb_steps, variables, labels,
+                                    setting.environment_key['DISTRIBUTED_STEPS_PER_UNIT'],
+                                    dict([(key, value[0]) for key, value in regions.items()]))
+
+        def log_units(done, total):
+            log_array.append(['Distributed Units Done ' + str(done) + '/' + str(total),
+                              start_record_value + extract_length * done / total])
             log_object.add_record(log_array[-1], log_file)
 
+        with profiler.stage('distributed'):
+            distribute.collect(opened_odb, job_dir, labels, regions, log_units, profiler)
+        step_results = distribute.iter_chunks(job_dir)
+    else:
+        step_results = extract.iter_local(opened_odb, odb_steps, variables, labels, regions, profiler)
+
+    gasket_labels = labels['GASKET'].tolist()
+    se_labels = list(zip(labels['SE_ELEMENTS'].tolist(), labels['SE_NODES'].tolist()))
+    low_memory = setting.environment_key['LOW_MEMORY_MODE']
+    store_dtype = np.dtype(setting.environment_key['STEP_STORE_DTYPE'])
+    if low_memory:
+        reducer = window.WindowReducer(len(odb_steps), process_setting['TEMPERATURE_STEP'],
+                                       len(process_setting['FIRING_CYLINDER_NAME']), process_setting['INI_ASSEM'],
+                                       process_setting['HOT_ASSEM'], labels['SE_ELEMENTS'], store_dtype)
+        # relative motion of the gasket nodes reduced over the windows as the steps are read
+        relative_reducer = window.RelativeReducer(len(odb_steps), process_setting['TEMPERATURE_STEP'],
+                                                  len(process_setting['FIRING_CYLINDER_NAME']), len(gasket_labels))
+        ratio_criteria = setting.environment_key['STRESS_DIFFER_RATIO']
+    else:
+        # step results are written to the columnar store, memory mapped if over STEP_STORE_RAM_BUDGET
+        shapes = {'U:GASKET': (len(gasket_labels), 3), 'SE': (len(se_labels), 2)}
+        if 'CONTACT' in variables:
+            shapes['CONTACT'] = (len(gasket_labels), len(extract.CONTACT_OUTPUTS))
+        step_store = store.StepStore(shapes, len(odb_steps), setting.environment_key['STEP_STORE_RAM_BUDGET'],
+                                     setting.environment_key['STEP_STORE_DIR'], store_dtype)
+        process_setting['STEP_STORE'] = step_store
+        if step_store.is_mapped():
+            profiler.count('step_store_mapped_mb', step_store.nbytes // (1024 * 1024))
+    # max contact status of each gasket node over all the steps, see extract.tied_mask
+    max_status = np.full(len(gasket_labels), extract.NO_CONTACT)
+    step_num = 0
+    for steps, chunk in step_results:
+        for k, current_step in enumerate(steps):
+            record_value = start_record_value + extract_length + step_num * number_interval
+            # node result, including displacement, shear force and slip value, no matter relative is required or
+            # not, the value will be set to both cases. Tied node has no cshear output, 0 is set.
+            if not low_memory:
+                step_store.write(step_num, chunk, k)
+            else:
+                relative_reducer.add_step(step_num, chunk['CONTACT'][k] if 'CONTACT' in chunk else None)
+            if 'CONTACT' in chunk:
+                max_status = np.maximum(max_status, chunk['CONTACT'][k][:, extract.STATUS_COMPONENT])
+            log_array.append(['Node Result Read_' + current_step, record_value])
+            log_object.add_record(log_array[-1], log_file)
+            # bore distortion node displacement read in
+            if 'U:BORE' in chunk:
+                displacement = chunk['U:BORE'][k].astype(np.float64)
+                for i, node in enumerate(labels['BORE'].tolist()):
+                    current_cylinder = bore_distortion_node_key[node][0]
+                    z_level = bore_distortion_node_key[node][1]
+                    bore_distortion_results[current_cylinder][z_level].set_displacement(node, displacement[i])
+                log_array.append(['Bore Node Read_' + current_step, record_value])
+                log_object.add_record(log_array[-1], log_file)
+            for node_set in cam_sets:
+                displacement = chunk['U:' + node_set][k].astype(np.float64)
+                for i, node in enumerate(labels[node_set].tolist()):
+                    cam_node_result[node_set].set_displacement(node, displacement[i])
+            # followings are for element calculation, only S11, E11 are required, consider the centroid value is
+            # required, angle, area are non of business of ODB itself.
+            if low_memory:
+                result = chunk['SE'][k]
+                for element_id, start, end in reducer.add_step(step_num, result, ratio_criteria):
+                    s11 = dict(zip(labels['SE_NODES'][start:end].tolist(), result[start:end, 0]))
+                    element_result[element_id].check_step(step_num, s11)
+            log_array.append(['Element Result Read_' + current_step, record_value])
+            log_object.add_record(log_array[-1], log_file)
+            step_num += 1
+    if distributed_dir:
+        distribute.remove_job(job_dir)
+    # the tied nodes, without contact output (or CSTATUS, see RELATIVE_TIED_STATUS) in all the steps, are reported
+    # without the relative motion calculation, RELATIVE_NODES is the compact index of the other nodes, the contact
+    # output of the tied nodes is not kept after the read
+    tied = np.zeros(len(gasket_labels), dtype=bool)
+    if 'CONTACT' in variables:
+        tied = extract.tied_mask(max_status, setting.environment_key['RELATIVE_TIED_STATUS'])
+    relative_rows = np.flatnonzero(~tied)
+    process_setting['RELATIVE_NODES'] = labels['GASKET'][relative_rows].tolist()
+    process_setting['TIED_NODES'] = labels['GASKET'][tied].tolist()
+    for node in process_setting['TIED_NODES']:
+        node_result[node].set_tied()
+    profiler.count('tied_nodes', len(process_setting['TIED_NODES']))
+    if low_memory:
+        for i in relative_rows.tolist():
+            node_result[gasket_labels[i]].set_relative_results(*relative_reducer.result(i))
+        del relative_reducer
+    else:
+        # the window values are reduced from the store by blocks of elements, the step views are kept for the report
+        reducer = window.WindowReducer(len(odb_steps), process_setting['TEMPERATURE_STEP'],
+                                       len(process_setting['FIRING_CYLINDER_NAME']), process_setting['INI_ASSEM'],
+                                       process_setting['HOT_ASSEM'], labels['SE_ELEMENTS'], store_dtype)
+        for start, block in step_store.iter_blocks('SE', setting.environment_key['STEP_STORE_CHUNK_ROWS']):
+            reducer.add_block(start, block)
+        for i, (element_id, node) in enumerate(se_labels):
+            element_result[element_id].set_step_results(node, step_store.view('SE', i))
+        # the CONTACT store keeps the rows of RELATIVE_NODES only, 0 is set for the tied nodes
+        if 'CONTACT' in shapes:
+            step_store.compact('CONTACT', relative_rows, setting.environment_key['STEP_STORE_CHUNK_ROWS'])
+        contact_row = np.cumsum(~tied) - 1
+        no_contact = [[0, 0, 0, 0]] * len(odb_steps)
+        for i, node in enumerate(gasket_labels):
+            relative = no_contact
+            if 'CONTACT' in shapes and not tied[i]:
+                relative = step_store.view('CONTACT', int(contact_row[i]), True)
+            node_result[node].set_step_values(step_store.view('U:GASKET', i), relative)
+    for i, (element_id, node) in enumerate(se_labels):
+        element_result[element_id].set_window_results(node, reducer.result(i))
+    del reducer
+
+    # the Fourier and cam distortion calculation is done by compute.stages.cal_distortion, no odb required
+    if bore_check:
         process_setting['BORE_DISTORTION_DATA'] = bore_distortion_results
 
     if cam_check:
-        pass
+        process_setting['CAM_DISTORTION_DATA'] = cam_node_result
 
     start_record_value += procedure_length
 
@@ -674,6 +808,50 @@ def print_to_file(print_name, position='Iso', zoom_value=1, x_pan=0, x_rotation=
     session.printToFile(fileName=print_name, format=PNG, canvasObjects=(current_session,))
 
 
+def print_cached(image_cache, key_fields, print_name, **view):
+    """
+    print_to_file with the image cache (compute.imagecache), the cached image is reused if the odb, step, display sets
+    and view are not changed
+    :param image_cache:         imagecache.ImageCache, None to print every image
+    :param key_fields:          dict, image parameters except the view, see image_key_fields
+    :param view:                arguments of print_to_file
+    """
+    key = None
+    if image_cache is not None:
+        view_key = {'position': 'Iso', 'zoom_value': 1, 'x_pan': 0, 'x_rotation': 0}
+        view_key.update(view)
+        key = imagecache.image_key(view=view_key, **key_fields)
+        if image_cache.fetch(key, print_name + '.png'):
+            return
+    print_to_file(print_name, **view)
+    if key is not None:
+        image_cache.store(key, print_name + '.png')
+
+
+def image_key_fields(process_setting, sets, step=None, variable=None):
+    """
+    :param sets:                displayed element sets, None for the whole model
+    :param step:                odb step order, start from 0, None if the frame is not set
+    :param variable:            contour variable, None for the section colors
+    :return:                    dict, image parameters of the cache key except the view
+    """
+    raster = setting.environment_key['RENDER_BACKEND'] == 'raster'
+    fields = {'odb': imagecache.odb_identity(process_setting['ODB_FILE']),
+              'backend': setting.environment_key['RENDER_BACKEND'],
+              'image_size': setting.environment_key['RENDER_IMAGE_SIZE'] if raster else None,
+              'sets': sets, 'step': step, 'frame': -1, 'variable': variable}
+    if raster and variable is None:
+        # the raster set colors follow the set order of SET_INDEX, report and added sets change the colors
+        fields['set_order'] = list(process_setting['SET_INDEX'].keys())
+    # elements of the displayed added sets, the same set name may have other elements in another job
+    added_sets = dict([(name.strip().upper(), elements) for name, elements in zip(process_setting['WEB_ADDELEM_SET'],
+                                                                                  process_setting['WEB_ADDELEM_LIST'])
+                       if name.strip() and (sets is None or variable is None or name.strip().upper() in sets)])
+    if added_sets:
+        fields['added_sets'] = added_sets
+    return fields
+
+
 def plot_thermal_map(opened_odb, process_setting, log_array, log_object, log_file, procedure_length):
     """
     plot the temperature map.
@@ -694,6 +872,9 @@ def plot_thermal_map(opened_odb, process_setting, log_array, log_object, log_fil
     file_save_in = process_setting['FILE_SAVE_IN']
     start_record_value = process_setting['START_LOG_VALUE']
 
+    if setting.environment_key['RENDER_BACKEND'] == 'raster':
+        return plot_thermal_raster(opened_odb, process_setting, log_array, log_object, log_file, procedure_length)
+
     # display set for current window
     # current_session.makeCurrent()
     # current_session.maximize()
@@ -708,45 +889,28 @@ def plot_thermal_map(opened_odb, process_setting, log_array, log_object, log_fil
     current_session.setColor(colorMapping=cmap)
     current_session.disableMultipleColors()
 
-    print_to_file(print_name=os.path.join(file_save_in, 'Whole_Engine'))
+    image_cache = imagecache.open_cache()
+    print_cached(image_cache, image_key_fields(process_setting, None), os.path.join(file_save_in, 'Whole_Engine'))
     log_array.append(['Create Engine Plot Succeed', start_record_value + 1])
     log_object.add_record(log_array[-1], log_file)
 
-    all_elem_sets = opened_odb.rootAssembly.instances['PART-1-1'].elementSets
-    display_sets = []
-    gasket_sets = []
-    display_set_node = []
-
-    # python version 2.x required keys
-    for item in all_elem_sets.keys():
-        select_elem = all_elem_sets[item].elements[0]
-        elem_type = select_elem.type
-        if 'GK3D' in elem_type:
-            gasket_sets.append(item)
-        else:
-            display_sets.append(item)
-            display_set_node.append(select_elem.connectivity[0])
+    set_index = process_setting['SET_INDEX']
+    gasket_sets = setindex.gasket_sets(set_index)
+    display_sets = setindex.engine_sets(set_index)
     for i, item in enumerate(gasket_sets):
-        leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + item))
+        leaf = dgo.LeafFromElementSets(elementSets=(setindex.leaf_name(set_index, item)))
         if i == 0:
             current_session.odbDisplay.displayGroup.replace(leaf=leaf)
         else:
             current_session.odbDisplay.displayGroup.add(leaf=leaf)
-    print_to_file(print_name=os.path.join(file_save_in, 'Gasket_Plan_View'), position='Front')
+    print_cached(image_cache, image_key_fields(process_setting, gasket_sets),
+                 os.path.join(file_save_in, 'Gasket_Plan_View'), position='Front')
     log_array.append(['Create Gasket Plot Succeed', start_record_value + 1])
     log_object.add_record(log_array[-1], log_file)
     process_setting['GASKET_SET'] = gasket_sets
     process_setting['ENGINE_SET'] = display_sets
-    nodes_in_model = opened_odb.rootAssembly.instances['PART-1-1'].nodes
-    up_sets = []
-    down_sets = []
     critical_value = (process_setting['GASKET_MAX_Z'] + process_setting['GASKET_MIN_Z']) / 2
-    for node in nodes_in_model:
-        if node.label in display_set_node:
-            if node.coordinates[2] > critical_value:
-                up_sets.append(display_sets[display_set_node.index(node.label)])
-            else:
-                down_sets.append(display_sets[display_set_node.index(node.label)])
+    up_sets, down_sets = setindex.split_by_z(set_index, display_sets, critical_value)
 
     log_array.append(['Engine Sets Separated Succeed', start_record_value + 1])
     log_object.add_record(log_array[-1], log_file)
@@ -767,16 +931,159 @@ def plot_thermal_map(opened_odb, process_setting, log_array, log_object, log_fil
             current_session.odbDisplay.setPrimaryVariable(variableLabel='NT11', outputPosition=NODAL)
             for item in down_sets:
                 print_title = temperature_name[i] + '_' + item + '_Temp'
-                leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + item,))
+                leaf = dgo.LeafFromElementSets(elementSets=(setindex.leaf_name(set_index, item),))
                 current_session.odbDisplay.displayGroup.replace(leaf=leaf)
-                print_to_file(print_name=os.path.join(file_save_in, print_title), zoom_value=zoom_value,
-                              x_pan=xpan_value)
+                print_cached(image_cache, image_key_fields(process_setting, [item], int(step) - 1, 'NT11'),
+                             os.path.join(file_save_in, print_title), zoom_value=zoom_value, x_pan=xpan_value)
             for item in up_sets:
                 print_title = temperature_name[i] + '_' + item + '_Temp'
-                leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + item,))
+                leaf = dgo.LeafFromElementSets(elementSets=(setindex.leaf_name(set_index, item),))
                 current_session.odbDisplay.displayGroup.replace(leaf=leaf)
-                print_to_file(print_name=os.path.join(file_save_in, print_title), zoom_value=zoom_value,
-                              x_pan=xpan_value, x_rotation=x_rotate)
+                print_cached(image_cache, image_key_fields(process_setting, [item], int(step) - 1, 'NT11'),
+                             os.path.join(file_save_in, print_title), zoom_value=zoom_value, x_pan=xpan_value,
+                             x_rotation=x_rotate)
+        log_array.append(
+            ['Thermal Map Plot for Step' + str(step) + ' Done.', start_record_value + i * number_interval])
+        log_object.add_record(log_array[-1], log_file)
+    count_image_cache(process_setting, image_cache)
+    process_setting['START_LOG_VALUE'] = start_record_value + procedure_length
+    return process_setting
+
+
+def count_image_cache(process_setting, image_cache):
+    """
+    profiler counts of the image cache, the least recently used images are removed
+    """
+    if image_cache is None:
+        return
+    profiler = process_setting['PROFILER']  # type: instrument.StageProfiler
+    profiler.count('image_cache_hits', image_cache.hits)
+    profiler.count('image_cache_misses', image_cache.misses)
+    profiler.count('image_cache_evicted', image_cache.evict())
+
+
+def write_render_scene(opened_odb, process_setting, gasket_sets, up_sets, down_sets, image_cache=None):
+    """
+    write the scene of the raster backend (compute.render), the tasks are the images of plot_thermal_map with the same
+    file names and views, the elements are colored by their first set instead of the section.
+    :param image_cache:         imagecache.ImageCache, the cached images are linked and not in the scene
+    :return:                    scene folder, None if all the images are cached
+    """
+    temperature_step = process_setting['TEMPERATURE_STEP']
+    temperature_name = process_setting['TEMPERATURE_NAME']
+    file_save_in = process_setting['FILE_SAVE_IN']
+    odb_steps = opened_odb.steps.keys()
+    # (task, displayed sets, odb step order, variable)
+    images = [(render.task(os.path.join(file_save_in, 'Whole_Engine'), render.WHOLE_MODEL), None, None, None),
+              (render.task(os.path.join(file_save_in, 'Gasket_Plan_View'), render.GASKET_VIEW, position='Front'),
+               gasket_sets, None, None)]
+    steps = []
+    if 'NT11' in opened_odb.steps.values()[0].frames[-1].fieldOutputs:
+        steps = [odb_steps[int(step) - 1] for step in temperature_step]
+        zoom_value = setting.environment_key['TEMPERATURE_ZOOM']
+        xpan_value = setting.environment_key['TEMPERATURE_XPAN']
+        x_rotate = setting.environment_key['TEMPERATURE_ROTATE']
+        for i, step in enumerate(temperature_step):
+            for item in down_sets + up_sets:
+                print_name = os.path.join(file_save_in, temperature_name[i] + '_' + item + '_Temp')
+                rotation = x_rotate if item in up_sets else 0
+                images.append((render.task(print_name, item, i, zoom=zoom_value, x_pan=xpan_value, x_rotation=rotation),
+                               [item], int(step) - 1, 'NT11'))
+    tasks = []
+    for task, sets, step, variable in images:
+        if image_cache is not None:
+            view = dict([(key, task[key]) for key in ['position', 'zoom', 'x_pan', 'x_rotation']])
+            task['key'] = imagecache.image_key(view=view, **image_key_fields(process_setting, sets, step, variable))
+            if image_cache.fetch(task['key'], task['file'] + '.png'):
+                continue
+        tasks.append(task)
+    if not tasks:
+        return None
+
+    # the mesh of all the instances, labels are searched in the rows of the set instance
+    instances = opened_odb.rootAssembly.instances
+    set_index = process_setting['SET_INDEX']
+    node_labels, coordinates, element_labels, element_types, connectivity, ranges = extract.read_assembly_mesh(
+        instances)
+    element_colors = np.full(len(element_labels), -1, dtype=np.int32)
+    set_rows = {}
+    instance_order = {}
+    for k, set_name in enumerate(set_index.keys()):
+        instance_name = set_index[set_name]['INSTANCE']
+        start, end = ranges[instance_name][2:]
+        if instance_name not in instance_order:
+            order = np.argsort(element_labels[start:end])
+            instance_order[instance_name] = (order, element_labels[start:end][order])
+        order, sorted_labels = instance_order[instance_name]
+        element_set = instances[instance_name].elementSets[set_index[set_name]['SET']]
+        labels = [element.label for element in element_set.elements]
+        rows = start + order[np.searchsorted(sorted_labels, labels)]
+        set_rows[set_name] = rows
+        free = rows[element_colors[rows] < 0]
+        element_colors[free] = k
+
+    groups = []
+    for group in [task['group'] for task in tasks]:
+        if group in [name for name, rows in groups]:
+            continue
+        if group == render.WHOLE_MODEL:
+            groups.append((group, np.arange(len(element_labels))))
+        elif group == render.GASKET_VIEW:
+            groups.append((group, np.concatenate([set_rows[item] for item in gasket_sets] + [np.zeros(0, int)])))
+        else:
+            groups.append((group, set_rows[group]))
+    nt11 = None
+    if steps and [task for task in tasks if task['step'] is not None]:
+        # one read for the nodes of each instance, node labels are unique in one instance only
+        nt11 = np.concatenate([extract.read_nodal_scalar(opened_odb, steps, 'NT11', node_labels[value[0]:value[1]],
+                                                         instance_name) for instance_name, value in ranges.items()],
+                              axis=1)
+    scene_dir = os.path.splitext(process_setting['ODB_FILE'])[0] + '_scene'
+    render.write_scene(scene_dir, coordinates, element_types, connectivity, groups, element_colors, nt11, steps, tasks,
+                       setting.environment_key['RENDER_IMAGE_SIZE'])
+    return scene_dir
+
+
+def plot_thermal_raster(opened_odb, process_setting, log_array, log_object, log_file, procedure_length):
+    """
+    plot_thermal_map of the raster backend, same images and log records without the viewer. The images are drawn in
+    this process, in RENDER_PROCESSES processes of a RENDER_PYTHON process, or by compute.worker in offload mode
+    (RENDER_SCENE).
+    """
+    temperature_step = process_setting['TEMPERATURE_STEP']
+    start_record_value = process_setting['START_LOG_VALUE']
+    profiler = process_setting['PROFILER']  # type: instrument.StageProfiler
+
+    set_index = process_setting['SET_INDEX']
+    gasket_sets = setindex.gasket_sets(set_index)
+    display_sets = setindex.engine_sets(set_index)
+    process_setting['GASKET_SET'] = gasket_sets
+    process_setting['ENGINE_SET'] = display_sets
+    critical_value = (process_setting['GASKET_MAX_Z'] + process_setting['GASKET_MIN_Z']) / 2
+    up_sets, down_sets = setindex.split_by_z(set_index, display_sets, critical_value)
+
+    image_cache = imagecache.open_cache()
+    scene_dir = write_render_scene(opened_odb, process_setting, gasket_sets, up_sets, down_sets, image_cache)
+    if scene_dir is not None and process_setting['COMPUTE_OFFLOAD']:
+        process_setting['RENDER_SCENE'] = scene_dir
+    elif scene_dir is not None:
+        # the abaqus kernel is not forked, the pool runs in a separate python process, or one image after the other
+        python = setting.environment_key['RENDER_PYTHON']
+        if python:
+            files = render.render_scene_process(scene_dir, python, setting.environment_key['RENDER_PROCESSES'],
+                                                image_cache)
+        else:
+            files = render.render_scene(scene_dir, 1, image_cache)
+        profiler.count('rendered_images', len(files))
+        shutil.rmtree(scene_dir, ignore_errors=True)
+    count_image_cache(process_setting, image_cache)
+
+    for message in ['Create Engine Plot Succeed', 'Create Gasket Plot Succeed', 'Engine Sets Separated Succeed']:
+        log_array.append([message, start_record_value + 1])
+        log_object.add_record(log_array[-1], log_file)
+    start_record_value += 1
+    number_interval = float(procedure_length) / len(temperature_step)
+    for i, step in enumerate(temperature_step):
         log_array.append(
             ['Thermal Map Plot for Step' + str(step) + ' Done.', start_record_value + i * number_interval])
         log_object.add_record(log_array[-1], log_file)
@@ -797,20 +1104,24 @@ def get_section_force(opened_odb, process_setting, log_array, log_object, log_fi
     :param procedure_length:    the whole procedure percentage, display in the processing bar.
     :return:                    dict type, new added key --- SECTION_FORCE_DATA ---
     """
+    if setting.environment_key['SECTION_FORCE_MODE'] == 'direct':
+        return get_section_force_direct(opened_odb, process_setting, log_array, log_object, log_file, procedure_length)
     view_name = setting.environment_key['VIEW_NAME']
     current_session = session.viewports[view_name]
     odb_steps = opened_odb.steps.keys()
-    gasket_sets = process_setting['GASKET_SET']
+    gasket_sets = setindex.gasket_sets(process_setting['SET_INDEX'])
     section_force_file = process_setting['SECTION_FORCE_FILE']
     start_record_value = process_setting['START_LOG_VALUE']
+    profiler = process_setting['PROFILER']  # type: instrument.StageProfiler
     number_interval = float(procedure_length) / len(odb_steps)
 
     with open(section_force_file, 'wt') as f:
         f.write('SECTION FORCE START'.center(50, '#') + '\n')
     # read the section force
     # show all gasket set first
+    set_index = process_setting['SET_INDEX']
     for i, item in enumerate(gasket_sets):
-        leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + item))
+        leaf = dgo.LeafFromElementSets(elementSets=(setindex.leaf_name(set_index, item)))
         if i == 0:
             current_session.odbDisplay.displayGroup.replace(leaf=leaf)
         else:
@@ -828,16 +1139,18 @@ def get_section_force(opened_odb, process_setting, log_array, log_object, log_fi
     for i, item in enumerate(odb_steps):
         current_session.odbDisplay.setFrame(step=i, frame=-1)
         for current_set in gasket_sets:
-            leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + current_set))
+            leaf = dgo.LeafFromElementSets(elementSets=(setindex.leaf_name(set_index, current_set)))
             current_session.odbDisplay.displayGroup.replace(leaf=leaf)
             session.writeFreeBodyReport(fileName=section_force_file, append=ON)
+            profiler.count('odb_calls')
         for j, current_set in enumerate(gasket_sets):
-            leaf = dgo.LeafFromElementSets(elementSets=('PART-1-1.' + current_set))
+            leaf = dgo.LeafFromElementSets(elementSets=(setindex.leaf_name(set_index, current_set)))
             if j > 0:
                 current_session.odbDisplay.displayGroup.add(leaf=leaf)
             else:
                 current_session.odbDisplay.displayGroup.replace(leaf=leaf)
         session.writeFreeBodyReport(fileName=section_force_file, append=ON)
+        profiler.count('odb_calls')
         log_array.append(['Read Section Force in Step ' + str(item), start_record_value + i * number_interval])
         log_object.add_record(log_array[-1], log_file)
     section_force = {}
@@ -883,6 +1196,84 @@ def get_section_force(opened_odb, process_setting, log_array, log_object, log_fi
     return process_setting
 
 
+def get_section_force_direct(opened_odb, process_setting, log_array, log_object, log_file, procedure_length):
+    """
+    get_section_force without the viewer, the force of each gasket set is summed from the element nodal S11
+    (compute.sectionforce), one field read for each step and gasket element type. The section force file is written
+    in the free body report format.
+    """
+    instances = opened_odb.rootAssembly.instances
+    odb_steps = opened_odb.steps.keys()
+    set_index = process_setting['SET_INDEX']
+    gasket_sets = setindex.gasket_sets(set_index)
+    section_force_file = process_setting['SECTION_FORCE_FILE']
+    start_record_value = process_setting['START_LOG_VALUE']
+    profiler = process_setting['PROFILER']  # type: instrument.StageProfiler
+    number_interval = float(procedure_length) / len(odb_steps)
+
+    # one section force for the gasket sets of each instance, element labels are unique in one instance only
+    section_forces = []
+    element_types = set()
+    for instance_name, set_names in setindex.instance_groups(set_index, gasket_sets).items():
+        instance = instances[instance_name]
+        set_elements = []
+        element_area = {}
+        node_coords = {}
+        for set_name in set_names:
+            labels = []
+            for element in instance.elementSets[set_index[set_name]['SET']].elements:
+                if setindex.GASKET_ELEMENT_TYPE not in element.type:
+                    continue
+                labels.append(element.label)
+                if element.label in element_area:
+                    continue
+                for node in element.connectivity:
+                    if node not in node_coords:
+                        node_coords[node] = instance.getNodeFromLabel(node).coordinates
+                coordinates = [node_coords[node] for node in element.connectivity]
+                element_area[element.label] = (sectionforce.mid_plane_area(element.type, coordinates),
+                                               len(element.connectivity))
+                element_types.add(element.type)
+            set_elements.append((set_name, labels))
+        element_labels = list(element_area.keys())
+        section_forces.append((instance_name, sectionforce.SectionForce(
+            set_elements, element_labels, [element_area[label][0] for label in element_labels],
+            [element_area[label][1] for label in element_labels], len(odb_steps))))
+    for i, item in enumerate(odb_steps):
+        field = opened_odb.steps[item].frames[-1].fieldOutputs['S']
+        for element_type in sorted(element_types):
+            for block in field.getSubset(position=ELEMENT_NODAL, elementType=element_type).bulkDataBlocks:
+                data = np.asarray(block.data).reshape(len(block.elementLabels), -1)
+                for instance_name, section_force in section_forces:
+                    if extract.in_instance(block, instance_name):
+                        section_force.add_block(i, block.elementLabels, data[:, 0])
+            profiler.count('odb_calls')
+        log_array.append(['Read Section Force in Step ' + str(item), start_record_value + i * number_interval])
+        log_object.add_record(log_array[-1], log_file)
+    result = {}
+    all_force = np.zeros(len(odb_steps))
+    for instance_name, section_force in section_forces:
+        instance_result = section_force.result('GASKET_ALL_ELEMENT_TEMP')
+        all_force += instance_result.pop('GASKET_ALL_ELEMENT_TEMP')
+        result.update(instance_result)
+    result['GASKET_ALL_ELEMENT_TEMP'] = all_force.tolist()
+
+    with open(section_force_file, 'wt') as f:
+        f.write('SECTION FORCE START'.center(50, '#') + '\n')
+        for i in range(len(odb_steps)):
+            for current_set in gasket_sets + ['GASKET_ALL_ELEMENT_TEMP']:
+                f.write('\n Free body Cut: Z-Plane, ' + current_set + '\n')
+                f.write(' Step = ' + str(i + 1) + '\n')
+                f.write(' Resultant force = ' + '%15.6e' % 0.0 + '%15.6e' % 0.0 + '%15.6e' % result[current_set][i] +
+                        '\n')
+    start_record_value += procedure_length
+    log_array.append(['Read Section Force Succeed', start_record_value])
+    log_object.add_record(log_array[-1], log_file)
+    process_setting['SECTION_FORCE'] = result
+    process_setting['START_LOG_VALUE'] = start_record_value
+    return process_setting
+
+
 def get_bolt_force(opened_odb, process_setting, log_array, log_object, log_file, procedure_length):
     """
     Get the bolt force from current odb, the history output of bolt node is required.
@@ -897,261 +1288,26 @@ def get_bolt_force(opened_odb, process_setting, log_array, log_object, log_file,
     """
     bolt_node_set = process_setting['BOLT_NODESET']
     start_record_value = process_setting['START_LOG_VALUE']
-    bolt_node_list = opened_odb.rootAssembly.instances['PART-1-1'].nodeSets[bolt_node_set].nodes
+    profiler = process_setting['PROFILER']  # type: instrument.StageProfiler
+    bolt_instance = setindex.find_instance(process_setting['INSTANCE_SETS'], bolt_node_set, 'NODE',
+                                           process_setting['GASKET_INSTANCE']) or process_setting['GASKET_INSTANCE']
+    bolt_node_list = opened_odb.rootAssembly.instances[bolt_instance].nodeSets[bolt_node_set].nodes
     bolt_node_list = [node.label for node in bolt_node_list]
     odb_steps = opened_odb.steps.keys()
-    bolt_force = []
-
-    for step in odb_steps:
-        bolt_force.append([])
-        for node in bolt_node_list:
-            node_num = 'Node PART-1-1.' + str(node)
-            force_value = opened_odb.steps[step].historyRegions[node_num].historyOutputs['TF1'].data[-1][-1]
-            bolt_force[-1].append(force_value)
-    process_setting['BOLT_FORCE_VALUE'] = bolt_force
+    outputs = ['TF1'] + [item for item in setting.environment_key['BOLT_HISTORY_OUTPUTS'] if item != 'TF1']
+
+    # all the increments of the history outputs, one pass over the bolt regions for each step
+    region_names = ['Node ' + bolt_instance + '.' + str(node) for node in bolt_node_list]
+    bolt_history = extract.read_history(opened_odb, odb_steps, region_names, outputs, profiler)
+    bolt_history['NODES'] = bolt_node_list
+    bolt_history['OUTPUTS'] = outputs
+    process_setting['BOLT_HISTORY'] = bolt_history
+    process_setting['BOLT_FORCE_VALUE'] = bolt.end_values(bolt_history)
+    process_setting['BOLT_LOAD_LOSS'] = bolt.load_loss(bolt_history, process_setting['INI_ASSEM'],
+                                                       process_setting['TEMPERATURE_STEP'],
+                                                       len(process_setting['FIRING_CYLINDER_NAME']))
     start_record_value += procedure_length
     log_array.append(['Read Bolt Force Succeed', start_record_value])
     log_object.add_record(log_array[-1], log_file)
     process_setting['START_LOG_VALUE'] = start_record_value
     return process_setting
-
-
-def find_fatigue_adjacent(current_value, value_list):
-    """
-    find the neighbour value of current value, used for the interpolation
-    :param current_value:
-    :param value_list:
-    :return: the left, and right neighbour of current value.
-    """
-    if current_value <= value_list[0]:
-        left_value = value_list[0]
-        right_value = value_list[0]
-    elif current_value >= value_list[-1]:
-        left_value = value_list[-1]
-        right_value = value_list[-1]
-    else:
-        for i, item in enumerate(value_list):
-            if current_value < item:
-                left_value = value_list[i - 1]
-                right_value = value_list[i]
-                break
-    return left_value, right_value
-
-
-def fatigue_interpolate(x, x0, x1, left_value_list, right_value_list, fatigue_criteria_name):
-    """
-    do the interpolation for fatigue calculation
-    :param x:                               fixed load or preload value
-    :param x0:                              the value in left_value_list, which is most close but less than x
-    :param x1:                              the value in right_value_list, which is most close but greater than x
-    :param left_value_list:                 first list used for interpolation
-    :param right_value_list:                second list used for interpolation
-    :param fatigue_criteria_name:           use to determine how many values should be interpolated
-    :return:                                interpolated value, as a list, same size as fatigue_criteria_name
-    """
-    res = []
-    for i, criteria in enumerate(fatigue_criteria_name):
-        input1 = [x0, left_value_list[i]]
-        input2 = [x1, right_value_list[i]]
-        if input1[0] != input2[0]:
-            y = input1[1] + (x - input1[0]) * (input2[1] - input1[1]) / (input2[0] - input1[0])
-        else:
-            y = input1[1]
-        res.append(y)
-    return res
-
-
-def cal_relative(process_setting, log_array, log_object, log_file, procedure_length):
-    """
-    Calculate the relative motion for nodes, the procedure will be started even relative motion is not required.
-    :param process_setting:     big dict, contained all results, required input
-    :param log_array:           log data, record all the log information as a list
-    :param log_object:          log object, defined as a class
-    :param log_file:            log archived file, for each operation the file will be updated, and read by web,
-                                display as a processing bar.
-    :param procedure_length:    the whole procedure percentage, display in the processing bar.
-    :return:                    update the node relative data
-    """
-    cylinder_name = process_setting['FIRING_CYLINDER_NAME']
-    temperature_name = process_setting['TEMPERATURE_NAME']
-    cylinder_num = len(cylinder_name)
-    fixed_step = process_setting['TEMPERATURE_STEP']
-    node_result = process_setting['NODE_RESULT']
-    start_record_value = process_setting['START_LOG_VALUE']
-    i = 0
-    threshold = 0
-    for key, value in node_result.items():  # type: model.ChgNodes
-        value.cal_relative(fixed_step, cylinder_num, temperature_name)
-        current_process = int(i * 100 / len(node_result))
-        if current_process >= threshold:
-            threshold += 10
-            log_array.append(['Relative Motion Finished ' + str('%3.1f%%' % current_process),
-                              start_record_value + current_process * float(procedure_length) / 100])
-            log_object.add_record(log_array[-1], log_file)
-    return process_setting
-
-
-def cal_fatigue(process_setting, log_array, log_object, log_file, procedure_length):
-    """
-    For all elements will have the fatigue data, even they are not required.
-    Three types,                1. not required to calculate fatigue, stauts = Abandon,
-                                2. Required to calculate fatigue, and succeed, status = Succeed
-                                3. Required to calculate fatigue, and failed, status = Failed
-    :param process_setting:     big dict, contained all results, required input
-    :param log_array:           log data, record all the log information as a list
-    :param log_object:          log object, defined as a class
-    :param log_file:            log archived file, for each operation the file will be updated, and read by web,
-                                display as a processing bar.
-    :param procedure_length:    the whole procedure percentage, display in the processing bar.
-    ====================================================================================================================
-    Fatigue data is a member of element data, the format is
-    Element_Class[node][Status, [fix_load, fire_load, pre_load, unload_ratio, left_load, left_ratio, right_load,
-                        right_ratio, interpolation_1, interpolation_2, interpolation_3, interpolation_4, safety_factor,
-                        adjust_data]...]
-    ====================================================================================================================
-    0. Status:                     [Abandon, Succeed, Failed]
-    1. data for cycle 1
-    ...
-    data for each cycle
-    0. fix_load:                   max load during operation
-    1. fire_load:                  min load during operation
-    2. pre_load:                   max load from first step to the FIRST fixed step
-    3. unload_ratio:               (fix_load - fire_load) / fix_load
-    4. left_load:                  the load in fatigue_load list, which is most close but less than fix_load
-    5. left_ratio:                 the ratio in fatigue_ratio list, which is most close but less than preload_ratio
-    6. right_load:                 the load in fatigue_load list, which is most close but greater than fix_load
-    7. right_ratio:                the ratio in fatigue_ratio list, which is most close but greater than preload_ratio
-    8. interpolation_1:            first interpolation, using [left_load, left_ratio], [right_load, left_ratio],
-                                return [left_interpolation_ratio], it is a list, include all interpolated data from
-                                fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
-    9. interpolation_2:            second interpolation, using [left_load, right_ratio], [right_load, right_ratio],
-                                return [right_interpolation_ratio], it is a list, include all interpolated data from
-                                fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
-    10. interpolation_3:            third interpolation, using [left_interpolation_ratio, left_ratio],
-                                [right_interpolation_ratio, right_ratio], return [final_allowed_ratio], it is a list,
-                                include all interpolated data from fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
-    11. interpolation_4:            fourth interpolation, using [left_load, 0], [right_load, 0], return [no_preload_ratio],
-                                it is a list, include all interpolated data from fatigue type: [Goodman, Gerber, Average,
-                                Dangvon, SWT]
-    12. safety_factor:              final_allowed_ratio / unload_ratio, >1 means safe, <1 means risk, it is a list, include
-                                all interpolated data from fatigue type: [Goodman, Gerber, Average, Dangvon, SWT]
-    13. adjust_data:                no_preload_ratio - (final_allowed_ratio - unload_ratio)
-
-    :return:                    None
-    """
-    element_result = process_setting['ELEM_RESULT']  # type: dict
-    fatigue_value = process_setting['FATIGUE_DATA']  # type: dict
-    fixed_step = process_setting['TEMPERATURE_STEP']
-    initial_assembly_step = process_setting['INI_ASSEM']
-    hot_assembly_step = process_setting['HOT_ASSEM']
-    temperature_name = process_setting['TEMPERATURE_NAME']
-    cylinder_name = process_setting['FIRING_CYLINDER_NAME']
-    cylinder_num = len(cylinder_name)
-    fatigue_criteria_name = process_setting['FATIGUE_CRITERIA_NAME']
-    start_record_value = process_setting['START_LOG_VALUE']
-    # number_interval = float(procedure_length) / len(element_result)
-    # if not required, or failed, using 3 instead, means safe
-    empty_list = [3 for value in fatigue_criteria_name]
-
-    i = 0
-    threshold = 0
-    for element_id, element_value in element_result.items():  # type: model.ChgElements
-        elem_material = element_value.material
-        node_array = element_value.connectivity
-        for node_id in node_array:
-            res = element_value.step_results[node_id]
-            s11_list = [x[0] for x in res]
-            # s11_initial_assem = s11_list[initial_assembly_step - 1]
-            # s11_hot_assem = s11_list[hot_assembly_step - 1]
-            # obtain the max load before the first firing cycle
-            s11_max_before_firing = max(s11_list[:fixed_step[0]])
-            fatigue_result = []
-            # fatigue_check, if required to calculate the fatigue, will be True, otherwise, False
-            fatigue_check = False
-            # fatigue_no_Error, if the calculation for fatigue failed, set False.
-            fatigue_no_Error = True
-            if elem_material in fatigue_value:
-                fatigue_data_class = fatigue_value[elem_material]  # type: model.FatigueData
-                line_load = fatigue_data_class.fixload
-                preload_value = fatigue_data_class.preload
-                fatigue_data = fatigue_data_class.fatigue_data
-                fatigue_check = True
-            for oper_num, oper_step in enumerate(fixed_step):
-                fatigue_result.append([])
-                current_s11_list = s11_list[oper_step - 1:oper_step + cylinder_num]
-                fix_load = max(current_s11_list)
-                firing_load = min(current_s11_list)
-                preload = max(s11_max_before_firing, fix_load)
-                if preload > 0:
-                    preload_ratio = (preload - fix_load) / preload
-                else:
-                    preload_ratio = 0
-                if fix_load > 0:
-                    unload_ratio = (fix_load - firing_load) / fix_load
-                else:
-                    unload_ratio = 0
-                fatigue_result[-1] = [fix_load, firing_load, preload, unload_ratio]
-                if fatigue_check:
-                    left_load, right_load = find_fatigue_adjacent(fix_load, line_load)
-                    left_ratio, right_ratio = find_fatigue_adjacent(preload_ratio, preload_value)
-                    fatigue_result[-1] += [left_load, left_ratio, right_load, right_ratio]
-                    try:
-                        # first using the load, left_ratio to interpolate
-                        interpolation_1 = fatigue_interpolate(fix_load, left_load, right_load,
-                                                              fatigue_data[left_load][left_ratio],
-                                                              fatigue_data[right_load][left_ratio],
-                                                              fatigue_criteria_name)
-                        # second using the load, right_ratio to interpolate
-                        interpolation_2 = fatigue_interpolate(fix_load, left_load, right_load,
-                                                              fatigue_data[left_load][right_ratio],
-                                                              fatigue_data[right_load][right_ratio],
-                                                              fatigue_criteria_name)
-                        # third get the final data
-                        interpolation_3 = fatigue_interpolate(unload_ratio, left_ratio, right_ratio,
-                                                              interpolation_1, interpolation_2, fatigue_criteria_name)
-                        # get the no preload value
-                        interpolation_4 = fatigue_interpolate(fix_load, left_load, right_load,
-                                                              fatigue_data[left_load][0],
-                                                              fatigue_data[right_load][0], fatigue_criteria_name)
-                        # get the safety factor
-                        if unload_ratio > 0:
-                            safety_factor = [value / unload_ratio for value in interpolation_3]
-                        else:
-                            safety_factor = [3 for value in range(len(fatigue_criteria_name))]
-                        # get the adjust data
-                        adjust_data = [no_preload - with_preload + unload_ratio for no_preload, with_preload in
-                                       zip(interpolation_4, interpolation_3)]
-                        # final stored data
-                        fatigue_result[-1] += [interpolation_1, interpolation_2, interpolation_3, interpolation_4,
-                                               safety_factor, adjust_data]
-                    except Exception as e:
-                        fatigue_no_Error = False
-                        for j in range(6):
-                            fatigue_result[-1].append(empty_list)
-                        log_array.append(
-                            ['Fatigue Failed for Elem:' + str(element_id) + ' Node:' + str(node_id),
-                             start_record_value])
-                        log_object.add_record(log_array[-1], log_file)
-                else:
-                    fatigue_result[-1] += [0, 0, 0, 0]
-                    for j in range(6):
-                        fatigue_result[-1].append(empty_list)
-            if fatigue_check:
-                if fatigue_no_Error:
-                    fatigue_result.insert(0, 'Succeed')
-                else:
-                    fatigue_result.insert(0, 'Failed')
-            else:
-                fatigue_result.insert(0, 'Abandon')
-            element_value.set_fatigue(node_id, temperature_name, fatigue_result)
-            element_value.set_final_results(node_id, initial_assembly_step, hot_assembly_step, fixed_step, cylinder_num)
-            # here is the final results
-        current_process = int(i * 100 / len(element_result))
-        if current_process >= threshold:
-            threshold += 10
-            log_array.append(['Fatigue Calculate Finished ' + str('%3.1f%%' % current_process),
-                              start_record_value + current_process * float(procedure_length) / 100])
-            log_object.add_record(log_array[-1], log_file)
-        i += 1
-    process_setting['START_LOG_VALUE'] = start_record_value + procedure_length
-    return process_setting
@@ -0,0 +1,399 @@
+"""
+distributed extraction of the step results through a shared folder, for very large odb. The coordinator (read_from_odb
+with DISTRIBUTED_DIR set) splits the job into (step range x variable) units, see lib.extract, workers on other hosts
+claim the units by renaming the unit file, extract the arrays and write them back as chunk files. The coordinator also
+works on the units while waiting, and assembles the chunks in step order.
+
+queue layout:
+    <queue>/<job>/job.json              odb file, steps, variables, unit count, instance of each label key
+    <queue>/<job>/labels.npz            label arrays of lib.extract.build_labels
+    <queue>/<job>/todo/<unit>.json      waiting unit
+    <queue>/<job>/claimed/<unit>.json   unit in process, with the claim token of the worker, file time is refreshed by
+                                        the worker as lease
+    <queue>/<job>/chunks/<unit>.npy     extracted array of the unit
+    <queue>/<job>/failed/<unit>.json    unit failed on a worker, with <unit>.traceback
+    <queue>/<job>/DONE                  all chunks are collected, workers ignore the job
+    <queue>/STOP                        stop all the workers of this queue
+
+a unit claimed by a dead worker is moved back to todo when its lease is older than DISTRIBUTED_LEASE_TIMEOUT. The lease
+age is the file time of the claimed unit against the file time of a probe file touched on the share (<job>/.clock.*),
+both set by the file server, so the host clocks do not need to be in sync. On a share that keeps the client time as file
+time, the clocks of all the hosts must be in sync. A worker only refreshes, fails or removes the claimed file while it
+still has its claim token, a unit reclaimed and claimed again by another worker is left to that worker. Run
+python -m bench.distributed to check the result of local worker processes and of a dead worker against the local
+extraction.
+
+worker:
+    abaqus cae noGUI=run_worker.py -- /shared/queue/
+"""
+from abaqus import *
+from abaqusConstants import *
+
+import glob
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+import uuid
+import numpy as np
+from conf import setting
+from lib import extract
+from lib import setindex
+
+
+class Lease(object):
+    """
+    refresh the file time of the claimed unit in a background thread while the unit is extracted, the refresh stops if
+    the unit is claimed by another worker
+    """
+
+    def __init__(self, claimed_file, interval, token=None):
+        self.claimed_file = claimed_file
+        self.interval = interval
+        self.token = token
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not owns(self.claimed_file, self.token):
+                # reclaimed by others, the chunk will be written twice with the same data
+                break
+            try:
+                os.utime(self.claimed_file, None)
+            except OSError:
+                pass
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def worker_name():
+    return socket.gethostname() + '-' + str(os.getpid())
+
+
+def submit(queue_dir, odb_file, odb_steps, variables, labels, steps_per_unit, instances=None):
+    """
+    write the job and its units to the queue
+    :param queue_dir:           shared folder
+    :param odb_file:            odb file, must be readable by all workers with the same path
+    :param odb_steps:           list of step names
+    :param variables:           list of variables, see lib.extract
+    :param labels:              dict of label arrays, lib.extract.build_labels
+    :param steps_per_unit:      steps in one unit
+    :param instances:           dict, {label key: instance name}, the node sets are created in these instances by
+                                the workers, PART-1-1 if not given
+    :return:                    job folder
+    """
+    job_name = os.path.splitext(os.path.basename(odb_file))[0] + '_' + worker_name() + '_' + str(int(time.time()))
+    job_dir = os.path.join(queue_dir, job_name)
+    for folder in ['todo', 'claimed', 'chunks', 'failed']:
+        os.makedirs(os.path.join(job_dir, folder))
+    np.savez(os.path.join(job_dir, 'labels.npz'), **labels)
+    units = []
+    for start in range(0, len(odb_steps), steps_per_unit):
+        for variable in variables:
+            unit_name = '%05d_' % start + variable.replace(':', '_')
+            units.append({'unit': unit_name, 'start': start, 'steps': list(odb_steps[start:start + steps_per_unit]),
+                          'variable': variable})
+    with open(os.path.join(job_dir, 'job.json'), 'wt') as f:
+        json.dump({'odb': odb_file, 'steps': list(odb_steps), 'variables': variables, 'units': len(units),
+                   'instances': instances or {}}, f)
+    for unit in units:
+        _write_json(os.path.join(job_dir, 'todo', unit['unit'] + '.json'), unit)
+    return job_dir
+
+
+def _write_json(file_name, data):
+    temp_file = file_name + '.' + worker_name() + '.tmp'
+    with open(temp_file, 'wt') as f:
+        json.dump(data, f)
+    os.rename(temp_file, file_name)
+
+
+def claim(job_dir):
+    """
+    :return:                    claimed unit file, None if no unit is waiting, the claim token of this claim is written
+                                to the unit
+    """
+    for unit_file in sorted(glob.glob(os.path.join(job_dir, 'todo', '*.json'))):
+        claimed_file = os.path.join(job_dir, 'claimed', os.path.basename(unit_file))
+        try:
+            # rename is atomic on the same file system, only one worker succeeds. The renamed file keeps the time of
+            # the todo file, it is refreshed at once so the unit is not taken as an expired lease
+            os.rename(unit_file, claimed_file)
+            os.utime(claimed_file, None)
+            with open(claimed_file, 'rt') as f:
+                unit = json.load(f)
+            unit['token'] = worker_name() + '-' + uuid.uuid4().hex
+            # written in place, the file is only read by this worker until the lease expires
+            with open(claimed_file, 'wt') as f:
+                json.dump(unit, f)
+        except (IOError, OSError, ValueError):
+            continue
+        return claimed_file
+    return None
+
+
+def _token(claimed_file):
+    """
+    :return:                    claim token of the claimed file, None if not written yet or the file is gone
+    """
+    try:
+        with open(claimed_file, 'rt') as f:
+            return json.load(f).get('token')
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def owns(claimed_file, token):
+    """
+    :return:                    True if the claimed file still has the claim token
+    """
+    return token is not None and _token(claimed_file) == token
+
+
+def share_time(job_dir):
+    """
+    :return:                    current time of the file server, file time of a probe file touched on the share
+    """
+    probe_file = os.path.join(job_dir, '.clock.' + worker_name())
+    with open(probe_file, 'at'):
+        pass
+    os.utime(probe_file, None)
+    return os.path.getmtime(probe_file)
+
+
+# {claimed file: share time}, claimed units first found without claim token by this process
+_untokened = {}
+
+
+def reclaim(job_dir, lease_timeout):
+    """
+    move the units with expired lease back to todo. A unit without claim token is being claimed, it is only moved back
+    if it still has no token one lease timeout after this process found it so (claiming worker died before the token)
+    :return:                    number of reclaimed units
+    """
+    count = 0
+    claimed_files = glob.glob(os.path.join(job_dir, 'claimed', '*.json'))
+    if not claimed_files:
+        return count
+    now = share_time(job_dir)
+    for claimed_file in claimed_files:
+        try:
+            if now - os.path.getmtime(claimed_file) < lease_timeout:
+                continue
+            if _token(claimed_file) is None:
+                found = _untokened.setdefault(claimed_file, now)
+                if now - found < lease_timeout:
+                    continue
+            _untokened.pop(claimed_file, None)
+            os.rename(claimed_file, os.path.join(job_dir, 'todo', os.path.basename(claimed_file)))
+            count += 1
+        except OSError:
+            continue
+    return count
+
+
+def run_unit(opened_odb, job_dir, claimed_file, labels, regions, lease_interval, profiler=None):
+    """
+    extract the claimed unit and write its chunk, a failed unit is moved to failed folder
+    :return:                    True if succeed
+    """
+    with open(claimed_file, 'rt') as f:
+        unit = json.load(f)
+    token = unit.get('token')
+    lease = Lease(claimed_file, lease_interval, token)
+    try:
+        result = extract.extract_unit(opened_odb, [str(x) for x in unit['steps']], str(unit['variable']), labels,
+                                      regions, profiler)
+        chunk_file = os.path.join(job_dir, 'chunks', str(unit['unit']) + '.npy')
+        # written with a temporary name, the coordinator only sees complete chunks
+        temp_file = chunk_file + '.' + worker_name() + '.tmp'
+        with open(temp_file, 'wb') as f:
+            np.save(f, result)
+        os.rename(temp_file, chunk_file)
+    except Exception:
+        lease.stop()
+        failed_file = os.path.join(job_dir, 'failed', os.path.basename(claimed_file))
+        if not owns(claimed_file, token):
+            # reclaimed by others, the unit is extracted again there
+            return False
+        try:
+            os.rename(claimed_file, failed_file)
+            with open(failed_file + '.traceback', 'wt') as f:
+                f.write(worker_name() + '\n' + traceback.format_exc())
+        except (IOError, OSError):
+            pass
+        return False
+    lease.stop()
+    if owns(claimed_file, token):
+        try:
+            os.remove(claimed_file)
+        except OSError:
+            pass
+    return True
+
+
+def load_labels(job_dir):
+    with np.load(os.path.join(job_dir, 'labels.npz')) as data:
+        return dict([(key, data[key]) for key in data.files])
+
+
+def collect(opened_odb, job_dir, labels, regions, log_function=None, profiler=None):
+    """
+    coordinator side, work on the units until all the chunks are written
+    :param opened_odb:          odb opened by the coordinator, used to extract units in this process
+    :param job_dir:             job folder from submit
+    :param labels:              dict of label arrays
+    :param regions:             (instance name, node set name) of the labels in the coordinator session
+    :param log_function:        called with (done units, total units) when a chunk is found
+    :param profiler:            instrument.StageProfiler
+    """
+    lease_timeout = setting.environment_key['DISTRIBUTED_LEASE_TIMEOUT']
+    poll_interval = setting.environment_key['DISTRIBUTED_POLL_INTERVAL']
+    with open(os.path.join(job_dir, 'job.json'), 'rt') as f:
+        total = json.load(f)['units']
+    done = 0
+    while True:
+        failed = glob.glob(os.path.join(job_dir, 'failed', '*.json'))
+        if failed:
+            with open(failed[0] + '.traceback', 'rt') as f:
+                message = f.read()
+            raise Exception('DISTRIBUTED UNIT FAILED: ' + os.path.basename(failed[0]) + '\n' + message)
+        chunk_count = len(glob.glob(os.path.join(job_dir, 'chunks', '*.npy')))
+        if chunk_count != done:
+            done = chunk_count
+            if log_function is not None:
+                log_function(done, total)
+        if done >= total:
+            break
+        reclaim(job_dir, lease_timeout)
+        claimed_file = claim(job_dir)
+        if claimed_file is None:
+            time.sleep(poll_interval)
+            continue
+        if profiler is not None:
+            profiler.count('local_units')
+        run_unit(opened_odb, job_dir, claimed_file, labels, regions, lease_timeout / 3.0, profiler)
+    with open(os.path.join(job_dir, 'DONE'), 'wt') as f:
+        f.write(worker_name() + '\n')
+
+
+def iter_chunks(job_dir):
+    """
+    read the chunks in step order, all the variables of one step range are loaded together
+    :return:                    generator of (step names, {variable: array})
+    """
+    with open(os.path.join(job_dir, 'job.json'), 'rt') as f:
+        job = json.load(f)
+    starts = {}
+    for chunk_file in glob.glob(os.path.join(job_dir, 'chunks', '*.npy')):
+        unit_name = os.path.basename(chunk_file)[:-4]
+        starts.setdefault(int(unit_name.split('_')[0]), []).append(unit_name)
+    for start in sorted(starts):
+        chunk = {}
+        for variable in job['variables']:
+            unit_name = '%05d_' % start + variable.replace(':', '_')
+            chunk[variable] = np.load(os.path.join(job_dir, 'chunks', unit_name + '.npy'))
+        steps = [str(x) for x in job['steps'][start:start + len(chunk[job['variables'][0]])]]
+        yield steps, chunk
+
+
+def remove_job(job_dir):
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def _create_regions(opened_odb, labels, instances):
+    """
+    worker side, create the node sets of the job in the worker session
+    :param instances:           dict, {label key: instance name} of job.json
+    :return:                    dict, {label key: (instance name, node set name)}
+    """
+    from lib import common
+    regions = {}
+    for key in labels:
+        if key in ['SE_ELEMENTS', 'SE_NODES']:
+            continue
+        instance_name = str(instances.get(key, setindex.DEFAULT_INSTANCE))
+        instance = opened_odb.rootAssembly.instances[instance_name]
+        set_name = common.unique_set_name(instance.nodeSets, key.upper() + '_DIST')
+        _ = instance.NodeSetFromNodeLabels(name=set_name, nodeLabels=tuple([int(x) for x in labels[key]]))
+        regions[key] = (instance_name, set_name)
+    time.sleep(setting.environment_key['CACHE_TIME'])
+    return regions
+
+
+def _drop_job(jobs, job_dir):
+    """
+    forget the job, its odb is closed if no other job of the worker reads it, the worker keeps no odb of finished jobs
+    """
+    opened_odb = jobs.pop(job_dir)[0]
+    if any([item[0] is opened_odb for item in jobs.values()]):
+        return
+    try:
+        opened_odb.close()
+    except Exception:
+        traceback.print_exc()
+
+
+def work(queue_dir, once=False):
+    """
+    worker loop, claim and extract the units of all jobs in the queue folder
+    :param queue_dir:           shared folder
+    :param once:                if True, return when no unit is waiting
+    :return:                    number of extracted units
+    """
+    lease_timeout = setting.environment_key['DISTRIBUTED_LEASE_TIMEOUT']
+    poll_interval = setting.environment_key['DISTRIBUTED_POLL_INTERVAL']
+    stop_file = os.path.join(queue_dir, 'STOP')
+    # {job folder: [opened odb, labels, regions]}, the odb is closed when no job uses it
+    jobs = {}
+    unit_count = 0
+    while not os.path.isfile(stop_file):
+        claimed_file = None
+        for job_dir in sorted(glob.glob(os.path.join(queue_dir, '*', 'job.json'))):
+            job_dir = os.path.dirname(job_dir)
+            if os.path.isfile(os.path.join(job_dir, 'DONE')):
+                continue
+            reclaim(job_dir, lease_timeout)
+            claimed_file = claim(job_dir)
+            if claimed_file is not None:
+                break
+        # forget the finished jobs
+        for finished_dir in list(jobs.keys()):
+            if not os.path.isfile(os.path.join(finished_dir, 'job.json')) or os.path.isfile(
+                    os.path.join(finished_dir, 'DONE')):
+                _drop_job(jobs, finished_dir)
+        if claimed_file is None:
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+        try:
+            if job_dir not in jobs:
+                with open(os.path.join(job_dir, 'job.json'), 'rt') as f:
+                    job = json.load(f)
+                odb_file = str(job['odb'])
+                opened_odb = session.odbs[odb_file] if odb_file in session.odbs.keys() else session.openOdb(
+                    name=odb_file, readOnly=True)
+                labels = load_labels(job_dir)
+                jobs[job_dir] = [opened_odb, labels, _create_regions(opened_odb, labels, job.get('instances', {}))]
+        except Exception:
+            # odb can not be opened on this host, leave the unit to others
+            os.rename(claimed_file, os.path.join(job_dir, 'todo', os.path.basename(claimed_file)))
+            traceback.print_exc()
+            time.sleep(poll_interval)
+            continue
+        opened_odb, labels, regions = jobs[job_dir]
+        if run_unit(opened_odb, job_dir, claimed_file, labels, regions, lease_timeout / 3.0):
+            unit_count += 1
+    for job_dir in list(jobs.keys()):
+        _drop_job(jobs, job_dir)
+    return unit_count
@@ -0,0 +1,310 @@
+"""
+array extraction of the step results read by read_from_odb. The work is split into units of (steps, variable), the
+result of one unit is an array [step, entity, component], float32 as stored in odb, the entity order is given by the
+sorted label arrays from build_labels. Units can be run in the current process, or by other workers, see lib.distribute.
+
+variables:
+    'U:<key>'       U1, U2, U3 of the node set <key>, GASKET for all gasket nodes, BORE for the bore nodes, or the cam
+                    node set name
+    'CONTACT'       CSHEAR1, CSHEAR2, CSLIP1, CSLIP2 of the gasket nodes, 0 for the tied nodes without contact output,
+                    and the contact status as last component, CSTATUS (0 open, 1 closed sticking, 2 closed slipping)
+                    if in the odb, else 2 for the nodes in the CSHEAR1 blocks, -1 for the nodes without contact output
+    'SE'            S11, E11 at element nodal of the gasket elements, entity is (element, node) pair
+labels are unique in one instance only, the field blocks of CONTACT and SE are taken from the instance of the gasket
+node set, the region of GASKET.
+"""
+from abaqusConstants import *
+import collections
+import numpy as np
+
+CONTACT_OUTPUTS = ['CSHEAR1', 'CSHEAR2', 'CSLIP1', 'CSLIP2']
+CONTACT_STATUS = 'CSTATUS'
+# component of the contact status in the CONTACT unit, after CONTACT_OUTPUTS
+STATUS_COMPONENT = len(CONTACT_OUTPUTS)
+# contact status of the nodes without contact output, and of the nodes with contact output if CSTATUS is not in the odb
+NO_CONTACT = -1.0
+SLIP_STATUS = 2.0
+
+
+def pair_key(elements, nodes):
+    """
+    one int64 key for each (element, node) pair, labels are less than 2 ** 31 in abaqus
+    """
+    return (np.asarray(elements, dtype=np.int64) << 32) | np.asarray(nodes, dtype=np.int64)
+
+
+def build_labels(node_labels, element_result, bore_nodes=None, cam_sets=None):
+    """
+    :param node_labels:         gasket node labels
+    :param element_result:      dict, {element label: model.ChgElements}
+    :param bore_nodes:          bore node labels of manually defined bore node set, None if not required
+    :param cam_sets:            dict, {cam node set name: node labels}
+    :return:                    dict of sorted label arrays, GASKET, BORE, cam set names, SE_ELEMENTS, SE_NODES
+    """
+    labels = {'GASKET': np.unique(np.asarray(node_labels, dtype=np.int64))}
+    elements = []
+    nodes = []
+    for element in element_result:
+        for node in element_result[element].connectivity:
+            elements.append(element)
+            nodes.append(node)
+    order = np.argsort(pair_key(elements, nodes))
+    labels['SE_ELEMENTS'] = np.asarray(elements, dtype=np.int64)[order]
+    labels['SE_NODES'] = np.asarray(nodes, dtype=np.int64)[order]
+    if bore_nodes is not None:
+        labels['BORE'] = np.unique(np.asarray(bore_nodes, dtype=np.int64))
+    if cam_sets:
+        for set_name, set_labels in cam_sets.items():
+            labels[set_name] = np.unique(np.asarray(set_labels, dtype=np.int64))
+    return labels
+
+
+def step_variables(bore_manually, cam_sets, relative_motion):
+    """
+    :return:                    list of variables read for each step, same order as the former step loop
+    """
+    variables = ['U:GASKET']
+    if relative_motion:
+        variables.append('CONTACT')
+    if bore_manually:
+        variables.append('U:BORE')
+    for set_name in cam_sets or []:
+        variables.append('U:' + set_name)
+    variables.append('SE')
+    return variables
+
+
+def _position(sorted_labels, labels):
+    """
+    :return:                    index of labels in sorted_labels, mask of labels found
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    if not len(sorted_labels):
+        return np.zeros(len(labels), dtype=np.int64), np.zeros(len(labels), dtype=bool)
+    index = np.searchsorted(sorted_labels, labels)
+    index[index >= len(sorted_labels)] = 0
+    return index, sorted_labels[index] == labels
+
+
+def _fill(result, step_index, sorted_keys, keys, data, columns):
+    index, found = _position(sorted_keys, keys)
+    data = np.asarray(data).reshape(len(keys), -1)
+    result[step_index, index[found], :] = data[found][:, columns]
+
+
+def in_instance(block, instance_name):
+    """
+    :return:                    True if the field block is of the instance, blocks without instance are kept
+    """
+    return instance_name is None or block.instance is None or block.instance.name == instance_name
+
+
+def _count(profiler, value):
+    if profiler is not None:
+        profiler.count('odb_calls', value)
+
+
+def extract_unit(opened_odb, steps, variable, labels, regions, profiler=None):
+    """
+    read one work unit from odb
+    :param opened_odb:          opened odb
+    :param steps:               list of step names
+    :param variable:            see module doc
+    :param labels:              dict from build_labels
+    :param regions:             dict, {label key: (instance name, node set name in this session)}, the set of
+                                GASKET, BORE, cam
+    :param profiler:            instrument.StageProfiler, odb_calls are counted if given
+    :return:                    float32 array, [step, entity, component]
+    """
+    gasket_instance = regions['GASKET'][0]
+    if variable.startswith('U:'):
+        key = variable[2:]
+        result = np.zeros((len(steps), len(labels[key]), 3), dtype=np.float32)
+        instance_name, set_name = regions[key]
+        node_region = opened_odb.rootAssembly.instances[instance_name].nodeSets[set_name]
+        for i, current_step in enumerate(steps):
+            field = opened_odb.steps[current_step].frames[-1].fieldOutputs['U'].getSubset(region=node_region)
+            for block in field.bulkDataBlocks:
+                _fill(result, i, labels[key], block.nodeLabels, block.data, [0, 1, 2])
+            _count(profiler, 1)
+    elif variable == 'CONTACT':
+        result = np.zeros((len(steps), len(labels['GASKET']), len(CONTACT_OUTPUTS) + 1), dtype=np.float32)
+        result[:, :, STATUS_COMPONENT] = NO_CONTACT
+        for i, current_step in enumerate(steps):
+            field_outputs = opened_odb.steps[current_step].frames[-1].fieldOutputs
+            # CSTATUS is only read if it is in the odb, else the status is given by the CSHEAR1 blocks
+            status = CONTACT_STATUS in field_outputs
+            names = CONTACT_OUTPUTS + [CONTACT_STATUS] if status else CONTACT_OUTPUTS
+            for j, name in enumerate(names):
+                for block in field_outputs[name].bulkDataBlocks:
+                    if not in_instance(block, gasket_instance):
+                        continue
+                    index, found = _position(labels['GASKET'], block.nodeLabels)
+                    data = np.asarray(block.data).reshape(len(index), -1)
+                    result[i, index[found], j] = data[found][:, 0]
+                    if j == 0 and not status:
+                        result[i, index[found], STATUS_COMPONENT] = SLIP_STATUS
+            _count(profiler, len(names))
+    elif variable == 'SE':
+        keys = pair_key(labels['SE_ELEMENTS'], labels['SE_NODES'])
+        result = np.zeros((len(steps), len(keys), 2), dtype=np.float32)
+        for i, current_step in enumerate(steps):
+            field_outputs = opened_odb.steps[current_step].frames[-1].fieldOutputs
+            for j, name in enumerate(['S', 'E']):
+                for block in field_outputs[name].getSubset(position=ELEMENT_NODAL).bulkDataBlocks:
+                    if not in_instance(block, gasket_instance):
+                        continue
+                    index, found = _position(keys, pair_key(block.elementLabels, block.nodeLabels))
+                    data = np.asarray(block.data).reshape(len(index), -1)
+                    result[i, index[found], j] = data[found][:, 0]
+            _count(profiler, 2)
+    else:
+        raise Exception('UNKNOWN EXTRACT VARIABLE ' + variable)
+    return result
+
+
+def tied_mask(max_status, tied_status=None):
+    """
+    :param max_status:          max contact status (last component of CONTACT) of each gasket node over all the steps
+    :param tied_status:         nodes with CSTATUS at most this value are tied, None for the nodes without contact
+                                output only
+    :return:                    bool array, True for the tied nodes
+    """
+    max_status = np.asarray(max_status, dtype=np.float64)
+    if tied_status is None:
+        return max_status <= NO_CONTACT
+    return max_status <= max(float(tied_status), NO_CONTACT)
+
+
+def iter_local(opened_odb, odb_steps, variables, labels, regions, profiler=None):
+    """
+    read the units step by step in the current process
+    :return:                    generator of (step names, {variable: array})
+    """
+    for current_step in odb_steps:
+        if profiler is not None:
+            profiler.start('Step ' + current_step)
+            profiler.count('steps')
+        try:
+            chunk = {}
+            for variable in variables:
+                chunk[variable] = extract_unit(opened_odb, [current_step], variable, labels, regions, profiler)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+        yield [current_step], chunk
+
+
+def read_mesh(instance):
+    """
+    mesh of the instance for the off-viewer rendering (compute.render), nodes and elements are read in one pass
+    :param instance:            odb instance
+    :return:                    (int64 array [node] sorted node labels, float64 array [node, 3] coordinates,
+                                int64 array [element] element labels, list of element types,
+                                list of connectivity tuples as node index)
+    """
+    node_labels = []
+    coordinates = []
+    for node in instance.nodes:
+        node_labels.append(node.label)
+        coordinates.append(node.coordinates)
+    node_labels = np.asarray(node_labels, dtype=np.int64)
+    order = np.argsort(node_labels)
+    node_labels = node_labels[order]
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)[order]
+    element_labels = []
+    element_types = []
+    connectivity = []
+    for element in instance.elements:
+        element_labels.append(element.label)
+        element_types.append(element.type)
+        connectivity.append(element.connectivity)
+    # one label search for all the element nodes
+    sizes = [len(item) for item in connectivity]
+    flat = _position(node_labels, [label for item in connectivity for label in item])[0].tolist()
+    ends = np.cumsum(sizes).tolist()
+    connectivity = [tuple(flat[end - size:end]) for size, end in zip(sizes, ends)]
+    return node_labels, coordinates, np.asarray(element_labels, dtype=np.int64), element_types, connectivity
+
+
+def read_assembly_mesh(instances):
+    """
+    read_mesh of all the instances joined, the node index of the connectivity is the row in the joined node arrays
+    :param instances:           odb rootAssembly.instances
+    :return:                    read_mesh result of the joined instances, OrderedDict of the rows of each instance,
+                                {instance name: (node start, node end, element start, element end)}
+    """
+    meshes = []
+    ranges = collections.OrderedDict()
+    node_count = 0
+    element_count = 0
+    for instance_name in instances.keys():
+        node_labels, coordinates, element_labels, element_types, connectivity = read_mesh(instances[instance_name])
+        if node_count:
+            connectivity = [tuple([index + node_count for index in item]) for item in connectivity]
+        ranges[instance_name] = (node_count, node_count + len(node_labels), element_count,
+                                 element_count + len(element_labels))
+        node_count += len(node_labels)
+        element_count += len(element_labels)
+        meshes.append((node_labels, coordinates, element_labels, element_types, connectivity))
+    if len(meshes) == 1:
+        return meshes[0] + (ranges,)
+    return (np.concatenate([mesh[0] for mesh in meshes] + [np.zeros(0, dtype=np.int64)]),
+            np.concatenate([mesh[1] for mesh in meshes] + [np.zeros((0, 3))]),
+            np.concatenate([mesh[2] for mesh in meshes] + [np.zeros(0, dtype=np.int64)]),
+            [item for mesh in meshes for item in mesh[3]], [item for mesh in meshes for item in mesh[4]], ranges)
+
+
+def read_nodal_scalar(opened_odb, steps, name, node_labels, instance_name=None):
+    """
+    :param steps:               list of step names, the last frame is read
+    :param name:                nodal field output, NT11
+    :param node_labels:         sorted node labels
+    :param instance_name:       instance of the node labels, None for all the blocks
+    :return:                    float32 array [step, node], NaN for the nodes without output
+    """
+    result = np.full((len(steps), len(node_labels)), np.nan, dtype=np.float32)
+    for i, current_step in enumerate(steps):
+        for block in opened_odb.steps[current_step].frames[-1].fieldOutputs[name].bulkDataBlocks:
+            if not in_instance(block, instance_name):
+                continue
+            index, found = _position(node_labels, block.nodeLabels)
+            data = np.asarray(block.data).reshape(len(index), -1)
+            result[i, index[found]] = data[found][:, 0]
+    return result
+
+
+def read_history(opened_odb, steps, region_names, outputs, profiler=None):
+    """
+    history outputs of the regions with all the increments, the regions of one step are read in one pass
+    :param steps:               list of step names
+    :param region_names:        history region names, 'Node <instance>.<label>'
+    :param outputs:             history output names, TF1, U1, ...
+    :param profiler:            instrument.StageProfiler, odb_calls are counted if given
+    :return:                    dict, {'TIME': [array [increment] of each step], output: [array [region, increment] of
+                                each step]}, NaN if the output is not in the region, see compute.bolt
+    """
+    history = {'TIME': []}
+    for output in outputs:
+        history[output] = []
+    for current_step in steps:
+        history_regions = opened_odb.steps[current_step].historyRegions
+        data = {}
+        times = np.zeros(0)
+        for i, region_name in enumerate(region_names):
+            history_outputs = history_regions[region_name].historyOutputs
+            for output in outputs:
+                if output in history_outputs.keys():
+                    value = np.asarray(history_outputs[output].data, dtype=np.float64).reshape(-1, 2)
+                    data[i, output] = value[:, 1]
+                    if len(value) > len(times):
+                        times = value[:, 0]
+            _count(profiler, 1)
+        history['TIME'].append(times)
+        for output in outputs:
+            values = np.full((len(region_names), len(times)), np.nan)
+            for i in range(len(region_names)):
+                if (i, output) in data:
+                    values[i, :len(data[i, output])] = data[i, output]
+            history[output].append(values)
+    return history
@@ -0,0 +1,123 @@
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # windows, peak memory will be recorded as None
+    resource = None
+
+
+def peak_rss():
+    """
+    peak resident memory of the current process
+    :return:            float, unit MB, None if the platform does not provide it
+    """
+    if resource is None:
+        return None
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # bytes on mac, kilobytes on linux
+        value /= 1024.0
+    return value / 1024.0
+
+
+def current_rss():
+    """
+    current resident memory of the process, linux only
+    :return:            float, unit MB, None if /proc is not available
+    """
+    try:
+        with open('/proc/self/statm', 'rt') as f:
+            pages = int(f.read().split()[1])
+    except (IOError, OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 / 1024.0
+
+
+def cpu_time():
+    """
+    :return:            user + system cpu time of the current process, unit second
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+
+class StageProfiler(object):
+    """
+    record wall time, cpu time, peak rss and counters for each stage of the post process, stages can be nested, e.g.
+    the step loop inside read_from_odb. The records are dumped as a json file next to the log file.
+    profile format:
+        {
+            'stages': [
+                        {'name': 'read_from_odb', 'parent': None, 'wall': 10.2, 'cpu': 9.8, 'peak_rss': 820.5,
+                         'counts': {'steps': 59, 'odb_calls': 354, ...}},
+                        {'name': 'read_from_odb/Step-1', 'parent': 'read_from_odb', ...},
+                        ...
+                      ],
+            'counts': {'steps': 59, 'nodes': 35000, 'element_nodes': 210000, 'odb_calls': 360}
+        }
+    """
+
+    def __init__(self, profile_file, cprofile=False):
+        """
+        :param profile_file:        json file to store the profile
+        :param cprofile:            if True, each top level stage will be run under cProfile and dumped as
+                                    <profile_file base>_<stage>.prof
+        """
+        self.profile_file = profile_file
+        self.cprofile = cprofile
+        self.stages = []
+        self.counts = {}
+        self._active = []
+
+    def start(self, name):
+        parent = None
+        if self._active:
+            parent = self._active[-1]['name']
+            name = parent + '/' + name
+        record = {'name': name, 'parent': parent, 'wall': time.time(), 'cpu': cpu_time(), 'peak_rss': None,
+                  'counts': {}}
+        if self.cprofile and parent is None:
+            record['profiler'] = cProfile.Profile()
+            record['profiler'].enable()
+        self._active.append(record)
+        self.stages.append(record)
+        return record
+
+    def stop(self):
+        record = self._active.pop()
+        record['wall'] = time.time() - record['wall']
+        record['cpu'] = cpu_time() - record['cpu']
+        record['peak_rss'] = peak_rss()
+        if 'profiler' in record:
+            profiler = record.pop('profiler')
+            profiler.disable()
+            stage_name = record['name'].replace('/', '_').replace(' ', '_')
+            profiler.dump_stats(os.path.splitext(self.profile_file)[0] + '_' + stage_name + '.prof')
+        return record
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def count(self, key, value=1):
+        """
+        add value to the counter, both the total counter and all the running stages are updated
+        """
+        self.counts[key] = self.counts.get(key, 0) + value
+        for record in self._active:
+            record['counts'][key] = record['counts'].get(key, 0) + value
+
+    def dump(self):
+        profile = {'stages': self.stages, 'counts': self.counts, 'peak_rss': peak_rss()}
+        with open(self.profile_file, 'wt') as f:
+            json.dump(profile, f, indent=1, sort_keys=True)
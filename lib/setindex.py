@@ -0,0 +1,174 @@
+"""
+index of the element sets of the odb instances, built once by read_from_odb and reused by plot_thermal_map and
+get_section_force. Only set level data is read, the first element of each set gives the element type and the
+representative node, the node coordinates are looked up by label, the model nodes are not scanned.
+
+instance map, in assembly order, set names of each instance:
+    {instance name: {'ELEMENT': [element set names], 'NODE': [node set names]}}
+
+index, in instance and odb set order, the instance of the gasket sets first:
+    {set key: {'INSTANCE': instance name, 'SET': set name in the instance, 'TYPE': element type,
+               'GASKET': True for GK3D sets, 'NODE': representative node label,
+               'Z': z coordinate of the representative node}}
+the set key is the set name, <instance>.<set> if the name is already used by a former instance or an added set. The
+added sets created with a numbered name (a kept open odb with a set of the same name) are indexed by the user set name.
+"""
+import collections
+
+GASKET_ELEMENT_TYPE = 'GK3D'
+# instance of the models exported as one part, used if no instance has the gasket sets
+DEFAULT_INSTANCE = 'PART-1-1'
+
+
+def build_instance_sets(instances):
+    """
+    :param instances:           odb rootAssembly.instances
+    :return:                    OrderedDict, instance map, see module doc
+    """
+    instance_sets = collections.OrderedDict()
+    for instance_name in instances.keys():
+        instance = instances[instance_name]
+        instance_sets[instance_name] = {'ELEMENT': list(instance.elementSets.keys()),
+                                        'NODE': list(instance.nodeSets.keys())}
+    return instance_sets
+
+
+def find_instance(instance_sets, set_name, kind='ELEMENT', prefer=None):
+    """
+    :param kind:                'ELEMENT' or 'NODE'
+    :param prefer:              instance checked first
+    :return:                    name of the instance with the set, None if no instance has it
+    """
+    instance_names = list(instance_sets.keys())
+    if prefer in instance_sets:
+        instance_names.remove(prefer)
+        instance_names.insert(0, prefer)
+    for instance_name in instance_names:
+        if set_name in instance_sets[instance_name][kind]:
+            return instance_name
+    return None
+
+
+def gasket_instance(instance_sets, set_names):
+    """
+    :param set_names:           gasket element sets of the user input
+    :return:                    name of the instance with the gasket sets, PART-1-1 or the first instance if no
+                                instance has them
+    """
+    found = []
+    for set_name in set_names:
+        instance_name = find_instance(instance_sets, set_name)
+        if instance_name is not None and instance_name not in found:
+            found.append(instance_name)
+    if len(found) > 1:
+        raise Exception('**===GASKET SETS ARE IN MORE THAN ONE INSTANCE: ' + ', '.join(found))
+    if found:
+        return found[0]
+    if DEFAULT_INSTANCE in instance_sets or not instance_sets:
+        return DEFAULT_INSTANCE
+    return list(instance_sets.keys())[0]
+
+
+def label_instance(instances, node_labels, prefer=None):
+    """
+    instance of node labels given without instance, the cam nodes of the user input
+    :param instances:           odb rootAssembly.instances
+    :param prefer:              instance checked first
+    :return:                    name of the first instance with all the labels, prefer if no instance has them
+    """
+    instance_names = list(instances.keys())
+    if prefer in instance_names:
+        instance_names.remove(prefer)
+        instance_names.insert(0, prefer)
+    for instance_name in instance_names:
+        try:
+            for label in node_labels:
+                instances[instance_name].getNodeFromLabel(label)
+        except Exception:
+            continue
+        return instance_name
+    return prefer
+
+
+def build_set_index(instances, first_instance=None, renamed=None, excluded=None):
+    """
+    :param instances:           odb rootAssembly.instances
+    :param first_instance:      instance indexed first, its sets keep their names as key, the gasket instance
+    :param renamed:             {set name: set key} of the first instance, the added sets created with a numbered name
+    :param excluded:            set names of the first instance not indexed, the added sets of the former jobs
+    :return:                    OrderedDict, see module doc, empty sets are skipped
+    """
+    renamed = renamed or {}
+    excluded = excluded or set()
+    index = collections.OrderedDict()
+    instance_names = list(instances.keys())
+    if first_instance in instance_names:
+        instance_names.remove(first_instance)
+        instance_names.insert(0, first_instance)
+    for instance_name in instance_names:
+        instance = instances[instance_name]
+        element_sets = instance.elementSets
+        for set_name in element_sets.keys():
+            if instance_name == first_instance and set_name in excluded:
+                continue
+            elements = element_sets[set_name].elements
+            if not len(elements):
+                continue
+            first_element = elements[0]
+            node_label = first_element.connectivity[0]
+            if instance_name == first_instance and set_name in renamed:
+                key = renamed[set_name]
+            elif set_name in index or set_name in renamed.values():
+                key = instance_name + '.' + set_name
+            else:
+                key = set_name
+            index[key] = {'INSTANCE': instance_name, 'SET': set_name, 'TYPE': first_element.type,
+                          'GASKET': GASKET_ELEMENT_TYPE in first_element.type, 'NODE': node_label,
+                          'Z': instance.getNodeFromLabel(node_label).coordinates[2]}
+    return index
+
+
+def leaf_name(index, set_key):
+    """
+    :return:                    element set name of the display group leaf, <instance>.<set>
+    """
+    return index[set_key]['INSTANCE'] + '.' + index[set_key]['SET']
+
+
+def instance_groups(index, set_keys):
+    """
+    :return:                    OrderedDict, {instance name: [set keys]}, in set_keys order
+    """
+    groups = collections.OrderedDict()
+    for set_key in set_keys:
+        groups.setdefault(index[set_key]['INSTANCE'], []).append(set_key)
+    return groups
+
+
+def gasket_sets(index):
+    """
+    :return:                    list of gasket set names, GK3D elements
+    """
+    return [set_name for set_name, value in index.items() if value['GASKET']]
+
+
+def engine_sets(index):
+    """
+    :return:                    list of the other set names, displayed in the thermal maps
+    """
+    return [set_name for set_name, value in index.items() if not value['GASKET']]
+
+
+def split_by_z(index, set_names, critical_value):
+    """
+    :param critical_value:      z of the gasket middle plane
+    :return:                    (sets above the plane, sets below the plane), by the representative node
+    """
+    up_sets = []
+    down_sets = []
+    for set_name in set_names:
+        if index[set_name]['Z'] > critical_value:
+            up_sets.append(set_name)
+        else:
+            down_sets.append(set_name)
+    return up_sets, down_sets
@@ -5,4 +5,9 @@ sys.path.append(os.path.dirname(os.getcwd()))
 from core import src
 
 if __name__ == '__main__':
-    src.abaqus_process('/data/Wei/FEA19-0840/FEA19-0840_userinput.json')
+    # abaqus cae noGUI=run.py -- /data/Wei/FEA19-0840/FEA19-0840_userinput.json
+    args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    if not args:
+        args = ['/data/Wei/FEA19-0840/FEA19-0840_userinput.json']
+    for json_file in args:
+        src.abaqus_process(json_file)
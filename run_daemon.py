@@ -0,0 +1,10 @@
+#coding=utf-8
+import sys, os
+# myModule is located in subDir
+sys.path.append(os.path.dirname(os.getcwd()))
+from core import daemon
+
+if __name__ == '__main__':
+    # abaqus cae noGUI=run_daemon.py -- /data/spool/
+    args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    daemon.serve(args[0] if args else None)
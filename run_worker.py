@@ -0,0 +1,11 @@
+#coding=utf-8
+import sys, os
+# myModule is located in subDir
+sys.path.append(os.path.dirname(os.getcwd()))
+from conf import setting
+from lib import distribute
+
+if __name__ == '__main__':
+    # abaqus cae noGUI=run_worker.py -- /shared/queue/
+    args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[1:]
+    distribute.work(args[0] if args else setting.environment_key['DISTRIBUTED_DIR'])